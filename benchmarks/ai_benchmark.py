@@ -0,0 +1,221 @@
+"""
+AI Path Benchmark
+
+Drives the real AI code paths against the local mock server and reports
+throughput, latency percentiles and upstream calls per request, so changes
+to the AI layer (scheduler, caching, batching...) can be compared.
+
+Scenarios:
+    vocab        lookup_word_smart (cache -> AI -> dictionary fallback)
+    card         generate_card_content
+    quiz         generate_quiz_from_topic
+    quiz_stream  stream_quiz_from_topic (also reports time to first question)
+
+Firestore is kept out of the measurement: bot config, the vocabulary cache,
+rate limits and usage flushes are replaced with in-memory versions. The
+Firebase app is still initialised on import, so serviceAccountKey.json must
+be present as for the bot itself.
+
+Usage (from the repo root):
+    python -m benchmarks.ai_benchmark --scenario all --requests 200 --concurrency 20
+    python -m benchmarks.ai_benchmark --scenario vocab --hit-ratio 0.5 --rate-limit 0.1 --json out.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+from benchmarks.mock_ai_server import add_mock_arguments, config_from_args, start_mock_server
+
+SCENARIOS = ['vocab', 'card', 'quiz', 'quiz_stream']
+
+
+def _configure_environment(args):
+    """Must run before any bot_services import (module-level constants read env)."""
+    base = f"http://127.0.0.1:{args.port}"
+    os.environ['GROQ_API_BASE'] = f"{base}/openai/v1"
+    os.environ['DICTIONARY_API_BASE'] = base
+    os.environ['MYMEMORY_API_BASE'] = base
+    os.environ['GROQ_API_KEY'] = "mock-key"
+    os.environ['AI_REQUESTS_PER_MINUTE'] = str(args.rpm)
+    os.environ['AI_TOKENS_PER_MINUTE'] = str(args.tpm)
+    os.environ['AI_MAX_IN_FLIGHT'] = str(args.max_in_flight)
+
+
+def _isolate_from_firestore():
+    """Swap the Firestore-backed collaborators of the AI path for in-memory ones."""
+    from bot_services import ai_service, ai_usage, vocabulary_cache, vocabulary_lookup
+
+    cache = {}
+
+    async def get_bot_config():
+        return {'ai_enabled': True, 'api_keys': ["mock-key"], 'blocked_users': []}
+
+    async def check_ai_limit(user_id):
+        return True
+
+    async def get_from_cache(word):
+        return cache.get(word.lower().strip())
+
+    async def save_to_cache(word, vocab_data, source_type):
+        cache[word.lower().strip()] = {
+            'word': word,
+            'definition': vocab_data.get('definition', ''),
+            'translation_uz': vocab_data.get('translation', ''),
+            'translation_en': vocab_data.get('translation_en', ''),
+            'examples': vocab_data.get('examples', []),
+            'phonetic': vocab_data.get('phonetic', ''),
+            'source_type': source_type,
+        }
+
+    async def upgrade_cache_entry(word, ai_data):
+        await save_to_cache(word, ai_data, 'ai')
+
+    async def check_vocab_rate_limit(user_id):
+        return True, 99, 999
+
+    async def increment_vocab_usage(user_id):
+        return None
+
+    async def flush_ai_usage(day_totals, user_totals):
+        return None
+
+    ai_service.get_bot_config = get_bot_config
+    ai_service.check_ai_limit = check_ai_limit
+    for module in (vocabulary_cache, vocabulary_lookup):
+        module.get_from_cache = get_from_cache
+        module.save_to_cache = save_to_cache
+        module.upgrade_cache_entry = upgrade_cache_entry
+    vocabulary_lookup.check_vocab_rate_limit = check_vocab_rate_limit
+    vocabulary_lookup.increment_vocab_usage = increment_vocab_usage
+    ai_usage.flush_ai_usage = flush_ai_usage
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def _run_scenario(name: str, args, mock_url: str) -> dict:
+    from bot_services.ai_service import generate_card_content, generate_quiz_from_topic, stream_quiz_from_topic
+    from bot_services.vocabulary_lookup import lookup_word_smart
+
+    # Distinct keys so hit_ratio of requests repeat an earlier word/topic
+    unique = max(1, int(args.requests * (1 - args.hit_ratio)))
+    first_item = {}
+
+    async def one(i: int):
+        key = f"{name}{i % unique}"
+        if name == 'vocab':
+            return await lookup_word_smart(f"bench{key}", user_id=1)
+        if name == 'card':
+            return await generate_card_content(f"bench{key}")
+        if name == 'quiz':
+            return await generate_quiz_from_topic(f"Benchmark topic {key}", num_questions=10)
+        # quiz_stream
+        started = time.monotonic()
+        questions = []
+        async for question in stream_quiz_from_topic(f"Benchmark topic {key}", num_questions=10):
+            if not questions:
+                first_item[i] = time.monotonic() - started
+            questions.append(question)
+        return questions
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async def timed(i: int):
+        nonlocal failures
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                result = await one(i)
+            except Exception as e:
+                print(f"❌ {name} #{i}: {e}")
+                result = None
+            latencies.append(time.monotonic() - started)
+            if not result or (isinstance(result, dict) and result.get('error')):
+                failures += 1
+
+    async with aiohttp.ClientSession() as session:
+        await session.post(f"{mock_url}/__reset")
+        started = time.monotonic()
+        await asyncio.gather(*(timed(i) for i in range(args.requests)))
+        elapsed = time.monotonic() - started
+        async with session.get(f"{mock_url}/__stats") as response:
+            upstream = await response.json()
+
+    latencies.sort()
+    firsts = sorted(first_item.values())
+    result = {
+        'scenario': name,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(args.requests / elapsed, 2) if elapsed else 0.0,
+        'failures': failures,
+        'p50_s': round(_percentile(latencies, 50), 3),
+        'p95_s': round(_percentile(latencies, 95), 3),
+        'p99_s': round(_percentile(latencies, 99), 3),
+        'calls_per_request': {
+            endpoint: round(counts.get('total', 0) / args.requests, 2)
+            for endpoint, counts in upstream.items()
+        },
+        'upstream_status': upstream,
+    }
+    if firsts:
+        result['first_question_p50_s'] = round(_percentile(firsts, 50), 3)
+        result['first_question_p95_s'] = round(_percentile(firsts, 95), 3)
+    return result
+
+
+def _print_result(r: dict):
+    print(f"\n📊 {r['scenario']}: {r['requests']} requests @ concurrency {r['concurrency']}")
+    print(f"• Elapsed: {r['elapsed_s']}s | Throughput: {r['throughput_rps']} req/s | Failures: {r['failures']}")
+    print(f"• Latency p50 {r['p50_s']}s / p95 {r['p95_s']}s / p99 {r['p99_s']}s")
+    if 'first_question_p50_s' in r:
+        print(f"• First question p50 {r['first_question_p50_s']}s / p95 {r['first_question_p95_s']}s")
+    calls = ", ".join(f"{k} {v}" for k, v in r['calls_per_request'].items()) or "none"
+    print(f"• Upstream calls per request: {calls}")
+
+
+async def main(args):
+    _configure_environment(args)
+    server, runner = await start_mock_server(config_from_args(args), port=args.port)
+    mock_url = f"http://127.0.0.1:{args.port}"
+    try:
+        _isolate_from_firestore()
+        scenarios = SCENARIOS if args.scenario == 'all' else [args.scenario]
+        results = []
+        for name in scenarios:
+            result = await _run_scenario(name, args, mock_url)
+            _print_result(result)
+            results.append(result)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"\n💾 Results written to {args.json}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AI path against the local mock server")
+    parser.add_argument('--scenario', choices=SCENARIOS + ['all'], default='all')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--hit-ratio', type=float, default=0.0, help="Fraction of requests repeating an earlier word/topic")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--rpm', type=int, default=int(os.getenv("AI_REQUESTS_PER_MINUTE", 30)), help="Scheduler requests/min budget")
+    parser.add_argument('--tpm', type=int, default=int(os.getenv("AI_TOKENS_PER_MINUTE", 6000)), help="Scheduler tokens/min budget")
+    parser.add_argument('--max-in-flight', type=int, default=int(os.getenv("AI_MAX_IN_FLIGHT", 8)))
+    parser.add_argument('--json', help="Write results to this file for later comparison")
+    add_mock_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
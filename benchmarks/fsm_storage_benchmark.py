@@ -0,0 +1,141 @@
+"""
+FSM Storage Benchmark
+
+Compares aiogram's MemoryStorage with SQLiteStorage (bot_services/fsm_storage.py)
+on the access pattern of a practice session: every click is a get_data,
+a couple of update_data calls and occasionally a set_state, spread over
+many concurrent users.
+
+Reports per-operation latency percentiles, plus for SQLite the on-disk
+size and flush cost. No Telegram or Firestore access is needed.
+
+Usage (from the repo root):
+    python -m benchmarks.fsm_storage_benchmark --users 2000 --clicks 20
+    python -m benchmarks.fsm_storage_benchmark --storage sqlite --json out.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from bot_services.fsm_storage import SQLiteStorage
+
+BOT_ID = 123456
+
+
+def _session_data(user: int) -> dict:
+    """Typical active-session state (card positions, counters, last MCQ options)."""
+    order = random.sample(range(400), 40)
+    return {
+        'target_id': f"set{user % 50}",
+        'set_version': "%016x" % random.getrandbits(64),
+        'order': bytes(b for p in order for b in p.to_bytes(4, 'little')),
+        'index': 0,
+        'score': 0,
+        'xp_earned': 0.0,
+        'mistakes': b"",
+        'mode': 'mix',
+        'reverse': False,
+        'is_retry': False,
+        'mcq_options': [f"option {i} for user {user}" for i in range(4)],
+        'mcq_correct_index': 0,
+    }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def _run(storage, args) -> dict:
+    timings = {'get_data': [], 'update_data': [], 'set_state': [], 'get_state': []}
+
+    async def timed(op, coro):
+        started = time.perf_counter()
+        result = await coro
+        timings[op].append(time.perf_counter() - started)
+        return result
+
+    keys = [StorageKey(bot_id=BOT_ID, chat_id=u, user_id=u) for u in range(args.users)]
+    for u, key in enumerate(keys):
+        await timed('set_state', storage.set_state(key, "PracticeStates:active_session"))
+        await timed('update_data', storage.update_data(key, _session_data(u)))
+
+    started = time.perf_counter()
+    for _ in range(args.clicks):
+        for key in random.sample(keys, len(keys)):
+            await timed('get_state', storage.get_state(key))
+            data = await timed('get_data', storage.get_data(key))
+            await timed('update_data', storage.update_data(key, {'index': data['index'] + 1, 'mix_is_correct': True}))
+            await timed('update_data', storage.update_data(key, {'score': data['score'] + 1}))
+        await asyncio.sleep(0)  # Let the flusher run between rounds
+    elapsed = time.perf_counter() - started
+
+    result = {'elapsed_s': round(elapsed, 3), 'ops': {}}
+    for op, values in timings.items():
+        values.sort()
+        result['ops'][op] = {
+            'count': len(values),
+            'p50_us': round(_percentile(values, 50) * 1e6, 1),
+            'p95_us': round(_percentile(values, 95) * 1e6, 1),
+            'p99_us': round(_percentile(values, 99) * 1e6, 1),
+        }
+    return result
+
+
+async def main(args):
+    results = {}
+    if args.storage in ('memory', 'both'):
+        storage = MemoryStorage()
+        results['memory'] = await _run(storage, args)
+        await storage.close()
+
+    if args.storage in ('sqlite', 'both'):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "fsm_bench.db")
+            storage = SQLiteStorage(path=path, flush_interval=args.flush_interval)
+            results['sqlite'] = await _run(storage, args)
+            started = time.perf_counter()
+            await storage.close()
+            results['sqlite']['final_flush_s'] = round(time.perf_counter() - started, 3)
+            results['sqlite']['db_bytes'] = sum(
+                os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp)
+            )
+
+            # Restart: state must still be there
+            reopened = SQLiteStorage(path=path)
+            key = StorageKey(bot_id=BOT_ID, chat_id=0, user_id=0)
+            results['sqlite']['survives_restart'] = bool(await reopened.get_data(key))
+            await reopened.close()
+
+    for name, r in results.items():
+        print(f"\n📊 {name}: {args.users} users x {args.clicks} clicks in {r['elapsed_s']}s")
+        for op, s in r['ops'].items():
+            print(f"• {op:<12} p50 {s['p50_us']}µs / p95 {s['p95_us']}µs / p99 {s['p99_us']}µs  ({s['count']} ops)")
+        if 'db_bytes' in r:
+            print(f"• On disk: {r['db_bytes'] / 1024:.0f} KB | final flush {r['final_flush_s']}s | "
+                  f"survives restart: {r['survives_restart']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare MemoryStorage and SQLiteStorage latency")
+    parser.add_argument('--storage', choices=['memory', 'sqlite', 'both'], default='both')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--clicks', type=int, default=20, help="Clicks per user")
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--json', help="Write results to this file for later comparison")
+    asyncio.run(main(parser.parse_args()))
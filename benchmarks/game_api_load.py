@@ -0,0 +1,149 @@
+"""
+Game API Load Test
+
+Drives the game endpoints in main.py at a fixed request rate and checks
+that the bot's event loop stays responsive meanwhile. The aiohttp server
+shares the loop with Telegram update processing, so the latency of the
+trivial health check ('/') is the stand-in for update latency: it is
+measured idle first, then under game load, and should stay flat.
+
+Read endpoints only by default. --writes adds submit_score for the given
+test user (this writes real scores and awards TX/XP to that user).
+
+Usage (against a running bot):
+    python -m benchmarks.game_api_load --url http://localhost:8080 --rps 200 --seconds 30
+    python -m benchmarks.game_api_load --writes --user-id 123 --json out.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+READ_ENDPOINTS = [
+    ('GET', '/api/game/leaderboard?period=daily'),
+    ('GET', '/api/game/leaderboard?period=weekly'),
+    ('GET', '/api/game/daily_challenge'),
+    ('GET', '/api/game/user_stats'),
+]
+PROBE_INTERVAL = 0.05
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'p50_ms': round(_percentile(values, 50) * 1000, 1),
+        'p95_ms': round(_percentile(values, 95) * 1000, 1),
+        'p99_ms': round(_percentile(values, 99) * 1000, 1),
+        'max_ms': round(values[-1] * 1000, 1) if values else 0.0,
+    }
+
+
+async def _timed(session, method, url, **kwargs):
+    started = time.perf_counter()
+    try:
+        async with session.request(method, url, **kwargs) as resp:
+            await resp.read()
+            ok = resp.status < 500
+    except aiohttp.ClientError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+async def _probe(session, base, seconds) -> list:
+    """Health-check latency sampled every PROBE_INTERVAL for `seconds`."""
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        elapsed, _ = await _timed(session, 'GET', base + '/')
+        samples.append(elapsed)
+        await asyncio.sleep(PROBE_INTERVAL)
+    return samples
+
+
+async def _load(session, base, args, endpoints) -> dict:
+    """Open-loop load: requests start on schedule whether or not earlier ones finished."""
+    results = {path: [] for _, path in endpoints}
+    errors = 0
+    headers = {'X-User-Id': str(args.user_id)}
+
+    async def one(method, path):
+        nonlocal errors
+        kwargs = {'headers': headers}
+        if method == 'POST':
+            kwargs['json'] = {'score': random.randint(50, 900), 'words': random.randint(1, 20), 'level': 1}
+        elapsed, ok = await _timed(session, method, base + path, **kwargs)
+        results[path].append(elapsed)
+        errors += not ok
+
+    tasks = []
+    interval = 1.0 / args.rps
+    started = time.perf_counter()
+    for i in range(int(args.rps * args.seconds)):
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(*random.choice(endpoints))))
+    await asyncio.gather(*tasks)
+
+    return {
+        'sent': len(tasks),
+        'errors': errors,
+        'achieved_rps': round(len(tasks) / (time.perf_counter() - started), 1),
+        'endpoints': {path: _summary(v) for path, v in results.items()},
+    }
+
+
+async def main(args):
+    base = args.url.rstrip('/')
+    endpoints = list(READ_ENDPOINTS)
+    if args.writes:
+        endpoints.append(('POST', '/api/game/submit_score'))
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        print(f"⏱️ Idle probe for {args.idle_seconds}s...")
+        idle = await _probe(session, base, args.idle_seconds)
+
+        print(f"🎮 {args.rps} req/s for {args.seconds}s on {len(endpoints)} endpoints...")
+        load_task = asyncio.create_task(_load(session, base, args, endpoints))
+        loaded = await _probe(session, base, args.seconds)
+        load = await load_task
+
+    results = {'idle_probe': _summary(idle), 'loaded_probe': _summary(loaded), 'load': load}
+
+    print(f"\n📊 Event loop probe (health check)")
+    for name in ('idle_probe', 'loaded_probe'):
+        s = results[name]
+        print(f"• {name:<13} p50 {s['p50_ms']}ms / p95 {s['p95_ms']}ms / p99 {s['p99_ms']}ms / max {s['max_ms']}ms")
+    print(f"\n🎮 Game endpoints: {load['sent']} requests, {load['achieved_rps']} req/s, {load['errors']} errors")
+    for path, s in load['endpoints'].items():
+        print(f"• {path:<40} p50 {s['p50_ms']}ms / p95 {s['p95_ms']}ms / p99 {s['p99_ms']}ms ({s['count']})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the game API and watch event loop latency")
+    parser.add_argument('--url', default="http://localhost:8080")
+    parser.add_argument('--rps', type=float, default=200)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--idle-seconds', type=float, default=5)
+    parser.add_argument('--user-id', type=int, default=0, help="X-User-Id sent with every request")
+    parser.add_argument('--writes', action='store_true', help="Also call submit_score (writes real data)")
+    parser.add_argument('--json', help="Write results to this file for later comparison")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,151 @@
+"""
+Game API Throughput Benchmark
+
+Compares the old game/game_api.py pattern (a new event loop created and
+closed inside every request) with the persistent loop it runs on now.
+
+Two modes:
+- overhead: in-process, no network or Firestore. Runs the same async
+  service-style call (one run_sync hop to the thread pool) either with a
+  fresh loop per call or on one loop, and reports calls/sec.
+- http: closed-loop load against a running server (e.g. the old Flask
+  app from git history vs the new aiohttp one), reports requests/sec and
+  latency for one endpoint.
+
+Usage (from the repo root):
+    python -m benchmarks.game_api_rps overhead --calls 5000
+    python -m benchmarks.game_api_rps http --url http://localhost:8081 --path /api/health --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _blocking_call(work_s: float):
+    """Stand-in for a Firestore client call."""
+    if work_s:
+        time.sleep(work_s)
+    return {'first_name': 'Player'}
+
+
+async def _service_call(work_s: float):
+    """Same shape as firebase_service.get_user: run_sync -> default executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(_blocking_call, work_s))
+
+
+def _bench_loop_per_call(calls: int, work_s: float) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_service_call(work_s))
+        loop.close()
+    return time.perf_counter() - started
+
+
+def _bench_persistent_loop(calls: int, work_s: float, concurrency: int) -> float:
+    async def run():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                await _service_call(work_s)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(calls)))
+        return time.perf_counter() - started
+
+    return asyncio.run(run())
+
+
+def overhead(args) -> dict:
+    work_s = args.work_ms / 1000
+    results = {
+        'loop_per_call': _bench_loop_per_call(args.calls, work_s),
+        'persistent_sequential': _bench_persistent_loop(args.calls, work_s, 1),
+        'persistent_concurrent': _bench_persistent_loop(args.calls, work_s, args.concurrency),
+    }
+    print(f"\n📊 {args.calls} service calls ({args.work_ms}ms simulated Firestore work each)")
+    out = {}
+    for name, elapsed in results.items():
+        out[name] = {'elapsed_s': round(elapsed, 3), 'calls_per_s': round(args.calls / elapsed, 1)}
+        print(f"• {name:<22} {out[name]['calls_per_s']:>10} calls/s  ({out[name]['elapsed_s']}s)")
+    return out
+
+
+async def http(args) -> dict:
+    import aiohttp
+
+    latencies, errors = [], 0
+    url = args.url.rstrip('/') + args.path
+    headers = {'X-User-Id': str(args.user_id)} if args.user_id else {}
+    deadline = time.perf_counter() + args.seconds
+
+    async def worker(session):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    await resp.read()
+                    errors += resp.status >= 500
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    out = {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+        'p99_ms': round(_percentile(latencies, 99) * 1000, 1),
+    }
+    print(f"\n📊 {url} x{args.concurrency} for {args.seconds}s: {out['rps']} req/s, {out['errors']} errors")
+    print(f"• p50 {out['p50_ms']}ms / p95 {out['p95_ms']}ms / p99 {out['p99_ms']}ms ({out['requests']} requests)")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game API requests/sec before and after the persistent loop")
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    p = sub.add_parser('overhead', help="In-process loop-per-call vs persistent loop")
+    p.add_argument('--calls', type=int, default=5000)
+    p.add_argument('--work-ms', type=float, default=0.0, help="Simulated blocking work per call")
+    p.add_argument('--concurrency', type=int, default=32)
+    p.add_argument('--json')
+
+    p = sub.add_parser('http', help="Closed-loop load against a running server")
+    p.add_argument('--url', default="http://localhost:8081")
+    p.add_argument('--path', default="/api/health")
+    p.add_argument('--concurrency', type=int, default=50)
+    p.add_argument('--seconds', type=float, default=15)
+    p.add_argument('--user-id', type=int, default=0)
+    p.add_argument('--json')
+
+    args = parser.parse_args()
+    result = overhead(args) if args.mode == 'overhead' else asyncio.run(http(args))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
@@ -0,0 +1,249 @@
+"""
+Mock AI / Dictionary Server
+
+Local stand-in for the external APIs the bot calls, so the AI path can be
+measured without spending real quota:
+- Groq chat completions (POST /openai/v1/chat/completions, incl. SSE streaming)
+- dictionaryapi.dev     (GET /api/v2/entries/en/{word})
+- MyMemory              (GET /get?q=...&langpair=...)
+
+Responses are canned but parse like the real ones. Latency, 429 and 5xx
+rates are configurable. GET /__stats returns per-endpoint counters,
+POST /__reset clears them.
+
+Point the bot at it with:
+    GROQ_API_BASE=http://127.0.0.1:8089/openai/v1
+    DICTIONARY_API_BASE=http://127.0.0.1:8089
+    MYMEMORY_API_BASE=http://127.0.0.1:8089
+
+Run standalone:
+    python -m benchmarks.mock_ai_server --port 8089 --groq-latency lognormal:0.8,0.5 --rate-limit 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+from collections import defaultdict
+
+from aiohttp import web
+
+
+# ===== LATENCY DISTRIBUTIONS =====
+class Latency:
+    """
+    Parsed from a spec string:
+        fixed:0.5            always 0.5s
+        uniform:0.2,1.0      uniform between 0.2s and 1.0s
+        lognormal:0.8,0.5    median 0.8s, sigma 0.5 (long right tail like real LLM APIs)
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        self.spec = spec
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',') if p]
+
+    def sample(self) -> float:
+        if self.kind == 'uniform':
+            return random.uniform(self.params[0], self.params[1])
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return random.lognormvariate(math.log(median), sigma)
+        return self.params[0] if self.params else 0.0
+
+
+class MockConfig:
+    def __init__(self, groq_latency="lognormal:0.8,0.5", dict_latency="uniform:0.05,0.3",
+                 mymemory_latency="uniform:0.1,0.5", rate_limit=0.0, error_rate=0.0,
+                 token_interval=0.02, dict_miss_rate=0.1):
+        self.groq_latency = Latency(groq_latency)
+        self.dict_latency = Latency(dict_latency)
+        self.mymemory_latency = Latency(mymemory_latency)
+        self.rate_limit = rate_limit          # Probability of a 429 per Groq call
+        self.error_rate = error_rate          # Probability of a 500 per Groq call
+        self.token_interval = token_interval  # Seconds between streamed chunks
+        self.dict_miss_rate = dict_miss_rate  # Probability dictionaryapi.dev returns 404
+
+
+# ===== CANNED GROQ CONTENT =====
+def _canned_content(prompt: str) -> str:
+    """Pick a response in the format the calling prompt asks for."""
+    word_match = re.search(r'"([^"]+)"', prompt)
+    word = word_match.group(1) if word_match else "word"
+
+    if 'ENG:' in prompt and 'UZB:' in prompt:
+        # Quiz explanation(s): answer every numbered item if it's a batch prompt
+        items = list(dict.fromkeys(re.findall(r'^(\d+)\. "', prompt, re.MULTILINE)))
+        if items:
+            return "\n".join(f"{n}. ENG: A short explanation of item {n}\n{n}. UZB: tarjima {n}" for n in items)
+        return f"ENG: A short explanation of {word}\nUZB: {word} tarjimasi"
+
+    if 'multiple choice quiz questions' in prompt:
+        count_match = re.search(r'Generate (\d+) multiple choice', prompt)
+        count = int(count_match.group(1)) if count_match else 8
+        return "\n\n".join(
+            f"Q{i}: Mock question {i} about {word}?\n"
+            f"A) Correct answer {i} - CORRECT\nB) Wrong answer {i}a\nC) Wrong answer {i}b\nD) Wrong answer {i}c"
+            for i in range(1, count + 1)
+        )
+
+    if 'PHONETIC:' in prompt:
+        return (
+            f"DEFINITION: The meaning of {word} in plain English.\n"
+            f"TRANSLATION: {word} (uz)\n"
+            f"PHONETIC: /{word}/\n"
+            f"EXAMPLE1: I used {word} in a sentence.\n"
+            f"EXAMPLE2: Another sentence with {word}."
+        )
+
+    if 'DEFINITION:' in prompt:
+        return (
+            f"DEFINITION: The meaning of {word} in plain English.\n"
+            f"TRANSLATION: {word} (uz)\n"
+            f"EXAMPLE1: I used {word} in a sentence.\n"
+            f"EXAMPLE2: Another sentence with {word}."
+        )
+
+    return f"An enhanced, educational definition of {word}."
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+# ===== HANDLERS =====
+class MockAIServer:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.stats = defaultdict(lambda: defaultdict(int))  # {endpoint: {status: count}}
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/openai/v1/chat/completions', self.chat_completions)
+        app.router.add_get('/api/v2/entries/en/{word}', self.dictionary)
+        app.router.add_get('/get', self.mymemory)
+        app.router.add_get('/__stats', self.get_stats)
+        app.router.add_post('/__reset', self.reset_stats)
+        return app
+
+    def _count(self, endpoint: str, status: int):
+        self.stats[endpoint]['total'] += 1
+        self.stats[endpoint][str(status)] += 1
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        await asyncio.sleep(self.config.groq_latency.sample())
+
+        roll = random.random()
+        if roll < self.config.rate_limit:
+            self._count('groq', 429)
+            return web.json_response({"error": {"message": "Rate limit reached (mock)"}}, status=429)
+        if roll < self.config.rate_limit + self.config.error_rate:
+            self._count('groq', 500)
+            return web.json_response({"error": {"message": "Internal error (mock)"}}, status=500)
+
+        prompt = "\n".join(m.get('content', '') for m in payload.get('messages', []))
+        content = _canned_content(prompt)
+        usage = {
+            "prompt_tokens": _estimate_tokens(prompt),
+            "completion_tokens": _estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self._count('groq', 200)
+
+        if not payload.get('stream'):
+            return web.json_response({
+                "id": "mock-completion",
+                "model": payload.get('model'),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        # SSE: emit the content in small chunks, usage on the final chunk
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        pieces = re.findall(r'\S+\s*|\s+', content)
+        for i in range(0, len(pieces), 3):
+            chunk = {"choices": [{"index": 0, "delta": {"content": "".join(pieces[i:i + 3])}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(self.config.token_interval)
+        final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        await response.write(f"data: {json.dumps(final)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def dictionary(self, request: web.Request) -> web.Response:
+        word = request.match_info['word']
+        await asyncio.sleep(self.config.dict_latency.sample())
+        if random.random() < self.config.dict_miss_rate:
+            self._count('dictionary', 404)
+            return web.json_response({"title": "No Definitions Found"}, status=404)
+        self._count('dictionary', 200)
+        return web.json_response([{
+            "word": word,
+            "phonetic": f"/{word}/",
+            "meanings": [{
+                "partOfSpeech": "noun",
+                "definitions": [{"definition": f"A mock definition of {word}.", "example": f"This is {word}."}]
+            }]
+        }])
+
+    async def mymemory(self, request: web.Request) -> web.Response:
+        text = request.query.get('q', '')
+        await asyncio.sleep(self.config.mymemory_latency.sample())
+        self._count('mymemory', 200)
+        return web.json_response({"responseStatus": 200, "responseData": {"translatedText": f"{text} (tr)"}})
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({name: dict(counts) for name, counts in self.stats.items()})
+
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.stats.clear()
+        return web.json_response({"ok": True})
+
+
+async def start_mock_server(config: MockConfig, host: str = "127.0.0.1", port: int = 8089):
+    """Start the server on the running loop. Returns (server, runner)."""
+    server = MockAIServer(config)
+    runner = web.AppRunner(server.build_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return server, runner
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--groq-latency', default="lognormal:0.8,0.5", help="fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA")
+    parser.add_argument('--dict-latency', default="uniform:0.05,0.3")
+    parser.add_argument('--mymemory-latency', default="uniform:0.1,0.5")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="Probability of a 429 per Groq call")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Probability of a 500 per Groq call")
+    parser.add_argument('--token-interval', type=float, default=0.02, help="Seconds between streamed chunks")
+    parser.add_argument('--dict-miss-rate', type=float, default=0.1)
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        groq_latency=args.groq_latency,
+        dict_latency=args.dict_latency,
+        mymemory_latency=args.mymemory_latency,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        token_interval=args.token_interval,
+        dict_miss_rate=args.dict_miss_rate,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Groq / dictionary / MyMemory server")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8089)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    app = MockAIServer(config_from_args(args)).build_app()
+    print(f"🧪 Mock AI server on http://{args.host}:{args.port}")
+    web.run_app(app, host=args.host, port=args.port)
@@ -0,0 +1,144 @@
+"""
+Hexagame Static Asset Benchmark
+
+Loads the game's page (index.html + the CSS/JS it references) from an
+in-process aiohttp server, serving either the old way (FileResponse from
+disk, no compression) or from bot_services/static_assets.py (in memory,
+fingerprinted, gzip/brotli, ETag). Reports per page load:
+- cold: empty browser cache, every file fetched in full
+- warm: cache primed by the cold load; revalidated files send
+  If-None-Match, immutable (hashed) files are not requested at all
+
+Usage (from the repo root):
+    python -m benchmarks.static_assets_load --loads 200
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import re
+import time
+
+import aiohttp
+from aiohttp import web
+
+from bot_services.static_assets import HEXAGAME_DIR, StaticAssets
+
+ASSET_REF = re.compile(r'(?:href|src)="(?!https?:)([^"]+)"')
+
+
+def _file_app() -> web.Application:
+    async def serve(request):
+        return web.FileResponse(os.path.join(HEXAGAME_DIR, request.match_info['path'] or 'index.html'))
+    app = web.Application()
+    app.router.add_get('/game/{path:.*}', serve)
+    return app
+
+
+def _memory_app() -> web.Application:
+    assets = StaticAssets(HEXAGAME_DIR)
+    assets.assets
+
+    async def serve(request):
+        return assets.response(request, request.match_info['path'] or 'index.html') or web.HTTPNotFound()
+    app = web.Application()
+    app.router.add_get('/game/{path:.*}', serve)
+    return app
+
+
+def _decode(raw: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.decompress(raw)
+    if encoding == 'br':
+        import brotli
+        return brotli.decompress(raw)
+    return raw
+
+
+async def _page_load(session, base: str, cache: dict) -> tuple:
+    """One page load with a browser-like cache. Returns (seconds, body bytes on the wire, requests)."""
+    wire, requests = 0, 0
+
+    async def fetch(path):
+        nonlocal wire, requests
+        cached = cache.get(path)
+        if cached and 'immutable' in cached['cache_control']:
+            return cached['body']
+        headers = {'Accept-Encoding': 'gzip, br'}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        async with session.get(base + path, headers=headers) as resp:
+            raw = await resp.read()   # As sent (auto_decompress is off)
+            wire += len(raw)
+            requests += 1
+            if resp.status == 304:
+                return cached['body']
+            cache[path] = {
+                'body': _decode(raw, resp.headers.get('Content-Encoding', '')),
+                'etag': resp.headers.get('ETag'),
+                'cache_control': resp.headers.get('Cache-Control', ''),
+            }
+            return cache[path]['body']
+
+    started = time.perf_counter()
+    html = (await fetch('')).decode('utf-8')
+    await asyncio.gather(*(fetch(ref) for ref in ASSET_REF.findall(html)))
+    return time.perf_counter() - started, wire, requests
+
+
+async def _bench(name: str, app: web.Application, loads: int) -> dict:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}/game/"
+
+    out = {}
+    async with aiohttp.ClientSession(auto_decompress=False) as session:
+        for mode in ('cold', 'warm'):
+            primed = {}
+            if mode == 'warm':
+                await _page_load(session, base, primed)
+            times, wire, requests = [], 0, 0
+            for _ in range(loads):
+                cache = dict(primed)
+                elapsed, nbytes, nreq = await _page_load(session, base, cache)
+                times.append(elapsed)
+                wire += nbytes
+                requests += nreq
+            times.sort()
+            out[mode] = {
+                'p50_ms': round(times[len(times) // 2] * 1000, 2),
+                'mean_ms': round(sum(times) / len(times) * 1000, 2),
+                'bytes_per_load': wire // loads,
+                'requests_per_load': round(requests / loads, 1),
+            }
+            r = out[mode]
+            print(f"• {name:<8} {mode}: p50 {r['p50_ms']}ms, mean {r['mean_ms']}ms, "
+                  f"{r['bytes_per_load']} bytes, {r['requests_per_load']} requests per load")
+    await runner.cleanup()
+    return out
+
+
+async def main(args) -> dict:
+    print(f"\n📊 {args.loads} page loads of {HEXAGAME_DIR}")
+    return {
+        'file': await _bench('file', _file_app(), args.loads),
+        'memory': await _bench('memory', _memory_app(), args.loads),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hexagame page load: FileResponse vs in-memory pre-compressed assets")
+    parser.add_argument('--loads', type=int, default=200)
+    parser.add_argument('--json')
+    args = parser.parse_args()
+
+    result = asyncio.run(main(args))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
@@ -5,9 +5,7 @@ from bot_services.translator import tr
 from bot_services.firebase_service import get_user, create_set, add_total_xp, add_tx_coins, get_user_folders, get_bot_config
 from bot_services.utils import AddCardStates, get_cancel_kb, get_home_kb
 from bot_services.ai_service import generate_card_content
-import io
-import csv
-from docx import Document
+from bot_services.ingestion import download_document, extract_document_text, IngestionError
 
 router = Router()
 
@@ -163,33 +161,14 @@ async def handle_file_upload(message: types.Message, state: FSMContext, bot: Bot
         await message.answer("❌ Please upload a .csv, .txt, or .docx file.")
         return
 
-    file_info = await bot.get_file(doc.file_id)
-    downloaded_file = await bot.download_file(file_info.file_path)
-    
-    # Extract content based on file type
-    if file_name.endswith('.docx'):
-        # Extract text from DOCX
-        docx_file = Document(io.BytesIO(downloaded_file.read()))
-        lines = [p.text for p in docx_file.paragraphs if p.text.strip()]
-        content = '\n'.join(lines)
-    else:
-        # CSV or TXT - both are plain text
-        content = downloaded_file.read().decode('utf-8')
-    csv_reader = csv.reader(io.StringIO(content))
+    # Download into memory and parse off the event loop
+    try:
+        data = await download_document(bot, doc)
+        content = await extract_document_text(data, file_name)
+    except IngestionError as e:
+        await message.answer(f"❌ {e}")
+        return
     
-    cards = []
-    for row in csv_reader:
-        if len(row) >= 2:
-            # If more than 2 columns, join the rest as definition? 
-            # User asked: "if the file is comma separated and also definitions contain commas, separate the term and definition from the first comma"
-            # csv.reader handles quoted fields with commas correctly. 
-            # But if it's a raw text file without quotes, we might need manual split.
-            # Let's trust csv.reader for standard CSVs.
-            # But wait, user said "accept '/' separated files".
-            # If it's not a standard CSV, we should parse manually line by line?
-            # Let's try to detect.
-            pass
-
     # Re-implementing manual parsing for flexibility as requested
     content_lines = content.splitlines()
     cards = []
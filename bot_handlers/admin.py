@@ -2,14 +2,17 @@ from aiogram import Router, types, F, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from bot_services.firebase_service import get_global_stats, ban_user, unban_user, delete_user_data, get_all_users, ADMIN_IDS, get_bot_config, toggle_ai_feature, add_api_key, remove_api_key, block_user_ai, unblock_user_ai, get_public_requests, approve_public_request, reject_public_request, get_users_details, get_banned_users, search_users, get_all_sets_admin, get_set, toggle_set_privacy, delete_set
-from bot_services.utils import AdminStates, get_cancel_kb, get_home_kb
+from bot_services.utils import AdminStates, get_cancel_kb, get_home_kb, escape_md
 from bot_services.translator import tr
 from bot_services import analytics_service
+from bot_services.message_edits import message_edits
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 import asyncio
 
 router = Router()
 
+BROADCAST_PROGRESS_EVERY = 20  # Users between progress updates of the status message
+
 # Helper to check admin from ID
 def is_admin(uid):
     return str(uid) in ADMIN_IDS
@@ -85,6 +88,11 @@ async def execute_user_search(message: types.Message, state: FSMContext):
         card_ai_today = 0
         daily_cards = 0
     
+    # Real token usage (last 7 days)
+    from bot_services.ai_usage import get_user_usage
+    token_usage = await get_user_usage(user_id, 7)
+    user_tokens = token_usage['prompt_tokens'] + token_usage['completion_tokens']
+    
     text = (
         f"👤 **User Found**\n\n"
         f"ID: `{user_id}`\n"
@@ -96,6 +104,7 @@ async def execute_user_search(message: types.Message, state: FSMContext):
         f"🔍 Vocab Search: {vocab_today}/{vocab_limit_day} today | {vocab_minute}/{vocab_limit_minute} /min\n"
         f"🤖 Card Gen: {card_ai_today}/{card_ai_limit} today\n"
         f"📝 AI Review: {daily_cards}/{daily_cards_limit} today\n"
+        f"🧮 Tokens (7d): {user_tokens:,} in {token_usage['requests']} requests\n"
     )
     
     kb = []
@@ -138,10 +147,54 @@ async def ai_settings_menu(call: types.CallbackQuery):
         [InlineKeyboardButton(text=f"Turn {'OFF' if is_enabled else 'ON'}", callback_data=f"adm_ai_toggle_{str(not is_enabled).lower()}")],
         [InlineKeyboardButton(text="🔑 Manage Keys", callback_data="adm_ai_keys")],
         [InlineKeyboardButton(text="🚫 Restricted Users", callback_data="adm_ai_users")],
+        [InlineKeyboardButton(text="🗃 Quiz Cache", callback_data="adm_quiz_cache")],
         [InlineKeyboardButton(text="🔙 Back", callback_data="admin_panel")]
     ])
     await call.message.edit_text(text, reply_markup=kb, parse_mode="Markdown")
 
+# --- AI QUIZ GENERATION CACHE ---
+@router.callback_query(F.data == "adm_quiz_cache")
+async def show_quiz_cache(call: types.CallbackQuery):
+    """List cached AI quiz topics (most served first) with invalidate buttons."""
+    if not is_admin(call.from_user.id):
+        return
+    
+    from bot_services.quiz_cache import list_cached_quizzes, MAX_VARIANTS, QUIZ_PROMPT_VERSION
+    entries = await list_cached_quizzes(15)
+    
+    text = f"🗃 **AI Quiz Cache** (prompt v{QUIZ_PROMPT_VERSION})\n\n"
+    kb = []
+    if not entries:
+        text += "_Cache is empty._"
+    for i, e in enumerate(entries, 1):
+        text += (
+            f"{i}. {escape_md(e['topic'][:30])} ({e['num_questions']}q, v{e['prompt_version']})\n"
+            f"   {e['variants']}/{MAX_VARIANTS} variants | {e['hits']} hits | {e['generations']} generated\n"
+        )
+        kb.append([InlineKeyboardButton(text=f"🗑 {i}. {e['topic'][:25]}", callback_data=f"adm_qc_del_{e['key']}")])
+    
+    kb.append([InlineKeyboardButton(text="🧹 Clear All", callback_data="adm_qc_clear")])
+    kb.append([InlineKeyboardButton(text="🔙 Back", callback_data="adm_ai_settings")])
+    await call.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb), parse_mode="Markdown")
+
+@router.callback_query(F.data.startswith("adm_qc_del_"))
+async def invalidate_quiz_cache_entry(call: types.CallbackQuery):
+    if not is_admin(call.from_user.id):
+        return
+    from bot_services.quiz_cache import invalidate_cached_quiz
+    await invalidate_cached_quiz(call.data.replace("adm_qc_del_", ""))
+    await call.answer("🗑 Entry invalidated")
+    await show_quiz_cache(call)
+
+@router.callback_query(F.data == "adm_qc_clear")
+async def clear_quiz_cache_all(call: types.CallbackQuery):
+    if not is_admin(call.from_user.id):
+        return
+    from bot_services.quiz_cache import clear_quiz_cache
+    deleted = await clear_quiz_cache()
+    await call.answer(f"🧹 Cleared {deleted} entries")
+    await show_quiz_cache(call)
+
 # --- PUBLIC REQUESTS ---
 @router.callback_query(F.data == "adm_public_requests")
 async def list_public_requests_root(call: types.CallbackQuery):
@@ -625,6 +678,7 @@ async def process_broadcast(message: types.Message, state: FSMContext, bot: Bot)
                 blocked += 1
             else:
                 failed += 1
+        _broadcast_progress(status_msg, success + failed + blocked, total, success)
             
     # 3. Report
     report = (
@@ -634,7 +688,7 @@ async def process_broadcast(message: types.Message, state: FSMContext, bot: Bot)
         f"🚫 Blocked: {blocked}\n"
         f"📊 Total: {total}"
     )
-    await status_msg.edit_text(report, reply_markup=get_home_kb(tr.languages[lang]), parse_mode="Markdown")
+    await message_edits.final(status_msg, report, reply_markup=get_home_kb(tr.languages[lang]), parse_mode="Markdown")
     await state.clear()
 
 @router.callback_query(F.data == "adm_broadcast_confirm")
@@ -678,6 +732,7 @@ async def confirm_broadcast(call: types.CallbackQuery, state: FSMContext, bot: B
                 blocked += 1
             else:
                 failed += 1
+        _broadcast_progress(call.message, success + failed + blocked, total, success)
     
     # Report
     lang = 'en'
@@ -688,9 +743,15 @@ async def confirm_broadcast(call: types.CallbackQuery, state: FSMContext, bot: B
         f"🚫 Blocked: {blocked}\n"
         f"📊 Total: {total}"
     )
-    await call.message.edit_text(report, reply_markup=get_home_kb(tr.languages[lang]), parse_mode="Markdown")
+    await message_edits.final(call.message, report, reply_markup=get_home_kb(tr.languages[lang]), parse_mode="Markdown")
     await state.clear()
 
+def _broadcast_progress(status_msg: types.Message, done: int, total: int, success: int):
+    """Live progress on the status message (coalesced, so every user can report)."""
+    if done % BROADCAST_PROGRESS_EVERY and done != total:
+        return
+    message_edits.update(status_msg, f"📤 Sending... {done}/{total} ({success} delivered)")
+
 # --- OTHER ADMIN COMMANDS ---
 @router.message(Command("ban"))
 async def ban_cmd(message: types.Message):
@@ -1194,6 +1255,39 @@ async def show_today_stats(call: types.CallbackQuery):
         text += f"🔥 **Active Features**\n"
         for feat, count in top_features:
             text += f"• {feat}: {count}\n"
+        text += "\n"
+    
+    # Live background write queue (this process only)
+    from bot_services.write_queue import write_queue
+    wq = write_queue.get_stats()
+    text += "💾 **Background Writes (live)**\n"
+    text += f"• Queued: {wq['depth']}/{wq['capacity']} (peak {wq['max_depth']}) on {wq['workers']} workers\n"
+    text += f"• Lag p50 {wq['p50_lag']}s / p95 {wq['p95_lag']}s / max {wq['max_lag']}s\n"
+    text += f"• Done {wq['completed']} | Retried {wq['retried']} | Failed {wq['failed']} | Dropped {wq['dropped']}\n"
+    
+    from bot_services.group_timers import group_timers
+    gt = group_timers.get_stats()
+    kinds = ", ".join(f"{k} {v}" for k, v in gt['by_kind'].items()) or "none"
+    text += "\n⏲️ **Group Quiz Timers (live)**\n"
+    text += f"• Pending: {gt['pending']} ({kinds})\n"
+    text += f"• Lag p50 {gt['p50_lag_ms']}ms / p95 {gt['p95_lag_ms']}ms / max {gt['max_lag_ms']}ms\n"
+    text += f"• Fired {gt['fired']} | Cancelled {gt['cancelled']} | Failed {gt['failed']}\n"
+    
+    me = message_edits.get_stats()
+    text += "\n✏️ **Message Edits (live)**\n"
+    text += f"• Requested {me['requested']} | Applied {me['applied']} | Coalesced {me['coalesced']}\n"
+    text += f"• RetryAfter {me['retry_after']} | Failed {me['failed']} | Waiting {me['pending']}\n"
+    
+    from bot_handlers.practice import card_latency_stats
+    cl = card_latency_stats()
+    text += "\n🃏 **Practice Card Latency (live)**\n"
+    for path, label in (('prerendered', 'Prerendered'), ('built', 'Built on click')):
+        text += f"• {label}: {cl[path]['cards']} cards, p50 {cl[path]['p50_ms']}ms / p95 {cl[path]['p95_ms']}ms\n"
+    
+    from bot_services.word_packs import word_packs
+    wp = word_packs.get_stats()
+    text += "\n🔤 **Game Word Packs (live)**\n"
+    text += f"• Cached {wp['packs']} | Hits {wp['hits']} | Built {wp['builds']}\n"
     
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔄 Refresh", callback_data="adm_analytics_today")],
@@ -1218,10 +1312,9 @@ async def show_ai_usage(call: types.CallbackQuery):
     today_stats = await get_ai_stats()
     today_requests = today_stats.get('total_requests', 0)
     today_tokens = today_stats.get('total_tokens', 0)
-    features = today_stats.get('features', {})
-    
-    card_gen = features.get('card_generation', 0)
-    vocab_lookup = features.get('vocab_lookup', 0)
+    today_prompt = today_stats.get('prompt_tokens', 0)
+    today_completion = today_stats.get('completion_tokens', 0)
+    feature_usage = today_stats.get('feature_usage', {})
     
     # Get 7-day stats
     weekly = await get_ai_stats_range(7)
@@ -1235,9 +1328,17 @@ async def show_ai_usage(call: types.CallbackQuery):
     
     text += "📅 **Today**\n"
     text += f"• Total Requests: **{today_requests}** / {DAILY_LIMIT}\n"
-    text += f"• Est. Tokens: ~{today_tokens:,}\n"
-    text += f"• Card Generation: {card_gen}\n"
-    text += f"• Vocab Lookups: {vocab_lookup}\n\n"
+    text += f"• Tokens: {today_tokens:,} ({today_prompt:,} in / {today_completion:,} out)\n"
+    top_usage = sorted(
+        feature_usage.items(),
+        key=lambda x: x[1].get('prompt_tokens', 0) + x[1].get('completion_tokens', 0),
+        reverse=True
+    )
+    for feat, usage in top_usage[:6]:
+        feat_tokens = usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0)
+        label = escape_md(feat.replace('_', ' ').capitalize())  # card_generation -> Card generation
+        text += f"• {label}: {usage.get('requests', 0)} req, {feat_tokens:,} tokens\n"
+    text += "\n"
     
     # Usage bar
     pct = min((today_requests / DAILY_LIMIT) * 100, 100) if DAILY_LIMIT > 0 else 0
@@ -1247,7 +1348,7 @@ async def show_ai_usage(call: types.CallbackQuery):
     
     text += "📊 **Last 7 Days**\n"
     text += f"• Total Requests: {week_requests:,}\n"
-    text += f"• Est. Tokens: ~{week_tokens:,}\n\n"
+    text += f"• Tokens: {week_tokens:,}\n\n"
     
     # Daily breakdown
     text += "📈 **Daily Breakdown**\n"
@@ -1256,6 +1357,18 @@ async def show_ai_usage(call: types.CallbackQuery):
         reqs = day.get('total_requests', 0)
         text += f"• {date}: {reqs} requests\n"
     
+    # Live scheduler state (this process only)
+    from bot_services.ai_scheduler import ai_scheduler
+    sched = ai_scheduler.get_stats()
+    text += "\n⏳ **Scheduler (live)**\n"
+    text += f"• In flight: {sched['in_flight']} | Queued: {sched['queued']}\n"
+    text += f"• Budget left: {sched['request_budget']}% req / {sched['token_budget']}% tokens\n"
+    for cls_name, cls in sched['classes'].items():
+        text += (
+            f"• {cls_name}: {cls['admitted']}/{cls['submitted']} ok, {cls['dropped']} dropped, "
+            f"wait p50 {cls['p50_wait']}s / p95 {cls['p95_wait']}s\n"
+        )
+    
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔄 Refresh", callback_data="adm_analytics_ai")],
         [InlineKeyboardButton(text="🔙 Back to Analytics", callback_data="adm_analytics")]
@@ -2,16 +2,24 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot_services.firebase_service import get_custom_quiz
-from bot_services.utils import get_home_kb
-import asyncio
+from bot_services.group_sessions import GroupSession, group_sessions
+from bot_services.group_timers import group_timers
+from bot_services.message_edits import message_edits
+from bot_services.utils import escape_md, get_home_kb
 
 router = Router()
 
-# Group play sessions stored in memory
-GROUP_SESSIONS = {}  # {chat_id: session_data}
+# Group play sessions: bot_services/group_sessions.py (poll index + snapshots for resume)
 
 LOBBY_DURATION = 20  # seconds to join
 MAX_EMPTY_ROUNDS = 2  # Stop quiz after this many unanswered questions
+FIRST_QUESTION_DELAY = 3
+TURBO_DELAY = 1  # Pause before the next question once everyone answered
+
+def end_group_session(chat_id: int):
+    """Forget a finished/stopped quiz and its pending timer."""
+    group_timers.cancel(chat_id)
+    group_sessions.remove(chat_id)
 
 @router.callback_query(F.data.startswith("host_group_"))
 async def start_group_host(call: types.CallbackQuery, state: FSMContext):
@@ -63,7 +71,7 @@ async def handle_group_quiz_start(message: types.Message):
     
     chat_id = message.chat.id
     
-    if chat_id in GROUP_SESSIONS:
+    if chat_id in group_sessions:
         await message.answer("⚠️ A quiz is already running! Use /stop to end it first.")
         return
     
@@ -71,18 +79,8 @@ async def handle_group_quiz_start(message: types.Message):
     questions = quiz.get('questions', [])
     
     # Initialize session
-    GROUP_SESSIONS[chat_id] = {
-        'quiz_id': quiz_id,
-        'quiz': quiz,
-        'current_q': 0,
-        'scores': {},
-        'participants': set(),
-        'answered': set(),
-        'timer': timer,
-        'empty_rounds': 0,
-        'stopped': False,
-        'host_id': message.from_user.id
-    }
+    session = GroupSession(chat_id, quiz_id, quiz, message.from_user.id, timer)
+    group_sessions.add(session)
     
     # Send lobby message
     lobby_msg = await message.answer(
@@ -97,42 +95,38 @@ async def handle_group_quiz_start(message: types.Message):
         parse_mode="Markdown"
     )
     
-    GROUP_SESSIONS[chat_id]['lobby_msg_id'] = lobby_msg.message_id
+    session.lobby_msg_id = lobby_msg.message_id
     
     # Start lobby countdown
-    await lobby_countdown(chat_id, message.bot, LOBBY_DURATION)
+    group_timers.schedule(chat_id, 'lobby', LOBBY_DURATION, close_lobby, chat_id, message.bot)
 
-async def lobby_countdown(chat_id: int, bot, duration: int):
-    """Countdown for lobby phase, then start quiz."""
-    await asyncio.sleep(duration)
-    
-    session = GROUP_SESSIONS.get(chat_id)
-    if not session or session.get('stopped'):
+async def close_lobby(chat_id: int, bot):
+    """Lobby timer fired: start the quiz (or cancel it if nobody joined)."""
+    session = group_sessions.get(chat_id)
+    if not session or session.stopped:
         return
     
-    participants = session['participants']
-    
-    if not participants:
+    if not session.participant_count:
+        end_group_session(chat_id)
         await bot.send_message(chat_id, "❌ No one joined! Quiz cancelled.")
-        del GROUP_SESSIONS[chat_id]
         return
     
+    session.phase = 'questions'
     await bot.send_message(
         chat_id,
         f"🚀 **Starting Quiz!**\n\n"
-        f"👥 {len(participants)} participant(s)\n"
-        f"_First question in 3 seconds..._",
+        f"👥 {session.participant_count} participant(s)\n"
+        f"_First question in {FIRST_QUESTION_DELAY} seconds..._",
         parse_mode="Markdown"
     )
     
-    await asyncio.sleep(3)
-    await send_group_question(chat_id, bot)
+    group_timers.schedule(chat_id, 'first_question', FIRST_QUESTION_DELAY, send_group_question, chat_id, bot)
 
 @router.callback_query(F.data.startswith("grp_join_"))
 async def handle_join(call: types.CallbackQuery):
     """Handle player joining the quiz lobby."""
     chat_id = int(call.data.replace("grp_join_", ""))
-    session = GROUP_SESSIONS.get(chat_id)
+    session = group_sessions.get(chat_id)
     
     if not session:
         await call.answer("This quiz has ended.", show_alert=True)
@@ -141,52 +135,46 @@ async def handle_join(call: types.CallbackQuery):
     user_id = call.from_user.id
     user_name = call.from_user.first_name or call.from_user.username or f"User_{user_id}"
     
-    if user_id in session['participants']:
+    if not session.join(user_id, user_name):
         await call.answer("You've already joined!", show_alert=False)
         return
     
-    session['participants'].add(user_id)
-    session['scores'][user_id] = {'score': 0, 'name': user_name}
+    await call.answer(f"✅ You joined! ({session.participant_count} players)", show_alert=False)
     
-    await call.answer(f"✅ You joined! ({len(session['participants'])} players)", show_alert=False)
-    
-    # Update lobby message
-    try:
-        quiz = session['quiz']
-        await call.message.edit_text(
-            f"🎮 **{quiz['title']}**\n\n"
-            f"❓ {len(quiz.get('questions', []))} questions | ⏱️ {session['timer']}s per question\n\n"
-            f"✋ **Click JOIN to participate!**\n"
-            f"_Lobby closes soon..._\n\n"
-            f"👥 Participants: **{len(session['participants'])}**",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(text="✋ JOIN", callback_data=f"grp_join_{chat_id}")]
-            ]),
-            parse_mode="Markdown"
-        )
-    except:
-        pass  # Message already updated or lobby ended
+    # Update lobby message (coalesced: a burst of joins becomes one edit)
+    quiz = session.quiz
+    message_edits.update(
+        call.message,
+        f"🎮 **{quiz['title']}**\n\n"
+        f"❓ {len(session.questions)} questions | ⏱️ {session.timer}s per question\n\n"
+        f"✋ **Click JOIN to participate!**\n"
+        f"_Lobby closes soon..._\n\n"
+        f"👥 Participants: **{session.participant_count}**",
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="✋ JOIN", callback_data=f"grp_join_{chat_id}")]
+        ]),
+        parse_mode="Markdown"
+    )
 
 # --- QUESTIONS ---
 async def send_group_question(chat_id: int, bot):
     """Send next question to the group as a poll."""
     import random
     
-    session = GROUP_SESSIONS.get(chat_id)
-    if not session or session.get('stopped'):
+    session = group_sessions.get(chat_id)
+    if not session or session.stopped:
         return
     
-    quiz = session['quiz']
-    q_idx = session['current_q']
-    questions = quiz.get('questions', [])
-    timer = session['timer']
+    q_idx = session.current_q
+    questions = session.questions
+    timer = session.timer
     
     if q_idx >= len(questions):
         await show_group_leaderboard(chat_id, bot)
         return
     
     # Check AFK
-    if session['empty_rounds'] >= MAX_EMPTY_ROUNDS:
+    if session.empty_rounds >= MAX_EMPTY_ROUNDS:
         await bot.send_message(
             chat_id,
             "🛑 **Quiz Stopped**\n\n_No one answered for multiple questions._",
@@ -203,9 +191,8 @@ async def send_group_question(chat_id: int, bot):
     random.shuffle(shuffled)
     correct_index = shuffled.index(correct_answer)
     
-    session['current_correct'] = correct_index
-    session['answered'] = set()
-    session['current_poll_id'] = None
+    session.start_question(correct_index)
+    group_sessions.set_poll(session, None)
     
     try:
         poll = await bot.send_poll(
@@ -217,41 +204,37 @@ async def send_group_question(chat_id: int, bot):
             is_anonymous=False,
             open_period=timer
         )
-        session['current_poll_id'] = poll.poll.id
+        group_sessions.set_poll(session, poll.poll.id)
         
         # Schedule timeout
-        asyncio.create_task(question_timeout(chat_id, bot, timer + 2, q_idx))
+        group_timers.schedule(chat_id, 'question', timer + 2, question_timeout, chat_id, bot, q_idx)
         
     except Exception as e:
         print(f"Group poll error: {e}")
         await bot.send_message(chat_id, f"❌ Error: {str(e)[:100]}")
 
-async def question_timeout(chat_id: int, bot, delay: int, expected_q_idx: int):
-    """Wait for poll to end, check if we need to advance."""
-    await asyncio.sleep(delay)
-    
-    session = GROUP_SESSIONS.get(chat_id)
-    if not session or session.get('stopped'):
+async def question_timeout(chat_id: int, bot, expected_q_idx: int):
+    """Question timer fired (poll closed): advance if nobody moved us on already."""
+    session = group_sessions.get(chat_id)
+    if not session or session.stopped:
         return
     
     # Only advance if we're still on the same question
-    if session['current_q'] != expected_q_idx:
+    if session.current_q != expected_q_idx:
         return
     
     # Track empty rounds
-    if not session['answered']:
-        session['empty_rounds'] += 1
+    if not session.answered:
+        session.empty_rounds += 1
     else:
-        session['empty_rounds'] = 0
+        session.empty_rounds = 0
     
-    session['current_q'] += 1
+    session.current_q += 1
     await send_group_question(chat_id, bot)
 
 def is_group_poll(poll_answer: types.PollAnswer) -> bool:
-    """Filter to check if this poll answer belongs to a group session."""
-    pid = poll_answer.poll_id
-    # Check if this poll ID exists in any active session
-    return any(s.get('current_poll_id') == pid for s in GROUP_SESSIONS.values())
+    """Filter to check if this poll answer belongs to a group session (O(1) index lookup)."""
+    return group_sessions.by_poll(poll_answer.poll_id) is not None
 
 @router.poll_answer(is_group_poll)
 async def handle_group_poll_answer(poll_answer: types.PollAnswer):
@@ -261,46 +244,32 @@ async def handle_group_poll_answer(poll_answer: types.PollAnswer):
     poll_id = poll_answer.poll_id
     selected = poll_answer.option_ids[0] if poll_answer.option_ids else -1
     
-    for chat_id, session in list(GROUP_SESSIONS.items()):
-        if session.get('current_poll_id') == poll_id:
-            # Only count participants
-            if user_id not in session['participants']:
-                session['participants'].add(user_id)
-                session['scores'][user_id] = {'score': 0, 'name': user_name}
-            
-            if user_id in session['answered']:
-                return
-            
-            session['answered'].add(user_id)
-            correct_idx = session.get('current_correct', -1)
-            
-            if selected == correct_idx:
-                session['scores'][user_id]['score'] += 1
-            
-            # TURBO MODE: Check if all participants answered
-            if session['answered'] >= session['participants']:
-                # Everyone answered - advance immediately!
-                session['empty_rounds'] = 0
-                session['current_q'] += 1
-                
-                # Small delay before next question
-                asyncio.create_task(turbo_advance(chat_id, poll_answer.bot))
-            
-            break
-
-async def turbo_advance(chat_id: int, bot):
-    """Advance to next question immediately (turbo mode)."""
-    await asyncio.sleep(1)  # Brief pause
-    session = GROUP_SESSIONS.get(chat_id)
-    if session and not session.get('stopped'):
-        await send_group_question(chat_id, bot)
+    session = group_sessions.by_poll(poll_id)
+    if not session:
+        return
+    
+    # Late joiners become participants
+    session.join(user_id, user_name)
+    
+    if not session.record_answer(user_id, selected):
+        return
+    
+    # TURBO MODE: Check if all participants answered
+    if session.all_answered():
+        # Everyone answered - advance immediately! (old poll stops counting)
+        session.empty_rounds = 0
+        session.current_q += 1
+        group_sessions.set_poll(session, None)
+        
+        # Small delay before next question (replaces the question timeout)
+        group_timers.schedule(session.chat_id, 'turbo', TURBO_DELAY, send_group_question, session.chat_id, poll_answer.bot)
 
 # --- STOP COMMAND ---
 @router.message(F.chat.type.in_({"group", "supergroup"}), F.text.regexp(r"^/stop(@\w+)?$"))
 async def handle_stop_command(message: types.Message):
     """Stop the current quiz in the group."""
     chat_id = message.chat.id
-    session = GROUP_SESSIONS.get(chat_id)
+    session = group_sessions.get(chat_id)
     
     if not session:
         await message.reply("❌ No quiz is running in this group.")
@@ -308,7 +277,7 @@ async def handle_stop_command(message: types.Message):
     
     # Check if user is host or admin
     user_id = message.from_user.id
-    is_host = session.get('host_id') == user_id
+    is_host = session.host_id == user_id
     
     try:
         member = await message.bot.get_chat_member(chat_id, user_id)
@@ -320,51 +289,154 @@ async def handle_stop_command(message: types.Message):
         await message.reply("⚠️ Only the quiz host or group admins can stop the quiz.")
         return
     
-    session['stopped'] = True
+    session.stopped = True
+    group_timers.cancel(chat_id)
     
     await message.reply("🛑 **Quiz stopped!**\n\n_Showing final results..._", parse_mode="Markdown")
     await show_group_leaderboard(chat_id, message.bot)
 
 # --- LEADERBOARD ---
+LEADERBOARD_SIZE = 10
+
 async def show_group_leaderboard(chat_id: int, bot):
-    """Show final leaderboard for group quiz."""
-    session = GROUP_SESSIONS.get(chat_id)
+    """Show final leaderboard for group quiz and persist the results."""
+    session = group_sessions.get(chat_id)
     if not session:
         return
     
-    scores = session['scores']
-    quiz = session['quiz']
-    total_q = len(quiz.get('questions', []))
-    current_q = session.get('current_q', total_q)
+    quiz = session.quiz
+    total_q = len(session.questions)
+    current_q = session.current_q
     
-    if not scores:
+    if not session.scores:
+        end_group_session(chat_id)
         await bot.send_message(
             chat_id, 
             "📊 **Quiz Ended!**\n\nNo participants.",
             parse_mode="Markdown"
         )
-        del GROUP_SESSIONS[chat_id]
         return
     
-    sorted_scores = sorted(scores.items(), key=lambda x: x[1]['score'], reverse=True)
+    # Persist scores, group leaderboard and question difficulty in one batch
+    from bot_services.firebase_service import save_group_quiz_result
+    from bot_services.write_queue import write_queue
+    await write_queue.submit(chat_id, 'group_result', save_group_quiz_result, session.result())
+    
+    top = session.top_players(LEADERBOARD_SIZE)
     
     text = f"🏆 **{quiz['title']}** - Final Results\n"
     text += f"_Completed {current_q}/{total_q} questions_\n\n"
     
     medals = ["🥇", "🥈", "🥉"]
-    for idx, (user_id, data) in enumerate(sorted_scores[:10]):
+    for idx, (user_id, score) in enumerate(top):
         medal = medals[idx] if idx < 3 else f"{idx+1}."
-        name = data['name'][:15]
-        score = data['score']
+        name = session.names.get(user_id, f"User_{user_id}")[:15]
         pct = int(score / current_q * 100) if current_q else 0
         text += f"{medal} **{name}**: {score}/{current_q} ({pct}%)\n"
     
-    if len(sorted_scores) > 0:
-        winner = sorted_scores[0][1]['name']
+    if top:
+        winner = session.names.get(top[0][0], f"User_{top[0][0]}")
         text += f"\n🎉 **Winner: {winner}!**"
     
-    text += "\n\n_Thanks for playing! 🎮_"
+    text += "\n\n_Thanks for playing! 🎮 Group ranking: /top · Your rating: /rating_"
     
+    end_group_session(chat_id)
     await bot.send_message(chat_id, text, parse_mode="Markdown")
+
+@router.message(F.chat.type.in_({"group", "supergroup"}), F.text.regexp(r"^/top(@\w+)?$"))
+async def handle_group_top(message: types.Message):
+    """All-time leaderboard of this group (totals over every quiz played here)."""
+    from bot_services.firebase_service import get_group_leaderboard
+    players = await get_group_leaderboard(message.chat.id, LEADERBOARD_SIZE)
+    
+    if not players:
+        await message.reply("📊 No group quizzes finished here yet.")
+        return
+    
+    text = "🏆 **Group Leaderboard**\n\n"
+    medals = ["🥇", "🥈", "🥉"]
+    for idx, p in enumerate(players):
+        medal = medals[idx] if idx < 3 else f"{idx+1}."
+        text += f"{medal} **{p.get('name', 'Player')[:15]}**: {p.get('score', 0)} pts"
+        text += f" · {p.get('games', 0)} games · {p.get('wins', 0)} wins\n"
+    
+    await message.reply(text, parse_mode="Markdown")
+
+@router.message(F.text.regexp(r"^/rating(@\w+)?$"))
+async def handle_group_rating(message: types.Message):
+    """Cross-group rating: the caller's totals over every group quiz, plus the overall top."""
+    from bot_services.firebase_service import get_group_rating
+    mine, players = await get_group_rating(message.from_user.id, LEADERBOARD_SIZE)
+    
+    if not players:
+        await message.reply("📊 No group quizzes finished yet.")
+        return
+    
+    text = "🌍 **Group Quiz Rating** (all groups)\n\n"
+    medals = ["🥇", "🥈", "🥉"]
+    for idx, p in enumerate(players):
+        medal = medals[idx] if idx < 3 else f"{idx+1}."
+        text += f"{medal} **{escape_md(p.get('name', 'Player')[:15])}**: {p.get('score', 0)} pts"
+        text += f" · {p.get('wins', 0)} wins\n"
+    
+    if mine:
+        text += (
+            f"\n👤 **You**: {mine.get('score', 0)} pts · {mine.get('games', 0)} games · "
+            f"{mine.get('wins', 0)} wins in {len(mine.get('groups', []))} groups"
+        )
+    else:
+        text += "\n👤 _Play a group quiz to get rated._"
+    
+    await message.reply(text, parse_mode="Markdown")
+
+# --- RESUME AFTER RESTART ---
+async def resume_group_sessions(bot):
+    """Restore quizzes that were running when the bot stopped (called once from main.py)."""
+    try:
+        snapshots = await group_sessions.load_snapshots()
+    except Exception as e:
+        print(f"Group session resume failed: {e}")
+        return
     
-    del GROUP_SESSIONS[chat_id]
+    for snap in snapshots:
+        chat_id = snap['chat_id']
+        quiz = await get_custom_quiz(snap['quiz_id'])
+        if chat_id in group_sessions:
+            continue  # A new quiz already started there
+        if not quiz:
+            group_sessions.remove(chat_id)  # Drops the snapshot
+            continue
+        
+        session = GroupSession.from_snapshot(snap, quiz)
+        group_sessions.add(session)
+        
+        try:
+            if session.phase == 'lobby':
+                msg = await bot.send_message(
+                    chat_id,
+                    f"♻️ **{quiz['title']}** - the bot restarted, lobby reopened!\n\n"
+                    f"✋ **Click JOIN to participate!**\n"
+                    f"_Lobby closes in {LOBBY_DURATION} seconds..._\n\n"
+                    f"👥 Participants: **{session.participant_count}**",
+                    reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                        [InlineKeyboardButton(text="✋ JOIN", callback_data=f"grp_join_{chat_id}")]
+                    ]),
+                    parse_mode="Markdown"
+                )
+                session.lobby_msg_id = msg.message_id
+                group_timers.schedule(chat_id, 'lobby', LOBBY_DURATION, close_lobby, chat_id, bot)
+            else:
+                await bot.send_message(
+                    chat_id,
+                    f"♻️ **{quiz['title']}** - the bot restarted, resuming from question "
+                    f"{session.current_q + 1}/{len(session.questions)}.\n_Scores were kept._",
+                    parse_mode="Markdown"
+                )
+                group_timers.schedule(chat_id, 'first_question', FIRST_QUESTION_DELAY, send_group_question, chat_id, bot)
+        except Exception as e:
+            # Bot removed from the group, chat gone...
+            print(f"Could not resume group quiz in {chat_id}: {e}")
+            end_group_session(chat_id)
+    
+    if snapshots:
+        print(f"♻️ Resumed {len(group_sessions)} group quiz session(s)")
@@ -664,7 +664,7 @@ async def process_card_definition(message: types.Message, state: FSMContext):
     
     # Update card in Firebase
     # Cards are stored in subcollection: sets/{set_id}/cards/{card_id}
-    from bot_services.firebase_service import db
+    from bot_services.firebase_service import update_set_card
     cards = await get_set_cards(set_id)
     card_index = data.get('edit_card_index')
     
@@ -672,11 +672,8 @@ async def process_card_definition(message: types.Message, state: FSMContext):
         card = cards[card_index]
         card_id = card.get('card_id')
         
-        # Update the card
-        db.collection('sets').document(set_id).collection('cards').document(card_id).update({
-            "term": new_term,
-            "definition": new_definition
-        })
+        # Update the card (also invalidates the set's cached snapshot)
+        await update_set_card(set_id, card_id, term=new_term, definition=new_definition)
         
         await message.answer(
             f"✅ Card #{card_index+1} updated!\n\n**{new_term}** → {new_definition}",
@@ -1804,6 +1801,27 @@ async def browse_custom_quizzes(call: types.CallbackQuery, state: FSMContext):
     
     await call.message.edit_text(text, reply_markup=kb, parse_mode="Markdown")
 
+def _group_difficulty_text(quiz: dict) -> str:
+    """Accuracy from group games (question_stats) and the hardest question, if any."""
+    from bot_services.group_sessions import question_key
+    stats = quiz.get('question_stats') or {}
+    answers = sum(q.get('answers', 0) for q in stats.values())
+    if not answers:
+        return ""
+    correct = sum(q.get('correct', 0) for q in stats.values())
+    text = f"👥 Group games: {quiz.get('group_plays', 0)} · accuracy {correct * 100 // answers}%\n"
+    
+    hardest = None
+    for idx, q in enumerate(quiz.get('questions', [])):
+        s = stats.get(question_key(q))
+        if s and s.get('answers', 0) >= 3:
+            acc = s.get('correct', 0) / s['answers']
+            if hardest is None or acc < hardest[0]:
+                hardest = (acc, idx)
+    if hardest:
+        text += f"🧩 Hardest: Q{hardest[1] + 1} ({int(hardest[0] * 100)}% correct)\n"
+    return text
+
 @router.callback_query(F.data.startswith("act_cust_quiz_"))
 async def custom_quiz_actions(call: types.CallbackQuery, state: FSMContext):
     quiz_id = call.data.replace("act_cust_quiz_", "")
@@ -1841,7 +1859,8 @@ async def custom_quiz_actions(call: types.CallbackQuery, state: FSMContext):
         f"❓ Questions: {len(quiz.get('questions', []))}\n"
         f"▶️ Plays: {quiz.get('plays', 0)}\n"
         f"⏱️ Timer: {timer_text}\n"
-        f"⭐ Rating: {rating_text}\n\n"
+        f"⭐ Rating: {rating_text}\n"
+        f"{_group_difficulty_text(quiz)}\n"
         f"🔗 Share Link:\n`{share_link}`"
     )
     
@@ -1,5 +1,10 @@
+import os
 import random
+import time
 import asyncio
+import secrets
+from collections import OrderedDict, deque
+from dataclasses import replace
 from aiogram import Router, types, F, Bot
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
@@ -8,22 +13,28 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot_services.translator import tr
 from bot_services.firebase_service import *
 from bot_services.firebase_service import get_custom_quiz, increment_quiz_plays
+from bot_services.set_cache import get_set_snapshot, append_position
 from bot_services.ai_service import generate_card_content
-from bot_services.utils import PracticeStates, get_cancel_kb, get_home_kb, get_rank_title, are_too_similar, build_vkm_pagination_kb
+from bot_services.write_queue import write_queue
+from bot_services.utils import PracticeStates, get_cancel_kb, get_home_kb, get_rank_title, are_too_similar, build_vkm_pagination_kb, percentile
 
 router = Router()
 
 # --- BACKGROUND SPEED WORKER 🚀 ---
-async def background_db_task(user_id, is_correct, xp_reward, bot):
-    """Updates DB in the background so the user doesn't have to wait."""
-    try:
-        # This runs while the user is already looking at the next card
-        hit_goal = await process_card_action(user_id, is_correct, xp_reward)
-        if hit_goal:
-            # If they hit the goal, send the notification asynchronously
+async def background_db_task(user_id, is_correct, xp_reward, bot, op_id=None):
+    """
+    Updates DB in the background so the user doesn't have to wait.
+    Runs on write_queue, which retries it if the DB write fails; `op_id`
+    (fixed per job) makes a retry of an already applied write a no-op.
+    """
+    # This runs while the user is already looking at the next card
+    hit_goal = await process_card_action(user_id, is_correct, xp_reward, op_id)
+    if hit_goal:
+        # Notification failures must not retry (and double-count) the write above
+        try:
             await bot.send_message(user_id, "🎯 Daily Goal Reached! (+2 TX)")
-    except Exception as e:
-        print(f"Background DB Error: {e}")
+        except Exception as e:
+            print(f"Goal notification failed: {e}")
 
 # Timer removed - users have full control over when to flip cards
 @router.message(F.text.startswith("/play_"))
@@ -365,49 +376,132 @@ async def start_session(call: types.CallbackQuery, state: FSMContext):
         await call.answer("❌ Please select a set first!", show_alert=True)
         return
     
+    # Sessions hold only the set version and packed card positions; cards
+    # are resolved from the shared set snapshot on each step
     if data.get('is_retry'):
-        cards = data.get('cards', [])
+        snapshot = await get_set_snapshot(data['target_id'], version=data.get('set_version'))
+        order = data.get('order', b'')
     else:
-        cards = await get_set_cards(data['target_id'])
+        snapshot = await get_set_snapshot(data['target_id'])
+        order = snapshot.shuffled_order() if snapshot else b''
     
-    if not cards:
+    if not snapshot or not order:
         await call.answer("No cards found!", show_alert=True)
         return
     
-    if not data.get('is_retry'): 
-        random.shuffle(cards)
-    
     session_data = {
-        "cards": cards,
+        "set_version": snapshot.version,
+        "order": order,
         "index": 0,
         "score": 0,
         "xp_earned": 0.0, 
-        "mistakes": [],
+        "mistakes": b"",
         "mode": mode,
         "reverse": data.get('reverse', False),
-        "is_retry": False
+        "is_retry": False,
+        "session_id": secrets.token_hex(4),  # Keys pre-rendered cards
+        "user_ctx": await load_user_ctx(call.from_user.id)
     }
     await state.update_data(**session_data)
     await state.set_state(PracticeStates.active_session)
     await next_card(call.message, state, first=True)
 
+# --- SESSION USER CONTEXT ---
+# What practice handlers need from the user doc, captured once per session and
+# kept in FSM state instead of a get_user call per card. settings.change_lang
+# drops it so a language change takes effect on the next card.
+def user_ctx_from(user: dict) -> dict:
+    user = user or {}
+    return {
+        'lang': user.get('lang_code', 'en'),
+        'level': user.get('level', 1),
+        'xp': user.get('xp', 0),
+        'total_xp': user.get('total_xp', 0),
+        'is_admin': bool(user.get('is_admin', False))
+    }
+
+async def load_user_ctx(user_id) -> dict:
+    return user_ctx_from(await get_user(user_id))
+
+async def session_ctx(state: FSMContext, user_id, data: dict = None) -> dict:
+    """The session's user context; loaded and stored on first use if missing."""
+    if data is None:
+        data = await state.get_data()
+    ctx = data.get('user_ctx')
+    if not ctx:
+        ctx = await load_user_ctx(user_id)
+        await state.update_data(user_ctx=ctx)
+    return ctx
+
+def drop_prerendered_cards(chat_id: int):
+    """Drop pre-rendered cards built with the old context."""
+    CARD_RENDERS.pop(chat_id, None)
+
+async def _session_cards(data: dict, key: str = 'order'):
+    """
+    A session's cards (`order`, `mistakes` or `quiz_order`) as a CardView over
+    the set snapshot it was started on. None if the session is gone or that
+    set version is no longer available.
+    """
+    if not data or not data.get('target_id') or data.get(key) is None:
+        return None
+    snapshot = await get_set_snapshot(data['target_id'], version=data.get('set_version'))
+    return snapshot.view(data[key]) if snapshot else None
+
+async def _mcq_distractors(data: dict, card: dict, answer: str, count: int, pool: list) -> list:
+    """
+    Wrong options for a card. Uses the distractor index of the set version the
+    session is pinned to (O(1) lookup, positions match the session's order);
+    falls back to random sampling with similarity checks for cards outside it.
+    """
+    reverse = data.get('reverse', data.get('quiz_reverse', False))
+    set_id = data.get('target_id')
+    if set_id:
+        try:
+            snapshot = await get_set_snapshot(set_id, version=data.get('set_version'))
+            pos = snapshot.position(card) if snapshot else None
+            if pos is not None:
+                index = await snapshot.distractors(reverse)
+                return [d for d in index.pick(pos, count) if d != answer]
+        except Exception as e:
+            print(f"Distractor index unavailable (falling back): {e}")
+    
+    distractors = []
+    used_card_ids = [card.get('card_id') or "current_card"]  # Track used cards to avoid duplicates
+    attempts = 0
+    max_attempts = 50  # Safety limit
+    while len(distractors) < count and attempts < max_attempts:
+        attempts += 1
+        wrong = random.choice(pool)
+        if wrong.get('card_id') in used_card_ids:
+            continue
+        wa = wrong.get('term', '') if reverse else wrong.get('definition', '???')
+        if wa == answer or wa in distractors:
+            continue
+        if any(are_too_similar(wa, existing) for existing in [answer] + distractors):
+            continue
+        distractors.append(wa)
+        used_card_ids.append(wrong.get('card_id'))
+    return distractors
+
 async def next_card(message: types.Message, state: FSMContext, first=False):
     data = await state.get_data()
     idx = data['index']
-    cards = data['cards']
+    cards = await _session_cards(data)
     mode = data['mode']
     user_id = message.chat.id
     
-    # In high-speed mode, fetching user on every card is slow.
-    # We fetch only at end. For language, we assume 'en' or check if we can pass it.
-    # Optimization: Fetch user ONLY at finish or start.
-    # For now, we fetch to be safe, but 'process_card_action' handles the heavy lifting in BG.
-    # If ultra-speed needed, store lang in state.
-    lang = 'en' # Default fallback for speed during loop if not critical
-    # To be correct, let's fetch user only if we are finishing.
+    if cards is None:
+        # Set was edited long enough ago that this session's version is gone
+        await message.answer("⚠️ Session expired. Please start again.", reply_markup=get_home_kb())
+        await state.clear()
+        return
     
+    # Cards use the session's user context (see session_ctx); the user is
+    # fetched fresh only here at the end, for the XP / level-up summary
     if idx >= len(cards):
         # FINISH STATE - Must fetch user to show stats
+        CARD_RENDERS.pop(user_id, None)
         user = await get_user(user_id)
         lang = user['lang_code']
         
@@ -423,7 +517,7 @@ async def next_card(message: types.Message, state: FSMContext, first=False):
         if tx_gained > 0:
             await add_tx_coins(user_id, tx_gained)
         
-        mistakes = data.get('mistakes', [])
+        mistakes = await _session_cards(data, 'mistakes') or []
         mistake_text_lines = []
         for m in mistakes:
             definition_text = m.get('definition', '???')
@@ -464,171 +558,184 @@ async def next_card(message: types.Message, state: FSMContext, first=False):
             await message.answer(msg, reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_rows), parse_mode="Markdown")
         return
 
-    # CARD DISPLAY (Speed Optimized - No User Fetch)
-    # We guess Lang or use state. ideally store lang in state at start_session.
-    # For buttons, we need lang. 
-    # Let's assume 'en' or fetch quickly? 
-    # Actually, `tr.get_text` defaults to 'en'. 
-    # To keep it FAST, we skip user fetch here. The buttons might be in English for a split second if we don't pass lang.
-    # FIX: Let's try to get lang from state if available, else default.
-    # Or just accept one fetch per card (since DB write is now backgrounded, read is fast).
-    # Let's do the fetch to ensure correct language, as read is usually <100ms and acceptable.
-    # If user complains about 100ms, we can cache lang in state.
-    user = await get_user(user_id) # Keeping this for correct UI language
-    lang = user['lang_code']
+    # CARD DISPLAY: use the render prepared while the user was on the previous card
+    started = time.monotonic()
+    render = _take_prerendered(user_id, data, idx)
+    prerendered = render is not None
+    if render is None:
+        render = await _render_card(data, cards, idx, user_id)
+    
+    if render['state']:
+        await state.update_data(**render['state'])
+    try:
+        await message.edit_text(render['text'], reply_markup=render['kb'], parse_mode=render['parse_mode'])
+    except TelegramBadRequest:
+        await message.answer(render['text'], reply_markup=render['kb'], parse_mode=render['parse_mode'])
+    
+    elapsed = time.monotonic() - started
+    CARD_LATENCY['prerendered' if prerendered else 'built'].append(elapsed)
+    if DEBUG_CARD_TIMING:
+        print(f"⏱️ Card {idx + 1}/{len(cards)} ({mode}) shown in {elapsed * 1000:.0f}ms "
+              f"[{'prerendered' if prerendered else 'built on click'}]")
+    
+    # Prepare the next cards while the user reads this one
+    _schedule_prerender(user_id, data, cards, idx)
+
+# --- NEXT-CARD PRE-RENDERING ---
+# Renders (text, keyboard, expected answer) for the next cards of each chat's
+# session, built in the background: {chat_id: {'session': id, 'renders': {idx: render}}}
+PRERENDER_AHEAD = 2
+PRERENDER_MAX_CHATS = 5000
+CARD_RENDERS = OrderedDict()
+
+# Click-to-card latency by path, shown in the admin stats (per-card log only with PRACTICE_DEBUG_TIMING=1)
+DEBUG_CARD_TIMING = os.getenv("PRACTICE_DEBUG_TIMING", "0") == "1"
+CARD_LATENCY = {'prerendered': deque(maxlen=500), 'built': deque(maxlen=500)}
+
+def card_latency_stats() -> dict:
+    """{path: {'cards', 'p50_ms', 'p95_ms'}} over the recent cards of this process."""
+    stats = {}
+    for path, samples in CARD_LATENCY.items():
+        values = sorted(samples)
+        stats[path] = {
+            'cards': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p95_ms': round(percentile(values, 95) * 1000, 1),
+        }
+    return stats
+
+def _take_prerendered(chat_id: int, data: dict, idx: int):
+    entry = CARD_RENDERS.get(chat_id)
+    if not entry or entry['session'] != data.get('session_id'):
+        return None
+    return entry['renders'].pop(idx, None)
+
+def _schedule_prerender(chat_id: int, data: dict, cards, idx: int):
+    session_id = data.get('session_id')
+    entry = CARD_RENDERS.get(chat_id)
+    if not entry or entry['session'] != session_id:
+        entry = CARD_RENDERS[chat_id] = {'session': session_id, 'renders': {}, 'task': None}
+    CARD_RENDERS.move_to_end(chat_id)
+    while len(CARD_RENDERS) > PRERENDER_MAX_CHATS:
+        CARD_RENDERS.popitem(last=False)
+    
+    # Drop renders for cards already passed
+    for i in [i for i in entry['renders'] if i <= idx]:
+        del entry['renders'][i]
+    wanted = [i for i in range(idx + 1, min(idx + 1 + PRERENDER_AHEAD, len(cards))) if i not in entry['renders']]
+    if wanted and (entry['task'] is None or entry['task'].done()):
+        entry['task'] = asyncio.create_task(_prerender_cards(chat_id, entry, data, cards, wanted))
+
+async def _prerender_cards(chat_id: int, entry: dict, data: dict, cards, indexes: list):
+    try:
+        for i in indexes:
+            entry['renders'][i] = await _render_card(data, cards, i, chat_id)
+    except Exception as e:
+        print(f"Card pre-render failed (will build on click): {e}")
 
+async def _render_card(data: dict, cards, idx: int, user_id: int) -> dict:
+    """
+    Build card idx of a practice session without touching state or Telegram:
+    {'text', 'kb', 'parse_mode', 'state'} where 'state' holds the expected
+    answer to store when the card is shown.
+    """
+    ctx = data.get('user_ctx') or await load_user_ctx(user_id)
+    lang = ctx['lang']
+    mode = data['mode']
+    
     card = cards[idx]
     definition_text = card.get('definition', '???')
     q = definition_text if data['reverse'] else card['term']
     a = card['term'] if data['reverse'] else definition_text
-
+    
     if mode == "flash":
         kb = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text=tr.get_text('btn_flip', lang), callback_data="flash_flip")],
             [InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")]
         ])
-        text = f"{tr.get_text('flashcard_front', lang)}\n\n**{q}**"
-        
-        if first: 
-            await message.edit_text(text, reply_markup=kb, parse_mode="Markdown")
-        else:
-            try: await message.edit_text(text, reply_markup=kb, parse_mode="Markdown")
-            except: await message.answer(text, reply_markup=kb, parse_mode="Markdown")
         # Timer removed - user controls when to flip
+        return {'text': f"{tr.get_text('flashcard_front', lang)}\n\n**{q}**", 'kb': kb, 'parse_mode': "Markdown", 'state': {}}
     
-    elif mode == "ai_review":
+    if mode == "ai_review":
         # AI Review mode - similar to flashcard but with AI-generated comprehensive answer
         kb = InlineKeyboardMarkup(inline_keyboard=[
             [InlineKeyboardButton(text="🤖 Show AI Review", callback_data="ai_review_flip")],
             [InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")]
         ])
-        text = f"🤖 AI Review\n\n**{q}**"
-        
-        if first: 
-            await message.edit_text(text, reply_markup=kb, parse_mode="Markdown")
-        else:
-            try: await message.edit_text(text, reply_markup=kb, parse_mode="Markdown")
-            except: await message.answer(text, reply_markup=kb, parse_mode="Markdown")
         # No auto-reveal for AI mode (takes longer)
+        return {'text': f"🤖 AI Review\n\n**{q}**", 'kb': kb, 'parse_mode': "Markdown", 'state': {}}
     
-    elif mode == "mix":
-        is_mcq = random.choice([True, False])
-        if is_mcq and len(cards) >= 4:
-            # MCQ MODE with similarity filtering
-            options = [a]  # Start with correct answer
-            used_card_ids = [card.get('card_id') or f"current_card"]  # Track used cards to avoid duplicates
-            attempts = 0
-            max_attempts = 50  # Safety limit
-            
-            while len(options) < 4 and attempts < max_attempts:
-                attempts += 1
-                wrong = random.choice(cards)
-                
-                # Skip if we already used this card
-                if wrong.get('card_id') in used_card_ids:
-                    continue
-                
-                wrong_def = wrong.get('definition', '???')
-                wa = wrong['term'] if data['reverse'] else wrong_def
-                
-                # Check exact duplicate
-                if wa in options:
-                    continue
-                
-                # Check similarity with ALL existing options
-                too_similar = False
-                for existing_opt in options:
-                    if are_too_similar(wa, existing_opt):
-                        too_similar = True
-                        break
-                
-                # Only add if not too similar
-                if not too_similar:
-                    options.append(wa)
-                    used_card_ids.append(wrong.get('card_id'))
+    # mix
+    is_mcq = random.choice([True, False])
+    if is_mcq and len(cards) >= 4:
+        # MCQ MODE: distractors from the set's precomputed index
+        options = [a] + await _mcq_distractors(data, card, a, 3, cards)
+        
+        # We have 4 unique options - shuffle and track correct index
+        if len(options) >= 4:
+            random.shuffle(options)
+            correct_index = options.index(a)
             
-            # If we couldn't get 4 unique options, fall back to True/False
-            if len(options) < 4:
-                show_true = random.choice([True, False])
-                fake_def = cards[(idx+1)%len(cards)]['term'] if data['reverse'] else cards[(idx+1)%len(cards)].get('definition', '???')
-                disp_def = a if show_true else fake_def
-                correct_choice = "True" if show_true else "False"
-                await state.update_data(expected_tf=correct_choice)
-                kb = [
-                    [InlineKeyboardButton(text=tr.get_text('btn_true', lang), callback_data="tf_res_True")],
-                    [InlineKeyboardButton(text=tr.get_text('btn_false', lang), callback_data="tf_res_False")],
-                    [InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")]
-                ]
-                try:
-                    await message.edit_text(tr.get_text('mix_tf_prompt', lang, term=q, definition=disp_def), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
-                except TelegramBadRequest:
-                    await message.answer(tr.get_text('mix_tf_prompt', lang, term=q, definition=disp_def), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
-            else:
-                # We have 4 unique options - shuffle and track correct index
-                random.shuffle(options)
-                correct_index = options.index(a)
-                
-                # Store in state for validation
-                await state.update_data(
-                    mcq_correct_index=correct_index,
-                    mcq_options=options,
-                    mcq_correct_answer=a
-                )
-                
-                # Build keyboard with index-based callbacks
-                kb_list = []
-                for i, opt in enumerate(options):
-                    kb_list.append([
-                        InlineKeyboardButton(text=opt, callback_data=f"mcq_ans_{i}")
-                    ])
-                
-                # Add Show Answer button
-                kb_list.append([
-                    InlineKeyboardButton(text="💡 Show Answer", callback_data="mcq_show")
-                ])
+            # Build keyboard with index-based callbacks
+            kb_list = []
+            for i, opt in enumerate(options):
                 kb_list.append([
-                    InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")
+                    InlineKeyboardButton(text=opt, callback_data=f"mcq_ans_{i}")
                 ])
-                
-                try:
-                    await message.edit_text(tr.get_text('mix_mcq_prompt', lang, question=q), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_list))
-                except TelegramBadRequest:
-                    await message.answer(tr.get_text('mix_mcq_prompt', lang, question=q), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb_list))
-        else:
-            # True/False mode (when MCQ not selected or not enough cards)
-            show_true = random.choice([True, False])
-            fake_def = cards[(idx+1)%len(cards)]['term'] if data['reverse'] else cards[(idx+1)%len(cards)].get('definition', '???')
-            disp_def = a if show_true else fake_def
-            correct_choice = "True" if show_true else "False"
-            await state.update_data(expected_tf=correct_choice)
-            kb = [
-                [InlineKeyboardButton(text=tr.get_text('btn_true', lang), callback_data="tf_res_True")],
-                [InlineKeyboardButton(text=tr.get_text('btn_false', lang), callback_data="tf_res_False")],
-                [InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")]
-            ]
-            try:
-                await message.edit_text(tr.get_text('mix_tf_prompt', lang, term=q, definition=disp_def), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
-            except TelegramBadRequest:
-                await message.answer(tr.get_text('mix_tf_prompt', lang, term=q, definition=disp_def), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
+            
+            # Add Show Answer button
+            kb_list.append([
+                InlineKeyboardButton(text="💡 Show Answer", callback_data="mcq_show")
+            ])
+            kb_list.append([
+                InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")
+            ])
+            return {
+                'text': tr.get_text('mix_mcq_prompt', lang, question=q),
+                'kb': InlineKeyboardMarkup(inline_keyboard=kb_list),
+                'parse_mode': None,
+                # Stored in state for validation
+                'state': {'mcq_correct_index': correct_index, 'mcq_options': options, 'mcq_correct_answer': a}
+            }
+        # Couldn't get 4 unique options - fall back to True/False
+    
+    # True/False mode (when MCQ not selected or not enough cards)
+    show_true = random.choice([True, False])
+    following = cards[(idx+1)%len(cards)]
+    fake_def = following['term'] if data['reverse'] else following.get('definition', '???')
+    disp_def = a if show_true else fake_def
+    correct_choice = "True" if show_true else "False"
+    kb = [
+        [InlineKeyboardButton(text=tr.get_text('btn_true', lang), callback_data="tf_res_True")],
+        [InlineKeyboardButton(text=tr.get_text('btn_false', lang), callback_data="tf_res_False")],
+        [InlineKeyboardButton(text=tr.get_text('btn_home', lang), callback_data="cancel")]
+    ]
+    return {
+        'text': tr.get_text('mix_tf_prompt', lang, term=q, definition=disp_def),
+        'kb': InlineKeyboardMarkup(inline_keyboard=kb),
+        'parse_mode': None,
+        'state': {'expected_tf': correct_choice}
+    }
 
 @router.callback_query(F.data == "retry_mistakes")
 async def retry_mistakes_handler(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    mistakes = data.get('mistakes', [])
+    mistakes = data.get('mistakes')
     if not mistakes:
         await call.answer("No mistakes!", show_alert=True)
         return
-    await state.update_data(cards=mistakes, is_retry=True)
     mode = data.get('mode', 'flash')
     session_data = {
-        "cards": mistakes,
+        "order": mistakes,
         "index": 0,
         "score": 0,
         "xp_earned": 0.0, 
-        "mistakes": [],
+        "mistakes": b"",
         "mode": mode,
         "reverse": data.get('reverse', False),
-        "is_retry": True
+        "is_retry": True,
+        "session_id": secrets.token_hex(4),
+        "user_ctx": await load_user_ctx(call.from_user.id)
     }
     await state.update_data(**session_data)
     await next_card(call.message, state, first=False)
@@ -636,18 +743,23 @@ async def retry_mistakes_handler(call: types.CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "restart_full")
 async def restart_full_handler(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    cards = await get_set_cards(data['target_id'])
-    random.shuffle(cards)
+    snapshot = await get_set_snapshot(data['target_id']) if data.get('target_id') else None
+    if not snapshot:
+        await call.answer("No cards found!", show_alert=True)
+        return
     
     session_data = {
-        "cards": cards,
+        "set_version": snapshot.version,
+        "order": snapshot.shuffled_order(),
         "index": 0,
         "score": 0,
         "xp_earned": 0.0, 
-        "mistakes": [],
+        "mistakes": b"",
         "mode": data.get('mode', 'flash'),
         "reverse": data.get('reverse', False),
-        "is_retry": False 
+        "is_retry": False,
+        "session_id": secrets.token_hex(4),
+        "user_ctx": await load_user_ctx(call.from_user.id)
     }
     await state.update_data(**session_data)
     await next_card(call.message, state, first=False)
@@ -655,11 +767,12 @@ async def restart_full_handler(call: types.CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "flash_flip", PracticeStates.active_session)
 async def flash_flip(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    if not data or not data.get('cards') or data['index'] >= len(data['cards']):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         await call.answer("Session expired.", show_alert=True)
         await state.clear()
         return
-    card = data['cards'][data['index']]
+    card = cards[data['index']]
     definition_text = card.get('definition', '???')
     
     # Get term and answer based on mode
@@ -670,8 +783,7 @@ async def flash_flip(call: types.CallbackQuery, state: FSMContext):
         question = card['term']      # User saw term
         answer = definition_text     # Answer is definition
     
-    user = await get_user(call.from_user.id)
-    lang = user['lang_code']
+    lang = (await session_ctx(state, call.from_user.id, data))['lang']
     
     kb = [
         [
@@ -694,22 +806,22 @@ async def flash_flip(call: types.CallbackQuery, state: FSMContext):
 async def ai_review_flip(call: types.CallbackQuery, state: FSMContext):
     await call.answer()
     data = await state.get_data()
-    if not data or not data.get('cards') or data['index'] >= len(data['cards']):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         await call.answer("Session expired.", show_alert=True)
         await state.clear()
         return
     
-    card = data['cards'][data['index']]
+    card = cards[data['index']]
     term = card['term'] if not data['reverse'] else card.get('definition', '???')
     
-    user = await get_user(call.from_user.id)
-    lang = user['lang_code']
+    lang = (await session_ctx(state, call.from_user.id, data))['lang']
     
     # Show loading message
     await call.message.edit_text("🤖 Generating AI review...\nThis may take a moment.")
     
     # Generate AI content
-    ai_content = await generate_card_content(term, reverse_mode=data.get('reverse', False), user_id=call.from_user.id)
+    ai_content = await generate_card_content(term, reverse_mode=data.get('reverse', False), user_id=call.from_user.id, feature='ai_review')
     
     if ai_content and 'error' in ai_content:
         if ai_content['error'] == 'limit_reached':
@@ -766,30 +878,29 @@ async def flash_rate(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     user_id = call.from_user.id
     
-    if not data or not data.get('cards') or data['index'] >= len(data['cards']):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         return 
     
-    card = data['cards'][data['index']]
+    card = cards[data['index']]
     is_correct = quality >= 3  # Good or Easy = correct
     
     if is_correct:
         await state.update_data(score=data['score'] + 1, xp_earned=data['xp_earned'] + 0.25)
     else:
-        mistakes = data['mistakes']
-        mistakes.append(card)
-        await state.update_data(mistakes=mistakes)
+        await state.update_data(mistakes=append_position(data.get('mistakes'), cards.position(data['index'])))
     
     # CRITICAL FIX: Update card progress for Smart Practice integration
     set_id = data.get('target_id')
     if set_id and 'card_id' in card:
-        asyncio.create_task(update_card_progress(user_id, set_id, card['card_id'], quality))
+        await write_queue.submit(user_id, 'card_progress', update_card_progress, user_id, set_id, card['card_id'], quality)
     
-    # SPEED FIX: Run database update in background task
-    asyncio.create_task(background_db_task(user_id, is_correct, 0.25, call.bot))
+    # SPEED FIX: Run database update on the background write queue (ordered per user)
+    await write_queue.submit(user_id, 'card_action', background_db_task, user_id, is_correct, 0.25, call.bot, secrets.token_hex(6))
     
     # Reset notification backoff - user is actively practicing!
     from bot_services.firebase_service import reset_notification_backoff
-    asyncio.create_task(reset_notification_backoff(user_id))
+    await write_queue.submit(user_id, 'notification_backoff', reset_notification_backoff, user_id)
     
     await state.update_data(index=data['index'] + 1)
     await next_card(call.message, state, first=False)
@@ -806,7 +917,8 @@ async def handle_mcq_answer(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     user_id = call.from_user.id
     
-    if not data or not data.get('cards') or data['index'] >= len(data['cards']):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         return
     
     # Validate answer by index (not text!)
@@ -815,11 +927,10 @@ async def handle_mcq_answer(call: types.CallbackQuery, state: FSMContext):
     is_correct = selected_index == correct_index
     
     # Get user language
-    user = await get_user(user_id)
-    lang = user['lang_code']
+    lang = (await session_ctx(state, user_id, data))['lang']
     
     # Get the original question (term)
-    card = data['cards'][data['index']]
+    card = cards[data['index']]
     question_term = card.get('definition', '???') if data.get('reverse') else card.get('term', '???')
     
     # Build result message with feedback
@@ -863,7 +974,8 @@ async def show_mcq_answer(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     user_id = call.from_user.id
     
-    if not data or not data.get('cards'):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         return
     
     correct_index = data.get('mcq_correct_index', 0)
@@ -871,11 +983,10 @@ async def show_mcq_answer(call: types.CallbackQuery, state: FSMContext):
     correct_answer = options[correct_index] if correct_index < len(options) else "???"
     
     # Get the original question (term)
-    card = data['cards'][data['index']]
+    card = cards[data['index']]
     question_term = card.get('definition', '???') if data.get('reverse') else card.get('term', '???')
     
-    user = await get_user(user_id)
-    lang = user['lang_code']
+    lang = (await session_ctx(state, user_id, data))['lang']
     
     # Show answer with term for memorization
     result_text = f"📝 **{question_term}**\n\n"
@@ -910,31 +1021,30 @@ async def handle_mix_rating(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
     user_id = call.from_user.id
     
-    if not data or not data.get('cards') or data['index'] >= len(data['cards']):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         return
     
-    card = data['cards'][data['index']]
+    card = cards[data['index']]
     was_correct = data.get('mix_is_correct', False)
     
     # Update score based on user's original answer
     if was_correct:
         await state.update_data(score=data['score'] + 1, xp_earned=data['xp_earned'] + 0.25)
     else:
-        mistakes = data['mistakes']
-        mistakes.append(card)
-        await state.update_data(mistakes=mistakes)
+        await state.update_data(mistakes=append_position(data.get('mistakes'), cards.position(data['index'])))
     
     # Update card progress for Smart Practice
     set_id = data.get('target_id')
     if set_id and 'card_id' in card:
-        asyncio.create_task(update_card_progress(user_id, set_id, card['card_id'], quality))
+        await write_queue.submit(user_id, 'card_progress', update_card_progress, user_id, set_id, card['card_id'], quality)
     
     # Background DB task for user stats
-    asyncio.create_task(background_db_task(user_id, was_correct, 0.25, call.bot))
+    await write_queue.submit(user_id, 'card_action', background_db_task, user_id, was_correct, 0.25, call.bot, secrets.token_hex(6))
     
     # Reset notification backoff - user is actively practicing!
     from bot_services.firebase_service import reset_notification_backoff
-    asyncio.create_task(reset_notification_backoff(user_id))
+    await write_queue.submit(user_id, 'notification_backoff', reset_notification_backoff, user_id)
     
     await state.update_data(index=data['index'] + 1)
     await next_card(call.message, state, first=False)
@@ -947,14 +1057,14 @@ async def handle_tf(call: types.CallbackQuery, state: FSMContext):
     user_id = call.from_user.id
     expected = data.get('expected_tf')
     
-    if not data or not data.get('cards') or data['index'] >= len(data['cards']):
+    cards = await _session_cards(data)
+    if not cards or data['index'] >= len(cards):
         return 
 
     is_correct = user_choice == expected
     
     # Show difficulty rating prompt
-    user = await get_user(user_id)
-    lang = user['lang_code']
+    lang = (await session_ctx(state, user_id, data))['lang']
     
     result_text = "✅ Correct!" if is_correct else "❌ Incorrect!"
     
@@ -976,16 +1086,108 @@ async def handle_tf(call: types.CallbackQuery, state: FSMContext):
 # ==========================================
 # SM-2 SMART PRACTICE LOGIC
 # ==========================================
+# Ratings are computed locally from the progress prefetched with the due cards
+# and written in one batch every SM2_FLUSH_EVERY cards and at session end.
+# The session state keeps only (set, position) references plus each card's
+# SM-2 numbers; cards are read from the set snapshots (see set_cache.py).
+# Unsaved ratings are kept in the same persistent FSM storage under their own
+# key destiny (SM2_DESTINY), which state.clear() doesn't touch, so /start and
+# the other exits can't drop them and a restart doesn't lose them either.
+# Batches idle for SM2_IDLE_FLUSH seconds are written by sm2_progress_flusher(),
+# which also picks up batches left behind by a crash; all are written at shutdown.
+SM2_FLUSH_EVERY = 5
+SM2_IDLE_FLUSH = 120
+SM2_DESTINY = 'sm2_batch'
+SM2_BUFFERS = {}  # {user_id: (FSMContext of the batch, last rating monotonic)} - what the flusher checks
+
+def _sm2_batch(state: FSMContext) -> FSMContext:
+    """The user's unsaved-ratings batch: same storage, separate key."""
+    return FSMContext(storage=state.storage, key=replace(state.key, destiny=SM2_DESTINY))
+
+async def _flush_sm2_batch(batch: FSMContext, legacy: dict = None):
+    user_id = batch.key.user_id
+    SM2_BUFFERS.pop(user_id, None)
+    buffer = await batch.get_data()
+    pending, xp = buffer.get('pending') or {}, buffer.get('xp', 0)
+    if legacy:
+        # Sessions started before ratings moved out of the session state
+        pending = {**(legacy.get('sm2_pending') or {}), **pending}
+        xp += legacy.get('sm2_xp', 0)
+    if pending:
+        await write_queue.submit(user_id, 'sm2_progress', commit_card_progress, user_id, pending)
+    if xp:
+        await write_queue.submit(user_id, 'sm2_xp', add_total_xp, user_id, xp)
+    if buffer:
+        await batch.set_data({})
+
+async def flush_sm2_progress(state: FSMContext, data: dict = None):
+    """Queue a user's unsaved SM-2 progress (and its XP) for a single batched write."""
+    await _flush_sm2_batch(_sm2_batch(state), data)
+
+def has_sm2_progress(state: FSMContext, data: dict) -> bool:
+    return state.key.user_id in SM2_BUFFERS or bool(data.get('sm2_pending'))
+
+async def flush_all_sm2_progress(idle_for: float = 0):
+    """Write every batch untouched for `idle_for` seconds (0 = all, used at shutdown)."""
+    now = time.monotonic()
+    for user_id, (batch, touched) in [(u, b) for u, b in SM2_BUFFERS.items() if now - b[1] >= idle_for]:
+        try:
+            await _flush_sm2_batch(batch)
+        except Exception as e:
+            print(f"SM-2 progress flush failed for {user_id}: {e}")
+
+async def sm2_progress_flusher(storage):
+    """Background loop started from main.py: saves reviews abandoned mid-batch."""
+    keys = storage.keys_with_destiny(SM2_DESTINY) if hasattr(storage, 'keys_with_destiny') else []
+    for key in keys:
+        SM2_BUFFERS[key.user_id] = (FSMContext(storage=storage, key=key), 0.0)  # Left by a crash: due now
+    if keys:
+        print(f"🧠 Recovered {len(keys)} unsaved Smart Review batches")
+    while True:
+        await flush_all_sm2_progress(SM2_IDLE_FLUSH)
+        await asyncio.sleep(SM2_IDLE_FLUSH / 2)
+
+async def _sm2_card(data: dict, idx: int):
+    """
+    The idx-th card of a Smart Review with its set_id and SM-2 progress,
+    or None if the session is gone or that set version is no longer available.
+    """
+    if not data.get('sm2_order') or idx >= len(data['sm2_order']):
+        return None
+    set_index, position, n, ef, interval = data['sm2_order'][idx]
+    set_id, version = data['sm2_sets'][set_index]
+    snapshot = await get_set_snapshot(set_id, version=version)
+    if not snapshot:
+        return None
+    return dict(snapshot.cards[position], set_id=set_id, progress={'n': n, 'ef': ef, 'interval': interval})
+
 @router.callback_query(F.data == "start_sm2")
 async def start_sm2_practice(call: types.CallbackQuery, state: FSMContext):
     user_id = call.from_user.id
     user = await get_user(user_id)
     lang = user['lang_code']
     
+    # Save anything left over from an interrupted review session
+    await flush_sm2_progress(state, await state.get_data())
+    
     # Fetch due cards
     cards = await get_due_cards(user_id)
     
-    if not cards:
+    # Reference them by (set, position) in the shared set snapshots
+    set_ids = list({c['set_id'] for c in cards})
+    snapshots = dict(zip(set_ids, await asyncio.gather(*(get_set_snapshot(sid) for sid in set_ids))))
+    random.shuffle(cards)
+    set_index, order = {}, []
+    for card in cards:
+        snapshot = snapshots.get(card['set_id'])
+        position = snapshot.position(card) if snapshot else None
+        if position is None:
+            continue  # Deleted since its progress was written
+        progress = card.get('progress') or {}
+        order.append([set_index.setdefault(card['set_id'], len(set_index)), position,
+                      progress.get('n', 0), progress.get('ef', 2.5), progress.get('interval', 0)])
+    
+    if not order:
         msg = (
             "🎉 **All caught up!**\n\n"
             "No cards are due for review right now.\n\n"
@@ -997,14 +1199,14 @@ async def start_sm2_practice(call: types.CallbackQuery, state: FSMContext):
         )
         await call.message.edit_text(msg, reply_markup=get_home_kb(tr.languages[lang]), parse_mode="Markdown")
         return
-        
-    random.shuffle(cards)
     
     session_data = {
-        "cards": cards,
+        "sm2_sets": [[sid, snapshots[sid].version] for sid in set_index],
+        "sm2_order": order,
         "index": 0,
         "mode": "sm2",
-        "reverse": False # SM-2 usually standard direction
+        "reverse": False, # SM-2 usually standard direction
+        "user_ctx": user_ctx_from(user)
     }
     await state.update_data(**session_data)
     await state.set_state(PracticeStates.active_session)
@@ -1013,9 +1215,8 @@ async def start_sm2_practice(call: types.CallbackQuery, state: FSMContext):
 async def next_sm2_card(message: types.Message, state: FSMContext, first=False):
     data = await state.get_data()
     idx = data['index']
-    cards = data['cards']
     
-    if idx >= len(cards):
+    if idx >= len(data.get('sm2_order') or []):
         # FIXED: Edit message instead of sending new one
         try:
             await message.edit_text(
@@ -1029,10 +1230,16 @@ async def next_sm2_card(message: types.Message, state: FSMContext, first=False):
                 reply_markup=get_home_kb({'btn_home': '🏠 Home'}),
                 parse_mode="Markdown"
             )
+        await flush_sm2_progress(state, data)
         await state.clear()
         return
 
-    card = cards[idx]
+    card = await _sm2_card(data, idx)
+    if not card:
+        await flush_sm2_progress(state)
+        await state.clear()
+        await message.edit_text("⚠️ Session expired. Please start again.", reply_markup=get_home_kb())
+        return
     term = card['term']
     
     # Show Question
@@ -1051,7 +1258,10 @@ async def next_sm2_card(message: types.Message, state: FSMContext, first=False):
 @router.callback_query(F.data == "sm2_show", PracticeStates.active_session)
 async def sm2_show_answer(call: types.CallbackQuery, state: FSMContext):
     data = await state.get_data()
-    card = data['cards'][data['index']]
+    card = await _sm2_card(data, data.get('index', 0))
+    if not card:
+        await call.answer("Session expired.", show_alert=True)
+        return
     definition = card.get('definition', '???')
     term = card['term']
     
@@ -1075,18 +1285,29 @@ async def sm2_show_answer(call: types.CallbackQuery, state: FSMContext):
 async def handle_sm2_rating(call: types.CallbackQuery, state: FSMContext):
     quality = int(call.data.replace("sm2_rate_", ""))
     data = await state.get_data()
-    card = data['cards'][data['index']]
+    card = await _sm2_card(data, data.get('index', 0))
+    if not card:
+        await call.answer("Session expired.", show_alert=True)
+        return
     user_id = call.from_user.id
     
-    # Update Progress
-    await update_card_progress(user_id, card['set_id'], card['card_id'], quality)
-    
-    # Award XP for practice
-    # Award small XP for using AI
-    await add_total_xp(user_id, 0.25)
+    # Update Progress locally (no DB round trip per card)
+    progress = compute_sm2_progress(card['progress'], quality)
+    progress['next_review'] = progress['next_review'].timestamp()  # Compact in FSM storage
+    progress['set_id'] = card['set_id']
+    batch = _sm2_batch(state)
+    buffer = await batch.get_data()
+    pending = buffer.get('pending') or {}
+    pending[card['card_id']] = progress
+    await batch.set_data({'pending': pending, 'xp': buffer.get('xp', 0.0) + 0.25})  # Practice XP, written with the batch
+    SM2_BUFFERS[user_id] = (batch, time.monotonic())
+    
+    index = data['index'] + 1
+    if len(pending) >= SM2_FLUSH_EVERY or index >= len(data['sm2_order']):
+        await _flush_sm2_batch(batch)
     
     # Next Card
-    await state.update_data(index=data['index'] + 1)
+    await state.update_data(index=index)
     await next_sm2_card(call.message, state, first=False)
 
 
@@ -1112,24 +1333,24 @@ async def start_quiz_mode(call: types.CallbackQuery, state: FSMContext):
         
         # DEBUG: Check cards fetch
         print("DEBUG: Fetching cards...")
-        cards = await get_set_cards(set_id)
-        print(f"DEBUG: Cards fetched: {len(cards) if cards else 'None'}")
+        snapshot = await get_set_snapshot(set_id)
+        print(f"DEBUG: Cards fetched: {len(snapshot.cards) if snapshot else 'None'}")
         
-        if not cards or len(cards) < 4:
+        if not snapshot or len(snapshot.cards) < 4:
             await call.message.edit_text("⚠️ Need at least 4 cards for Quiz Mode. Add more cards to this set.")
             return
         
-        # Shuffle and limit to 10 questions
-        random.shuffle(cards)
-        quiz_cards = cards[:min(10, len(cards))]
+        # Shuffle and limit to 10 questions (positions into the shared snapshot)
+        quiz_order = snapshot.shuffled_order(limit=10)
+        quiz_cards = snapshot.view(quiz_order)
         
         # Store quiz state
         await state.update_data(
-            quiz_cards=quiz_cards,
+            set_version=snapshot.version,
+            quiz_order=quiz_order,
             quiz_index=0,
             quiz_correct=0,
             quiz_total=len(quiz_cards),
-            quiz_all_cards=cards,  # For generating distractors
             quiz_reverse=reverse
         )
         print(f"DEBUG: State updated. Starting quiz with {len(quiz_cards)} questions.")
@@ -1144,6 +1365,9 @@ async def start_quiz_mode(call: types.CallbackQuery, state: FSMContext):
             
         chat_id = call.message.chat.id
         
+        # Resolve explanations up front (one cache read); misses are batched to AI in the background
+        await prefetch_quiz_explanations(chat_id, quiz_cards)
+        
         try:
             await call.message.delete()
         except Exception as e:
@@ -1164,11 +1388,36 @@ async def start_quiz_mode(call: types.CallbackQuery, state: FSMContext):
 async def send_quiz_question(chat_id: int, state: FSMContext, bot: Bot):
     """Send a single quiz question as a Telegram poll."""
     data = await state.get_data()
-    quiz_cards = data.get('quiz_cards', [])
     quiz_index = data.get('quiz_index', 0)
-    quiz_all_cards = data.get('quiz_all_cards', [])
     reverse = data.get('quiz_reverse', False)
     
+    if data.get('quiz_order') is not None:
+        # Set quiz: resolve cards from the shared snapshot
+        quiz_cards = await _session_cards(data, 'quiz_order')
+        if quiz_cards is None:
+            await bot.send_message(chat_id, "⚠️ Quiz expired. Please start again.", reply_markup=get_home_kb())
+            await state.clear()
+            _drop_quiz_explanations(chat_id)
+            return
+        quiz_all_cards = quiz_cards.cards  # For distractor fallback
+    else:
+        # Custom quizzes aren't sets; their (few) questions live in state
+        quiz_cards = data.get('quiz_cards', [])
+        quiz_all_cards = []
+    
+    if quiz_index >= len(quiz_cards) and data.get('quiz_growing') and data.get('custom_quiz_id'):
+        # Streamed AI quiz: pick up questions generated since the session started
+        new_cards, generating = await _wait_for_streamed_questions(data['custom_quiz_id'], len(quiz_cards))
+        quiz_cards = quiz_cards + new_cards
+        await state.update_data(
+            cards=quiz_cards,
+            quiz_cards=quiz_cards,
+            total_cards=len(quiz_cards),
+            quiz_total=len(quiz_cards),
+            quiz_growing=generating
+        )
+        data = await state.get_data()
+    
     if quiz_index >= len(quiz_cards):
         # Quiz complete
         correct = data.get('quiz_correct', 0)
@@ -1212,6 +1461,7 @@ async def send_quiz_question(chat_id: int, state: FSMContext, bot: Bot):
             reply_markup=kb
         )
         await state.clear()
+        _drop_quiz_explanations(chat_id)
         return
     
     current_card = quiz_cards[quiz_index]
@@ -1243,17 +1493,7 @@ async def send_quiz_question(chat_id: int, state: FSMContext, bot: Bot):
     
     if not current_card.get('is_custom', False):
         # Generate 3 wrong answers (distractors) ONLY for NON-custom cards
-        distractors = []
-        for card in quiz_all_cards:
-            if card.get('card_id') != current_card.get('card_id'):
-                if reverse:
-                    distractor = card.get('term', card.get('front', ''))
-                else:
-                    distractor = card.get('definition', card.get('back', ''))
-                if distractor and distractor != correct_answer and len(distractor) < 100:
-                    distractors.append(distractor[:100])  # Telegram limit
-                    if len(distractors) >= 3:
-                        break
+        distractors = [d[:100] for d in await _mcq_distractors(data, current_card, correct_answer, 3, quiz_all_cards)]  # Telegram limit
         
         # Fallback if not enough distractors
         while len(distractors) < 3:
@@ -1269,8 +1509,9 @@ async def send_quiz_question(chat_id: int, state: FSMContext, bot: Bot):
         random.shuffle(options)
         correct_index = options.index(correct_truncated)
         
-        # Generate explanation (bilingual if possible) - skip if too slow
-        explanation = f"✅ {correct_answer[:150]}"  # Simple fallback
+        # Bilingual explanation if prefetched by now, else simple fallback
+        term = current_card.get('term', current_card.get('front', ''))
+        explanation = QUIZ_EXPLANATIONS.get(chat_id, {}).get(term) or f"✅ {correct_answer[:150]}"
     
     
     # Store poll ID for tracking
@@ -1302,6 +1543,74 @@ async def send_quiz_question(chat_id: int, state: FSMContext, bot: Bot):
         traceback.print_exc()
         await bot.send_message(chat_id, f"❌ Error sending quiz question: {e}")
 
+# Prefetched quiz poll explanations: {chat_id: {term: "🇬🇧 ...\n🇺🇿 ..."}}
+# Dropped when the quiz ends; abandoned quizzes age out (TTL) or are evicted (LRU bound)
+QUIZ_EXPLANATIONS_MAX_CHATS = 5000
+QUIZ_EXPLANATIONS_TTL = 3600
+QUIZ_EXPLANATIONS = OrderedDict()
+_QUIZ_EXPLANATIONS_AT = {}  # {chat_id: monotonic time the entry was created}
+
+def _drop_quiz_explanations(chat_id: int):
+    QUIZ_EXPLANATIONS.pop(chat_id, None)
+    _QUIZ_EXPLANATIONS_AT.pop(chat_id, None)
+
+def _trim_quiz_explanations():
+    now = time.monotonic()
+    while QUIZ_EXPLANATIONS:
+        oldest = next(iter(QUIZ_EXPLANATIONS))
+        if len(QUIZ_EXPLANATIONS) <= QUIZ_EXPLANATIONS_MAX_CHATS and now - _QUIZ_EXPLANATIONS_AT.get(oldest, 0) < QUIZ_EXPLANATIONS_TTL:
+            break
+        _drop_quiz_explanations(oldest)
+
+def _format_quiz_explanation(eng: str, uzb: str) -> str:
+    return f"🇬🇧 {eng[:80]}\n🇺🇿 {uzb[:80]}"
+
+async def prefetch_quiz_explanations(chat_id: int, quiz_cards: list):
+    """
+    Fill QUIZ_EXPLANATIONS for a quiz session.
+    Cache hits are resolved now with a single batched read; misses go to one
+    batched AI prompt in the background while the first poll is live.
+    """
+    _drop_quiz_explanations(chat_id)  # Re-insert at the end (newest)
+    explanations = QUIZ_EXPLANATIONS[chat_id] = {}
+    _QUIZ_EXPLANATIONS_AT[chat_id] = time.monotonic()
+    _trim_quiz_explanations()
+    pairs = {}
+    for card in quiz_cards:
+        term = card.get('term', card.get('front', ''))
+        definition = card.get('definition', card.get('back', ''))
+        if term:
+            pairs[term] = definition
+    
+    try:
+        from bot_services.vocabulary_cache import get_many_from_cache
+        cached = await get_many_from_cache(list(pairs))
+    except Exception as e:
+        print(f"Explanation cache read failed (non-fatal): {e}")
+        cached = {}
+    
+    misses = []
+    for term, definition in pairs.items():
+        entry = cached.get(term.lower().strip())
+        if entry and entry.get('definition') and entry.get('translation_uz'):
+            explanations[term] = _format_quiz_explanation(entry['definition'], entry['translation_uz'])
+        else:
+            misses.append((term, definition))
+    
+    if misses:
+        asyncio.create_task(_fill_explanations_from_ai(explanations, misses))
+
+async def _fill_explanations_from_ai(explanations: dict, misses: list):
+    try:
+        from bot_services.ai_service import generate_quiz_explanations_batch
+        results = await generate_quiz_explanations_batch(misses)
+    except Exception as e:
+        print(f"Batched quiz explanations failed (non-fatal): {e}")
+        return
+    for term, result in results.items():
+        if result.get('eng') and result.get('uzb'):
+            explanations[term] = _format_quiz_explanation(result['eng'], result['uzb'])
+
 async def generate_quiz_explanation(term: str, definition: str) -> str:
     """Generate a bilingual explanation for quiz feedback."""
     # Try to get from cache first
@@ -1389,15 +1698,7 @@ async def start_custom_quiz_play(message: types.Message, state: FSMContext, quiz
     await increment_quiz_plays(quiz_id)
     
     # 3. Convert to Standard Card Format
-    cards = []
-    for q in quiz.get('questions', []):
-        cards.append({
-            'term': q['text'],
-            'definition': q['options'][0], # Convention: first option is correct answer definition
-            'options': q['options'],
-            'correct_index': 0, # Standardize to 0, shuffle logic handles position
-            'is_custom': True
-        })
+    cards = _custom_questions_to_cards(quiz.get('questions', []))
         
     if not cards:
         await message.answer("❌ This quiz has no questions.", reply_markup=get_home_kb())
@@ -1418,7 +1719,8 @@ async def start_custom_quiz_play(message: types.Message, state: FSMContext, quiz
         quiz_correct=0,
         custom_quiz_id=quiz_id, # For rating at end
         quiz_timer=quiz.get('timer', 30), # Custom timer
-        custom_quiz_title=quiz['title']
+        custom_quiz_title=quiz['title'],
+        quiz_growing=quiz.get('generating', False)  # AI still streaming questions in
     )
     
     await message.answer(
@@ -1427,9 +1729,39 @@ async def start_custom_quiz_play(message: types.Message, state: FSMContext, quiz
         parse_mode="Markdown"
     )
     
-    # Start first question
-    user_id = message.from_user.id
-    await send_quiz_question(user_id, state, message.bot)
+    # Start first question (chat id: message may be the bot's own status message)
+    await send_quiz_question(message.chat.id, state, message.bot)
+
+
+def _custom_questions_to_cards(questions: list) -> list:
+    cards = []
+    for q in questions:
+        cards.append({
+            'term': q['text'],
+            'definition': q['options'][0], # Convention: first option is correct answer definition
+            'options': q['options'],
+            'correct_index': 0, # Standardize to 0, shuffle logic handles position
+            'is_custom': True
+        })
+    return cards
+
+
+async def _wait_for_streamed_questions(quiz_id: str, have: int, max_wait: int = 20):
+    """
+    For AI quizzes that are still being generated: wait for questions beyond
+    the first `have`. Returns (new_cards, still_generating).
+    """
+    waited = 0
+    while True:
+        quiz = await get_custom_quiz(quiz_id)
+        if not quiz:
+            return [], False
+        questions = quiz.get('questions', [])
+        generating = quiz.get('generating', False)
+        if len(questions) > have or not generating or waited >= max_wait:
+            return _custom_questions_to_cards(questions[have:]), generating
+        await asyncio.sleep(2)
+        waited += 2
 
 # --- QUIZ RATING HANDLER ---
 @router.callback_query(F.data.startswith("rate_quiz_"))
@@ -2,6 +2,7 @@ from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from bot_services.message_edits import message_edits
 from bot_services.utils import get_cancel_kb, get_home_kb
 
 router = Router()
@@ -77,17 +78,51 @@ async def handle_ai_topic(message: types.Message, state: FSMContext):
     
     # Show generating message
     status_msg = await message.answer("🤖 Generating quiz... This may take a few seconds.")
+    await state.clear()
+    
+    from bot_services.ai_service import stream_quiz_from_topic
+    from bot_services.firebase_service import add_custom_quiz, set_custom_quiz_questions
+    from bot_services.quiz_cache import get_cached_quiz, save_quiz_variant
+    
+    # Popular topics are served from the generation cache (no AI call, no quota used)
+    cached = await get_cached_quiz(topic, 10)
+    if cached:
+        quiz_id = await add_custom_quiz(user_id, f"AI: {topic[:40]}", cached)
+        await _show_ai_quiz_ready(message, status_msg, topic, quiz_id, len(cached), AI_DAILY_LIMIT - usage)
+        return
+    
+    # Stream the quiz: save it as soon as the first question is parsed so the
+    # user can start playing while the rest is still being generated
+    questions = []
+    quiz_id = None
+    play_kb = None
+    try:
+        async for question in stream_quiz_from_topic(topic, num_questions=10, user_id=user_id):
+            questions.append(question)
+            if quiz_id is None:
+                quiz_id = await add_custom_quiz(user_id, f"AI: {topic[:40]}", questions, generating=True)
+                play_kb = InlineKeyboardMarkup(inline_keyboard=[
+                    [InlineKeyboardButton(text="▶️ Play Now", callback_data=f"ai_quiz_play_{quiz_id}")]
+                ])
+            else:
+                await set_custom_quiz_questions(quiz_id, questions, generating=True)
+            message_edits.update(
+                status_msg,
+                f"🤖 Generating quiz... {len(questions)}/10 questions ready",
+                reply_markup=play_kb
+            )
+    except Exception as e:
+        print(f"AI quiz stream error: {e}")
     
-    # Generate quiz
-    from bot_services.ai_service import generate_quiz_from_topic
-    questions = await generate_quiz_from_topic(topic, num_questions=10, user_id=message.from_user.id)
+    if quiz_id:
+        await set_custom_quiz_questions(quiz_id, questions, generating=False)
     
     if not questions:
-        await status_msg.edit_text(
+        await message_edits.final(
+            status_msg,
             "❌ Failed to generate quiz. Please try again with a different topic.",
             reply_markup=get_home_kb()
         )
-        await state.clear()
         return
     
     # Increment usage counter
@@ -97,30 +132,39 @@ async def handle_ai_topic(message: types.Message, state: FSMContext):
     from bot_services import analytics_service
     await analytics_service.track_feature(user_id, 'ai_quiz', 'generated')
     
-    # Save to DB
-    from bot_services.firebase_service import add_custom_quiz
-    quiz_id = await add_custom_quiz(message.from_user.id, f"AI: {topic[:40]}", questions)
-    
+    await save_quiz_variant(topic, 10, questions)
+    await _show_ai_quiz_ready(message, status_msg, topic, quiz_id, len(questions), AI_DAILY_LIMIT - usage - 1)
+
+async def _show_ai_quiz_ready(message: types.Message, status_msg: types.Message, topic: str,
+                              quiz_id: str, question_count: int, remaining: int):
     # Get share link
     bot = message.bot
     bot_info = await bot.get_me()
     share_link = f"https://t.me/{bot_info.username}?start=quiz_{quiz_id}"
     
-    remaining = AI_DAILY_LIMIT - usage - 1
-    await status_msg.edit_text(
+    await message_edits.final(
+        status_msg,
         f"🎉 **Quiz Generated!**\n\n"
         f"📝 **Topic:** {topic}\n"
-        f"❓ **Questions:** {len(questions)}\n"
+        f"❓ **Questions:** {question_count}\n"
         f"📊 Remaining today: {remaining}/{AI_DAILY_LIMIT}\n\n"
         f"🔗 **Share Link:**\n`{share_link}`",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(text="▶️ Play Now", callback_data=f"ai_quiz_play_{quiz_id}")],
             [InlineKeyboardButton(text="📤 Share", url=f"https://t.me/share/url?url={share_link}&text=AI-generated quiz!")],
             [InlineKeyboardButton(text="🛠 Quiz Studio", callback_data="menu_quiz_studio")],
             [InlineKeyboardButton(text="🏠 Home", callback_data="cancel")]
         ]),
         parse_mode="Markdown"
     )
-    await state.clear()
+
+@router.callback_query(F.data.startswith("ai_quiz_play_"))
+async def play_ai_quiz(call: types.CallbackQuery, state: FSMContext):
+    """Start playing an AI quiz (possibly while it is still being generated)."""
+    quiz_id = call.data.replace("ai_quiz_play_", "")
+    await call.answer()
+    from bot_handlers.practice import start_custom_quiz_play
+    await start_custom_quiz_play(call.message, state, quiz_id)
 
 # --- FILE IMPORT ---
 class ImportStates(StatesGroup):
@@ -150,40 +194,51 @@ async def handle_file_import(message: types.Message, state: FSMContext):
     status_msg = await message.answer("📄 Processing file... Please wait.")
     
     try:
-        # Download file
-        import tempfile
-        import os
-        
-        file = await message.bot.get_file(doc.file_id)
-        file_path = file.file_path
+        # Download into memory and parse off the event loop
+        from bot_services.ingestion import download_document, extract_document_text, IngestionError
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file_name)[1]) as tmp:
-            await message.bot.download_file(file_path, tmp)
-            tmp_path = tmp.name
+        async def show_pages(pages_done: int):
+            if pages_done % 10 == 0:
+                message_edits.update(status_msg, f"📄 Reading file... {pages_done} pages")
         
-        # Parse based on file type
-        text_content = ""
-        if file_name.endswith('.pdf'):
-            text_content = await _parse_pdf(tmp_path)
-        elif file_name.endswith('.docx'):
-            text_content = await _parse_docx(tmp_path)
-        
-        # Clean up temp file
-        os.unlink(tmp_path)
+        try:
+            data = await download_document(message.bot, doc)
+            text_content = await extract_document_text(data, file_name, on_page=show_pages)
+        except IngestionError as e:
+            await message_edits.final(status_msg, f"❌ {e}", reply_markup=get_home_kb())
+            await state.clear()
+            return
         
         if not text_content:
-            await status_msg.edit_text("❌ Could not extract text from the file.", reply_markup=get_home_kb())
+            await message_edits.final(status_msg, "❌ Could not extract text from the file.", reply_markup=get_home_kb())
             await state.clear()
             return
 
         # AI Parsing (Robus & Smart)
-        await status_msg.edit_text("🤖 Analyzing file with AI... finding questions...")
+        message_edits.update(status_msg, "🤖 Analyzing file with AI... finding questions...")
+        
+        async def show_progress(done: int, total: int):
+            if total > 1:
+                message_edits.update(status_msg, f"🤖 Analyzing file with AI... {done}/{total} parts done")
         
         from bot_services.ai_service import generate_quiz_from_file_text
-        questions = await generate_quiz_from_file_text(text_content, user_id=message.from_user.id)
+        questions, failed_parts, total_parts = await generate_quiz_from_file_text(
+            text_content, user_id=message.from_user.id, on_progress=show_progress
+        )
+        
+        if not questions and failed_parts:
+            await message_edits.final(
+                status_msg,
+                f"❌ The AI is busy right now and {failed_parts}/{total_parts} parts of the file "
+                f"could not be processed.\n\nPlease send the file again in a few minutes.",
+                reply_markup=get_home_kb()
+            )
+            await state.clear()
+            return
         
         if not questions:
-            await status_msg.edit_text(
+            await message_edits.final(
+                status_msg,
                 "❌ Could not find quiz questions in the file.\n\n"
                 "Make sure your file follows this format:\n"
                 "Q1: Question text\n"
@@ -202,10 +257,22 @@ async def handle_file_import(message: types.Message, state: FSMContext):
         bot_info = await message.bot.get_me()
         share_link = f"https://t.me/{bot_info.username}?start=quiz_{quiz_id}"
         
-        await status_msg.edit_text(
-            f"🎉 **Quiz Imported!**\n\n"
+        # A partial import is saved but never reported as complete
+        header = "🎉 **Quiz Imported!**"
+        partial_note = ""
+        if failed_parts:
+            header = "⚠️ **Quiz Partially Imported**"
+            partial_note = (
+                f"⚠️ {failed_parts}/{total_parts} parts of the file could not be processed "
+                f"(AI busy), so some questions are missing. Send the file again later for a full import.\n\n"
+            )
+        
+        await message_edits.final(
+            status_msg,
+            f"{header}\n\n"
             f"📝 **Title:** {title}\n"
             f"❓ **Questions:** {len(questions)}\n\n"
+            f"{partial_note}"
             f"🔗 **Share Link:**\n`{share_link}`",
             reply_markup=InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(text="📤 Share", url=f"https://t.me/share/url?url={share_link}")],
@@ -217,64 +284,9 @@ async def handle_file_import(message: types.Message, state: FSMContext):
         
     except Exception as e:
         print(f"Import error: {e}")
-        await status_msg.edit_text(f"❌ Error processing file: {str(e)[:100]}", reply_markup=get_home_kb())
+        await message_edits.final(status_msg, f"❌ Error processing file: {str(e)[:100]}", reply_markup=get_home_kb())
         await state.clear()
 
-async def _parse_pdf(file_path: str) -> str:
-    """Extract text from PDF (max 10 pages)."""
-    text = ""
-    # Try PyMuPDF first
-    try:
-        import fitz  # PyMuPDF
-        doc = fitz.open(file_path)
-        for i, page in enumerate(doc):
-            if i >= 10:
-                break  # Max 10 pages
-            text += page.get_text()
-        doc.close()
-        return text
-    except ImportError:
-        pass  # fitz not installed, try fallback
-    except Exception as e:
-        print(f"PyMuPDF error: {e}")
-    
-    # Fallback to pypdf (more commonly available)
-    try:
-        from pypdf import PdfReader
-        reader = PdfReader(file_path)
-        for i, page in enumerate(reader.pages[:10]):  # Max 10 pages
-            text += page.extract_text() or ""
-        return text
-    except ImportError:
-        pass
-    except Exception as e:
-        print(f"pypdf error: {e}")
-    
-    # Last fallback: pdfplumber
-    try:
-        import pdfplumber
-        with pdfplumber.open(file_path) as pdf:
-            for i, page in enumerate(pdf.pages[:10]):  # Max 10 pages
-                text += page.extract_text() or ""
-        return text
-    except Exception as e:
-        print(f"pdfplumber error: {e}")
-    
-    return ""
-
-async def _parse_docx(file_path: str) -> str:
-    """Extract text from DOCX (max 10 pages worth)."""
-    try:
-        from docx import Document
-        doc = Document(file_path)
-        # Estimate 500 words per page, limit to ~5000 words
-        paragraphs = doc.paragraphs[:100]  # Roughly 10 pages worth
-        text = "\n".join([para.text for para in paragraphs])
-        return text
-    except Exception as e:
-        print(f"DOCX parse error: {e}")
-        return ""
-
 def _extract_questions_from_text(text: str) -> list:
     """Extract quiz questions from plain text."""
     questions = []
@@ -1,4 +1,5 @@
 from aiogram import Router, types, F
+from aiogram.fsm.context import FSMContext
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot_services.firebase_service import get_user, db
 from bot_services.translator import tr
@@ -19,10 +20,16 @@ async def show_settings(call: types.CallbackQuery):
     await call.message.edit_text(tr.get_text('settings_lang', lang), reply_markup=InlineKeyboardMarkup(inline_keyboard=kb))
 
 @router.callback_query(F.data.startswith("set_lang_"))
-async def change_lang(call: types.CallbackQuery):
+async def change_lang(call: types.CallbackQuery, state: FSMContext):
     lang = call.data.replace("set_lang_", "")
     db.collection('users').document(str(call.from_user.id)).update({"lang_code": lang})
     
+    # Practice sessions cache the language in their user context
+    from bot_handlers.practice import drop_prerendered_cards
+    if (await state.get_data()).get('user_ctx'):
+        await state.update_data(user_ctx=None)
+    drop_prerendered_cards(call.message.chat.id)
+    
     user = await get_user(call.from_user.id)
     is_admin = user.get('is_admin', False)
     
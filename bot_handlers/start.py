@@ -199,6 +199,11 @@ async def show_dashboard(message, user, lang, is_edit=False):
 
 @router.callback_query(F.data == "cancel")
 async def cancel_action(call: types.CallbackQuery, state: FSMContext):
+    # Leaving a Smart Review early: save its unsaved ratings now
+    from bot_handlers.practice import flush_sm2_progress, has_sm2_progress
+    data = await state.get_data()
+    if has_sm2_progress(state, data):
+        await flush_sm2_progress(state, data)
     await state.clear()
     user = await get_user(call.from_user.id)
     lang = user['lang_code']
@@ -0,0 +1,277 @@
+"""
+AI Request Scheduler
+
+Every Groq call goes through one shared scheduler so background work
+can't starve interactive lookups:
+- Priority classes with weighted fair queuing (interactive > standard > bulk > background)
+- Admission control against a shared requests/tokens per-minute budget
+- Background work is dropped under pressure, standard work is deferred
+- Bulk work (multi-chunk file imports) waits behind everything else but is
+  never dropped before the caller's own deadline
+- Per-class wait-time metrics for the admin dashboard
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from bot_services.utils import percentile
+
+# Shared Groq budget (per minute, across all keys/models)
+AI_REQUESTS_PER_MINUTE = int(os.getenv("AI_REQUESTS_PER_MINUTE", 30))
+AI_TOKENS_PER_MINUTE = int(os.getenv("AI_TOKENS_PER_MINUTE", 6000))
+AI_MAX_IN_FLIGHT = int(os.getenv("AI_MAX_IN_FLIGHT", 8))
+
+# Priority classes: weight = share of dispatch slots when all classes are busy,
+# max_wait = how long a request may be deferred before it is dropped,
+# reserve = fraction of the budget that must remain free for the class to be admitted
+PRIORITY_CLASSES = {
+    'interactive': {'weight': 6, 'max_wait': 20.0, 'reserve': 0.0},
+    'standard':    {'weight': 3, 'max_wait': 40.0, 'reserve': 0.1},
+    'bulk':        {'weight': 2, 'max_wait': 900.0, 'reserve': 0.2},
+    'background':  {'weight': 1, 'max_wait': 15.0, 'reserve': 0.3},
+}
+
+# Feature -> priority class (unknown features are treated as 'standard')
+FEATURE_PRIORITY = {
+    'vocab_lookup': 'interactive',
+    'ai_review': 'interactive',
+    'card_generation': 'standard',
+    'quiz_generation': 'standard',
+    'quiz_import': 'bulk',
+    'quiz_explanation': 'background',
+    'definition_enhance': 'background',
+}
+
+# Queue depth at which background work is rejected outright
+MAX_QUEUE_DEPTH = 200
+
+# How many recent wait samples to keep per class for percentiles
+_LATENCY_SAMPLES = 500
+
+
+class _Bucket:
+    """Token bucket refilled continuously up to its per-minute capacity."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.level = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def fill_ratio(self) -> float:
+        return self.level / self.capacity
+
+    def seconds_until(self, amount: float) -> float:
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+
+class _Waiter:
+    __slots__ = ('priority', 'feature', 'tokens', 'finish_tag', 'future', 'enqueued_at')
+
+    def __init__(self, priority, feature, tokens, finish_tag, future):
+        self.priority = priority
+        self.feature = feature
+        self.tokens = tokens
+        self.finish_tag = finish_tag
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class AIScheduler:
+    """Weighted fair queue with admission control for outgoing AI requests."""
+
+    def __init__(self, requests_per_minute: int = AI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = AI_TOKENS_PER_MINUTE,
+                 max_in_flight: int = AI_MAX_IN_FLIGHT):
+        self.requests = _Bucket(requests_per_minute)
+        self.tokens = _Bucket(tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.queues = {name: deque() for name in PRIORITY_CLASSES}
+        self.virtual_time = 0.0
+        self.last_finish = {name: 0.0 for name in PRIORITY_CLASSES}
+        self._wakeup = None  # Pending call_later handle while waiting for budget
+        self.stats = {
+            name: {'submitted': 0, 'admitted': 0, 'dropped': 0, 'waits': deque(maxlen=_LATENCY_SAMPLES)}
+            for name in PRIORITY_CLASSES
+        }
+
+    # --- Public API ---
+    @asynccontextmanager
+    async def slot(self, feature: str, est_tokens: int = 500, max_wait: Optional[float] = None):
+        """
+        Reserve budget for one AI call.
+
+        Yields True if the call may proceed, False if it was dropped
+        (callers treat that exactly like a failed model call).
+        `max_wait` overrides the class's wait limit (e.g. an import's remaining deadline).
+        """
+        admitted = await self.acquire(feature, est_tokens, max_wait)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    async def acquire(self, feature: str, est_tokens: int = 500, max_wait: Optional[float] = None) -> bool:
+        priority = FEATURE_PRIORITY.get(feature, 'standard')
+        if max_wait is None:
+            max_wait = PRIORITY_CLASSES[priority]['max_wait']
+        stats = self.stats[priority]
+        stats['submitted'] += 1
+
+        if not self._admit(priority):
+            stats['dropped'] += 1
+            print(f"⏳ AI scheduler dropped {feature} ({priority}) under pressure")
+            return False
+
+        # WFQ: finish tag = max(virtual time, last tag of class) + cost / weight
+        weight = PRIORITY_CLASSES[priority]['weight']
+        start = max(self.virtual_time, self.last_finish[priority])
+        finish_tag = start + est_tokens / weight
+        self.last_finish[priority] = finish_tag
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(priority, feature, est_tokens, finish_tag, future)
+        self.queues[priority].append(waiter)
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max(max_wait, 0.0))
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self._remove(waiter)
+                stats['dropped'] += 1
+                print(f"⏳ AI scheduler timed out {feature} ({priority}) after {max_wait:.0f}s")
+                return False
+            # Dispatched in the same tick as the timeout fired - fall through
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result():
+                self.release()
+            else:
+                future.cancel()
+                self._remove(waiter)
+            raise
+
+        stats['admitted'] += 1
+        stats['waits'].append(time.monotonic() - waiter.enqueued_at)
+        return True
+
+    def release(self):
+        self.in_flight = max(0, self.in_flight - 1)
+        self._dispatch()
+
+    def report_rate_limited(self):
+        """Halve the remaining request budget after a 429 so the queue backs off."""
+        self.requests.refill()
+        self.requests.level /= 2
+
+    def get_stats(self) -> Dict:
+        """Per-class counters and wait-time percentiles (seconds)."""
+        self.requests.refill()
+        self.tokens.refill()
+        result = {
+            'in_flight': self.in_flight,
+            'queued': sum(len(q) for q in self.queues.values()),
+            'request_budget': round(self.requests.fill_ratio() * 100, 1),
+            'token_budget': round(self.tokens.fill_ratio() * 100, 1),
+            'classes': {}
+        }
+        for name, s in self.stats.items():
+            waits = sorted(s['waits'])
+            result['classes'][name] = {
+                'submitted': s['submitted'],
+                'admitted': s['admitted'],
+                'dropped': s['dropped'],
+                'queued': len(self.queues[name]),
+                'p50_wait': round(percentile(waits, 50), 3),
+                'p95_wait': round(percentile(waits, 95), 3),
+            }
+        return result
+
+    # --- Internals ---
+    def _admit(self, priority: str) -> bool:
+        """Admission control: reject work the budget can't absorb soon."""
+        if priority != 'background':
+            return True  # Higher classes are deferred, never rejected up front
+        queued = sum(len(q) for q in self.queues.values())
+        if queued >= MAX_QUEUE_DEPTH:
+            return False
+        return self._pressure() >= PRIORITY_CLASSES[priority]['reserve']
+
+    def _pressure(self) -> float:
+        """Fraction of the tighter of the two budgets still available."""
+        self.requests.refill()
+        self.tokens.refill()
+        return min(self.requests.fill_ratio(), self.tokens.fill_ratio())
+
+    def _remove(self, waiter: _Waiter):
+        try:
+            self.queues[waiter.priority].remove(waiter)
+        except ValueError:
+            pass
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        best = None
+        for name, queue in self.queues.items():
+            while queue and queue[0].future.done():
+                queue.popleft()  # Timed out / cancelled
+            if not queue:
+                continue
+            head = queue[0]
+            # Lower classes must leave their reserve untouched for higher ones
+            if self._pressure() < PRIORITY_CLASSES[name]['reserve']:
+                continue
+            if best is None or head.finish_tag < best.finish_tag:
+                best = head
+        return best
+
+    def _dispatch(self):
+        self.requests.refill()
+        self.tokens.refill()
+
+        while self.in_flight < self.max_in_flight:
+            waiter = self._next_waiter()
+            if waiter is None:
+                if any(self.queues.values()):
+                    # Only reserve-blocked work is left; re-check once budget recovers
+                    self._schedule_wakeup(1.0)
+                return
+
+            if self.requests.level < 1 or self.tokens.level < min(waiter.tokens, self.tokens.capacity):
+                delay = max(self.requests.seconds_until(1), self.tokens.seconds_until(waiter.tokens))
+                self._schedule_wakeup(delay)
+                return
+
+            self.queues[waiter.priority].popleft()
+            self.requests.level -= 1
+            self.tokens.level -= min(waiter.tokens, self.tokens.capacity)
+            self.virtual_time = max(self.virtual_time, waiter.finish_tag)
+            self.in_flight += 1
+            waiter.future.set_result(True)
+
+    def _schedule_wakeup(self, delay: float):
+        if self._wakeup is not None:
+            return
+        loop = asyncio.get_running_loop()
+
+        def _wake():
+            self._wakeup = None
+            self._dispatch()
+
+        self._wakeup = loop.call_later(max(delay, 0.05), _wake)
+
+
+# Process-wide scheduler shared by every AI call site
+ai_scheduler = AIScheduler()
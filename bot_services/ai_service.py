@@ -1,8 +1,15 @@
 import os
+import re
+import time
+import json
+import asyncio
+import hashlib
 import aiohttp
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 
 from bot_services.firebase_service import get_bot_config, get_all_users, check_ai_limit
+from bot_services.ai_scheduler import ai_scheduler
+from bot_services.ai_usage import record_ai_call
 from aiogram import Bot
 
 # Get Groq API key from environment (Fallback)
@@ -30,11 +37,128 @@ VOCAB_AI_MODELS = [
     "llama3-8b-8192",              # Final: Fastest fallback
 ]
 
+# Overridable so the AI path can be pointed at a local mock (see benchmarks/)
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1")
+GROQ_CHAT_URL = f"{GROQ_API_BASE}/chat/completions"
+
+async def _chat_completion(feature: str, model: str, api_key: str, messages: List[Dict],
+                           temperature: float, max_tokens: int, timeout: int = 15,
+                           user_id: int = None) -> Optional[str]:
+    """
+    POST a single chat completion to Groq and record its real usage
+    (prompt/completion tokens, model, key, latency, outcome).
+    Returns the message content, or None if rate limited / failed.
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    
+    started = time.monotonic()
+    outcome = 'error'
+    usage = None
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(GROQ_CHAT_URL, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    usage = data.get('usage')
+                    outcome = 'ok'
+                    return data['choices'][0]['message']['content']
+                elif response.status == 429:  # Rate Limit
+                    outcome = 'rate_limited'
+                    print(f"⚠️ Model {model} rate limited ({feature}), trying next...")
+                    ai_scheduler.report_rate_limited()
+                    # Don't notify admins on every rate limit, just try next model
+                    return None
+                else:
+                    error_text = await response.text()
+                    print(f"❌ Model {model} error {response.status}: {error_text}")
+                    return None
+    except asyncio.TimeoutError:
+        outcome = 'timeout'
+        print(f"❌ Model {model} timed out after {timeout}s ({feature})")
+        return None
+    except Exception as e:
+        print(f"❌ Model {model} exception: {e}")
+        return None
+    finally:
+        record_ai_call(feature, model, api_key, outcome, time.monotonic() - started, usage, user_id)
+
+async def _chat_completion_stream(feature: str, model: str, api_key: str, messages: List[Dict],
+                                  temperature: float, max_tokens: int, timeout: int = 30,
+                                  user_id: int = None):
+    """
+    Streaming variant of _chat_completion: yields content deltas from the
+    SSE stream as they arrive. Usage is recorded when the stream ends.
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+    
+    started = time.monotonic()
+    outcome = 'error'
+    usage = None
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(GROQ_CHAT_URL, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 429:
+                    outcome = 'rate_limited'
+                    print(f"⚠️ Model {model} rate limited ({feature}), trying next...")
+                    ai_scheduler.report_rate_limited()
+                    return
+                if response.status != 200:
+                    error_text = await response.text()
+                    print(f"❌ Model {model} error {response.status}: {error_text}")
+                    return
+                
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8', errors='ignore').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    # Usage arrives on the final chunk (OpenAI style or Groq's x_groq field)
+                    usage = chunk.get('usage') or chunk.get('x_groq', {}).get('usage') or usage
+                    choices = chunk.get('choices') or []
+                    delta = choices[0].get('delta', {}).get('content') if choices else None
+                    if delta:
+                        yield delta
+                outcome = 'ok'
+    except asyncio.TimeoutError:
+        outcome = 'timeout'
+        print(f"❌ Model {model} stream timed out after {timeout}s ({feature})")
+    except Exception as e:
+        print(f"❌ Model {model} stream exception: {e}")
+    finally:
+        record_ai_call(feature, model, api_key, outcome, time.monotonic() - started, usage, user_id)
+
 # ===== GROQ API INTEGRATION =====
-async def generate_card_content(word: str, reverse_mode: bool = False, user_id: int = None) -> Optional[Dict]:
+async def generate_card_content(word: str, reverse_mode: bool = False, user_id: int = None, feature: str = 'card_generation') -> Optional[Dict]:
     """
     Generate flashcard content using Groq AI with automatic model fallback.
     Tries models in priority order until one succeeds.
+    `feature` selects the scheduler priority ('ai_review' for live practice).
     Returns: dict with 'definition', 'translation', 'examples'
     """
     # 1. Get Config
@@ -110,81 +234,47 @@ EXAMPLE2: [second example sentence]"""
         print(f"Cache check failed (non-fatal): {e}")
         # Continue to AI generation
     
-    # 8. Try models in order until one works
-    for model in AI_MODELS:
-        result = await _try_model(model, prompt, api_key)
-        if result:
-            print(f"✅ AI Success with model: {model}")
-            
-            # Track global AI usage for analytics
-            try:
-                from bot_services.firebase_service import track_ai_usage
-                asyncio.create_task(track_ai_usage('card_generation', 500))  # Estimate tokens
-            except Exception as e:
-                print(f"AI tracking failed (non-fatal): {e}")
+    # 8. Try models in order until one works (one scheduler slot for the whole chain)
+    async with ai_scheduler.slot(feature, 500) as admitted:
+        if not admitted:
+            return None
+        for model in AI_MODELS:
+            result = await _try_model(model, prompt, api_key, feature, user_id)
+            if result:
+                print(f"✅ AI Success with model: {model}")
             
-            # SAVE TO VOCABULARY CACHE for future use
-            try:
-                from bot_services.vocabulary_cache import save_to_cache
-                await save_to_cache(word, result, 'ai')
-                print(f"💾 Cached AI card: {word}")
-            except Exception as e:
-                print(f"Cache save failed (non-fatal): {e}")
+                # SAVE TO VOCABULARY CACHE for future use
+                try:
+                    from bot_services.vocabulary_cache import save_to_cache
+                    await save_to_cache(word, result, 'ai')
+                    print(f"💾 Cached AI card: {word}")
+                except Exception as e:
+                    print(f"Cache save failed (non-fatal): {e}")
             
-            return result
-        # If failed (rate limit or error), try next model
+                return result
+            # If failed (rate limit or error), try next model
     
     # All models failed
     print("❌ All AI models failed!")
     return None
 
-async def _try_model(model: str, prompt: str, api_key: str) -> Optional[Dict]:
+async def _try_model(model: str, prompt: str, api_key: str, feature: str = 'card_generation', user_id: int = None) -> Optional[Dict]:
     """Try a single AI model, return None if rate limited or failed."""
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are a helpful vocabulary tutor creating educational flashcards. Be concise and clear."
-            },
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        "temperature": 0.7,
-        "max_tokens": 500
-    }
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a helpful vocabulary tutor creating educational flashcards. Be concise and clear."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=15)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    content = data['choices'][0]['message']['content']
-                    
-                    # Parse the response
-                    parsed = parse_ai_response(content)
-                    if parsed:
-                        return parsed
-                elif response.status == 429:  # Rate Limit
-                    error_text = await response.text()
-                    print(f"⚠️ Model {model} rate limited, trying next...")
-                    # Don't notify admins on every rate limit, just try next model
-                    return None  # Trigger fallback to next model
-                else:
-                    error_text = await response.text()
-                    print(f"❌ Model {model} error {response.status}: {error_text}")
-                    return None
-    except Exception as e:
-        print(f"❌ Model {model} exception: {e}")
-        return None
+    content = await _chat_completion(feature, model, api_key, messages, temperature=0.7, max_tokens=500, timeout=15, user_id=user_id)
+    if content:
+        return parse_ai_response(content)
+    return None
 
 async def notify_admins_limit_reached(error_text):
     """Notify all admins about API limit reached."""
@@ -237,12 +327,6 @@ async def enhance_definition(word: str, basic_definition: str) -> str:
     if not GROQ_API_KEY:
         return basic_definition
     
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     prompt = f"""Improve this vocabulary definition to be more educational and memorable:
 
 Word: {word}
@@ -255,27 +339,20 @@ Provide an enhanced definition that:
 
 Just provide the enhanced definition, nothing else."""
 
-    payload = {
-        "model": "llama-3.3-70b-versatile",  # Updated from deprecated llama-3.1-70b-versatile
-        "messages": [
-            {"role": "system", "content": "You are a vocabulary expert. Enhance definitions to be clear and educational."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.6,
-        "max_tokens": 200
-    }
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    enhanced = data['choices'][0]['message']['content'].strip()
-                    return enhanced
-                return basic_definition
-    except Exception as e:
-        print(f"AI enhancement error: {e}")
-        return basic_definition
+    messages = [
+        {"role": "system", "content": "You are a vocabulary expert. Enhance definitions to be clear and educational."},
+        {"role": "user", "content": prompt}
+    ]
+    
+    async with ai_scheduler.slot('definition_enhance', 200) as admitted:
+        if not admitted:
+            return basic_definition
+        enhanced = await _chat_completion(
+            'definition_enhance',
+            "llama-3.3-70b-versatile",  # Updated from deprecated llama-3.1-70b-versatile
+            GROQ_API_KEY, messages, temperature=0.6, max_tokens=200, timeout=10
+        )
+        return enhanced.strip() if enhanced else basic_definition
 """
 AI Service Extension for Vocabulary Lookups
 
@@ -284,7 +361,7 @@ Append this to the end of bot_services/ai_service.py
 """
 
 # ===== VOCABULARY AI (Separate from card generation) =====
-async def generate_vocabulary_ai(word: str, reverse_mode: bool = False) -> Optional[Dict]:
+async def generate_vocabulary_ai(word: str, reverse_mode: bool = False, user_id: int = None) -> Optional[Dict]:
     """
     Generate vocabulary definition using AI with 3-model fallback.
     Specifically for vocabulary lookup (not flashcard creation).
@@ -333,63 +410,31 @@ EXAMPLE2: [Second example sentence]
 Note: Automatically adapt the language based on input. For Uzbek words, provide English translation. For English words, provide Uzbek translation."""
     
     # 3. Try vocabulary models in sequence
-    for model in VOCAB_AI_MODELS:
-        result = await _try_vocab_model(model, prompt, api_key)
-        if result:
-            print(f"✅ Vocab AI Success with model: {model}")
-            # Add source indicator
-            result['source'] = 'ai'
-            
-            # Track global AI usage for analytics
-            try:
-                from bot_services.firebase_service import track_ai_usage
-                import asyncio
-                asyncio.create_task(track_ai_usage('vocab_lookup', 500))  # Estimate tokens
-            except Exception as e:
-                print(f"AI tracking failed (non-fatal): {e}")
+    async with ai_scheduler.slot('vocab_lookup', 500) as admitted:
+        if not admitted:
+            return None
+        for model in VOCAB_AI_MODELS:
+            result = await _try_vocab_model(model, prompt, api_key, user_id)
+            if result:
+                print(f"✅ Vocab AI Success with model: {model}")
+                # Add source indicator
+                result['source'] = 'ai'
             
-            return result
-        print(f"⚠️ Vocab model {model} failed, trying next...")
+                return result
+            print(f"⚠️ Vocab model {model} failed, trying next...")
     
     # All models failed
     print("❌ All vocabulary AI models failed!")
     return None
 
-async def _try_vocab_model(model: str, prompt: str, api_key: str) -> Optional[Dict]:
+async def _try_vocab_model(model: str, prompt: str, api_key: str, user_id: int = None) -> Optional[Dict]:
     """Try a single vocabulary AI model, return parsed result or None."""
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3,
-        "max_tokens": 500
-    }
+    messages = [{"role": "user", "content": prompt}]
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=15)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    content = data['choices'][0]['message']['content']
-                    
-                    # Parse the vocabulary response
-                    parsed = _parse_vocab_response(content)
-                    if parsed:
-                        return parsed
-                elif response.status == 429:  # Rate Limit
-                    print(f"⚠️ Vocab model {model} rate limited")
-                    return None
-                else:
-                    error_text = await response.text()
-                    print(f"❌ Vocab model {model} error {response.status}: {error_text}")
-                    return None
-    except Exception as e:
-        print(f"❌ Vocab model {model} exception: {e}")
-        return None
+    content = await _chat_completion('vocab_lookup', model, api_key, messages, temperature=0.3, max_tokens=500, timeout=15, user_id=user_id)
+    if content:
+        return _parse_vocab_response(content)
+    return None
 
 def _parse_vocab_response(text: str) -> Optional[Dict]:
     """Parse AI vocabulary response into structured format."""
@@ -464,81 +509,124 @@ Format EXACTLY:
 ENG: [brief explanation]
 UZB: [Uzbek translation]"""
 
-    url = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": "llama-3.1-8b-instant",  # Fast model for quick explanations
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3,
-        "max_tokens": 100
-    }
+    messages = [{"role": "user", "content": prompt}]
     
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=payload, timeout=aiohttp.ClientTimeout(total=8)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    content = data['choices'][0]['message']['content']
-                    
-                    # Parse response
-                    result = {'eng': '', 'uzb': ''}
-                    for line in content.split('\n'):
-                        line = line.strip()
-                        if line.startswith('ENG:'):
-                            result['eng'] = line.replace('ENG:', '').strip()[:80]
-                        elif line.startswith('UZB:'):
-                            result['uzb'] = line.replace('UZB:', '').strip()[:80]
-                    
-                    # Cache for future use
-                    if result['eng'] or result['uzb']:
-                        try:
-                            await save_to_cache(term, {
-                                'definition': result['eng'],
-                                'translation_uz': result['uzb']
-                            }, 'ai')
-                        except:
-                            pass
-                        
-                        # Track AI usage
-                        try:
-                            from bot_services.firebase_service import track_ai_usage
-                            import asyncio
-                            asyncio.create_task(track_ai_usage('quiz_explanation', 100))
-                        except:
-                            pass
-                        
-                        return result
-                    
-                return None
-    except Exception as e:
-        print(f"Quiz explanation AI error: {e}")
+    async with ai_scheduler.slot('quiz_explanation', 100) as admitted:
+        if not admitted:
+            return None
+        content = await _chat_completion(
+            'quiz_explanation',
+            "llama-3.1-8b-instant",  # Fast model for quick explanations
+            api_key, messages, temperature=0.3, max_tokens=100, timeout=8
+        )
+    
+    if not content:
+        return None
+    
+    # Parse response
+    result = {'eng': '', 'uzb': ''}
+    for line in content.split('\n'):
+        line = line.strip()
+        if line.startswith('ENG:'):
+            result['eng'] = line.replace('ENG:', '').strip()[:80]
+        elif line.startswith('UZB:'):
+            result['uzb'] = line.replace('UZB:', '').strip()[:80]
+    
+    if not (result['eng'] or result['uzb']):
         return None
+    
+    # Cache for future use
+    try:
+        await save_to_cache(term, {
+            'definition': result['eng'],
+            'translation_uz': result['uzb']
+        }, 'ai')
+    except:
+        pass
+    
+    return result
 
-# ===== AI QUIZ GENERATOR =====
-async def generate_quiz_from_topic(topic: str, num_questions: int = 10, user_id: int = None) -> Optional[List[Dict]]:
+async def generate_quiz_explanations_batch(items: List[tuple]) -> Dict[str, Dict]:
     """
-    Generate quiz questions from a topic using AI.
-    Returns list of questions: [{'text': '...', 'options': [...], 'correct_index': 0}, ...]
+    Batched version of generate_quiz_explanation_ai: one prompt for many cards.
+    
+    Args:
+        items: [(term, definition), ...] - cards with no cached explanation
+        
+    Returns: {term: {'eng': '...', 'uzb': '...'}} for the items the model answered
     """
-    # 1. Get Config
-    config = await get_bot_config()
+    if not items:
+        return {}
     
-    # 2. Check Global Toggle
+    config = await get_bot_config()
     if not config.get('ai_enabled', True):
-        return None
-    
-    # 3. Get API Key
+        return {}
     api_keys = config.get('api_keys', [])
     api_key = api_keys[0] if api_keys else GROQ_API_KEY
-    
     if not api_key:
-        return None
+        return {}
     
-    # 4. Build Prompt
-    prompt = f"""Generate {num_questions} multiple choice quiz questions about: "{topic}"
+    listing = "\n".join(f'{i}. "{term}" - {definition[:120]}' for i, (term, definition) in enumerate(items, 1))
+    prompt = f"""For each numbered English word below (with its definition):
+
+{listing}
+
+Provide for EVERY item:
+1. A brief English explanation (1 sentence, max 80 chars)
+2. Uzbek translation (1-2 words)
+
+Format EXACTLY, keeping the item number on each line:
+1. ENG: [brief explanation]
+1. UZB: [Uzbek translation]
+2. ENG: [brief explanation]
+2. UZB: [Uzbek translation]"""
+
+    messages = [{"role": "user", "content": prompt}]
+    max_tokens = min(60 * len(items) + 50, 1500)
+    
+    async with ai_scheduler.slot('quiz_explanation', max_tokens) as admitted:
+        if not admitted:
+            return {}
+        content = await _chat_completion(
+            'quiz_explanation',
+            "llama-3.1-8b-instant",  # Fast model for quick explanations
+            api_key, messages, temperature=0.3, max_tokens=max_tokens, timeout=20
+        )
+    
+    if not content:
+        return {}
+    
+    # Parse "N. ENG: ..." / "N. UZB: ..." lines
+    parsed = {}
+    for line in content.split('\n'):
+        match = re.match(r'^\s*(\d+)[.)]\s*(ENG|UZB):\s*(.+)$', line.strip())
+        if not match:
+            continue
+        index = int(match.group(1)) - 1
+        if 0 <= index < len(items):
+            parsed.setdefault(index, {'eng': '', 'uzb': ''})[match.group(2).lower()] = match.group(3).strip()[:80]
+    
+    results = {}
+    from bot_services.vocabulary_cache import save_to_cache
+    for index, result in parsed.items():
+        if not (result['eng'] or result['uzb']):
+            continue
+        term = items[index][0]
+        results[term] = result
+        # Cache for future use
+        try:
+            await save_to_cache(term, {
+                'definition': result['eng'],
+                'translation': result['uzb']
+            }, 'ai')
+        except Exception:
+            pass
+    
+    return results
+
+# ===== AI QUIZ GENERATOR =====
+def _topic_quiz_prompt(topic: str, num_questions: int) -> str:
+    return f"""Generate {num_questions} multiple choice quiz questions about: "{topic}"
 
 For each question:
 - Create a clear question
@@ -557,40 +645,116 @@ Q2: [Question text]
 
 IMPORTANT: Always put the CORRECT answer as option A."""
 
+async def generate_quiz_from_topic(topic: str, num_questions: int = 10, user_id: int = None) -> Optional[List[Dict]]:
+    """
+    Generate quiz questions from a topic using AI.
+    Returns list of questions: [{'text': '...', 'options': [...], 'correct_index': 0}, ...]
+    """
+    # 1. Get Config
+    config = await get_bot_config()
+    
+    # 2. Check Global Toggle
+    if not config.get('ai_enabled', True):
+        return None
+    
+    # 3. Get API Key
+    api_keys = config.get('api_keys', [])
+    api_key = api_keys[0] if api_keys else GROQ_API_KEY
+    
+    if not api_key:
+        return None
+    
+    # 4. Build Prompt
+    prompt = _topic_quiz_prompt(topic, num_questions)
+
     # 5. Try AI Models
-    for model in AI_MODELS[:3]:  # Use top 3 models
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.groq.com/openai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.7,
-                        "max_tokens": 2000
-                    },
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data['choices'][0]['message']['content']
-                        
-                        # Parse the response
-                        questions = _parse_quiz_response(content)
-                        if questions:
-                            return questions
-        except Exception as e:
-            print(f"AI Quiz Gen error with {model}: {e}")
-            continue
+    async with ai_scheduler.slot('quiz_generation', 2000) as admitted:
+        if not admitted:
+            return None
+        for model in AI_MODELS[:3]:  # Use top 3 models
+            content = await _chat_completion(
+                'quiz_generation', model, api_key,
+                [{"role": "user", "content": prompt}],
+                temperature=0.7, max_tokens=2000, timeout=30, user_id=user_id
+            )
+            if content:
+                # Parse the response
+                questions = _parse_quiz_response(content)
+                if questions:
+                    return questions
     
     return None
 
-def _parse_quiz_response(content: str) -> List[Dict]:
-    """Parse AI response into structured questions."""
+class QuizStreamParser:
+    """
+    Incremental wrapper around _parse_quiz_response.
+    A question is only emitted once the next one starts (or the stream ends),
+    so its options are known to be complete.
+    """
+    
+    def __init__(self, limit: int = 50):
+        self.buffer = ""
+        self.emitted = 0
+        self.limit = limit
+    
+    def feed(self, text: str) -> List[Dict]:
+        self.buffer += text
+        # Only parse complete lines; the last line may still be growing
+        complete = self.buffer[:self.buffer.rfind('\n') + 1]
+        parsed = _parse_quiz_response(complete, limit=None)
+        return self._take(parsed[:-1])  # Last question may still get options
+    
+    def close(self) -> List[Dict]:
+        return self._take(_parse_quiz_response(self.buffer, limit=None))
+    
+    def _take(self, parsed: List[Dict]) -> List[Dict]:
+        parsed = parsed[:self.limit]
+        new = parsed[self.emitted:]
+        self.emitted = max(self.emitted, len(parsed))
+        return new
+
+
+async def stream_quiz_from_topic(topic: str, num_questions: int = 10, user_id: int = None):
+    """
+    Streaming version of generate_quiz_from_topic.
+    Yields questions one by one as soon as they are parsed from the model's SSE stream.
+    Falls back to the next model only if nothing was produced yet.
+    """
+    config = await get_bot_config()
+    if not config.get('ai_enabled', True):
+        return
+    
+    api_keys = config.get('api_keys', [])
+    api_key = api_keys[0] if api_keys else GROQ_API_KEY
+    if not api_key:
+        return
+    
+    prompt = _topic_quiz_prompt(topic, num_questions)
+    
+    async with ai_scheduler.slot('quiz_generation', 2000) as admitted:
+        if not admitted:
+            return
+        for model in AI_MODELS[:3]:  # Use top 3 models
+            parser = QuizStreamParser()
+            stream = _chat_completion_stream(
+                'quiz_generation', model, api_key,
+                [{"role": "user", "content": prompt}],
+                temperature=0.7, max_tokens=2000, timeout=30, user_id=user_id
+            )
+            try:
+                async for delta in stream:
+                    for question in parser.feed(delta):
+                        yield question
+            finally:
+                await stream.aclose()
+            for question in parser.close():
+                yield question
+            if parser.emitted:
+                return
+
+
+def _parse_quiz_response(content: str, limit: Optional[int] = 50) -> List[Dict]:
+    """Parse AI response into structured questions (limit=None keeps all)."""
     questions = []
     lines = content.strip().split('\n')
     
@@ -629,38 +793,100 @@ def _parse_quiz_response(content: str) -> List[Dict]:
             'correct_index': 0
         })
     
-    return questions[:50]  # Limit to 50 questions
+    return questions[:limit] if limit else questions  # Limit to 50 questions by default
+
+
+# ===== FILE IMPORT (CHUNKED) =====
+# Large test banks are split into overlapping windows on question boundaries
+# and each window is extracted concurrently, then merged and deduplicated.
+IMPORT_CHUNK_CHARS = 6000       # Fits the model context with room for the answer
+IMPORT_CHUNK_OVERLAP = 600      # Carried into the next chunk so a split question isn't lost
+IMPORT_PARALLEL_CHUNKS = int(os.getenv("IMPORT_PARALLEL_CHUNKS", 4))
+IMPORT_MAX_CHARS = 240000       # ~80-100 pages of dense text
+IMPORT_DEADLINE = int(os.getenv("IMPORT_DEADLINE", 900))  # Seconds a whole import may wait for AI budget
+IMPORT_MAX_ANSWER_TOKENS = 2500
+
+# Start of a question block: "Q1:", "Q:", "12.", "12)", "Question 3"
+_QUESTION_START = re.compile(r'^\s*(?:Q\s*\d*\s*[:.)]|\d{1,4}\s*[.)]|Question\s+\d+)', re.IGNORECASE | re.MULTILINE)
+
+
+def _split_import_chunks(text: str, size: int = IMPORT_CHUNK_CHARS, overlap: int = IMPORT_CHUNK_OVERLAP) -> List[str]:
+    """Split text into ~size windows that break between questions, overlapping by ~overlap chars."""
+    text = text.strip()
+    if len(text) <= size:
+        return [text] if text else []
+    
+    # Cut into question blocks (anything before the first question stays attached to it)
+    starts = [m.start() for m in _QUESTION_START.finditer(text) if m.start() > 0]
+    bounds = [0] + starts + [len(text)]
+    blocks = []
+    for begin, end in zip(bounds, bounds[1:]):
+        block = text[begin:end]
+        # A block with no recognisable boundary inside it is hard-split
+        while len(block) > size:
+            blocks.append(block[:size])
+            block = block[size - overlap:]
+        if block.strip():
+            blocks.append(block)
+    
+    chunks = []
+    current = []
+    current_len = 0
+    for block in blocks:
+        if current and current_len + len(block) > size:
+            chunks.append("".join(current))
+            # Carry trailing blocks (up to `overlap` chars) into the next window
+            carried = []
+            carried_len = 0
+            for prev in reversed(current):
+                if carried_len + len(prev) > overlap:
+                    break
+                carried.insert(0, prev)
+                carried_len += len(prev)
+            current, current_len = carried, carried_len
+        current.append(block)
+        current_len += len(block)
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def _question_fingerprint(question: Dict) -> str:
+    """Hash of the normalised question text, so overlap/rewording duplicates collapse."""
+    normalized = re.sub(r'[^a-z0-9\u0400-\u04ff]+', ' ', question.get('text', '').lower()).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _dedupe_questions(questions: List[Dict]) -> List[Dict]:
+    seen = set()
+    unique = []
+    for q in questions:
+        fp = _question_fingerprint(q)
+        if fp in seen:
+            continue
+        seen.add(fp)
+        unique.append(q)
+    return unique
+
+
+def _import_token_estimate(prompt: str, chunk: str) -> int:
+    """Scheduler reservation for one chunk: prompt (~4 chars/token) + an answer about the chunk's size."""
+    return len(prompt) // 4 + min(IMPORT_MAX_ANSWER_TOKENS, max(300, len(chunk) // 4))
 
 
-async def generate_quiz_from_file_text(text: str, user_id: int = None) -> Optional[List[Dict]]:
+async def _extract_quiz_chunk(chunk: str, api_key: str, user_id: int = None,
+                              max_wait: Optional[float] = None) -> Optional[List[Dict]]:
     """
-    Generate quiz questions from raw file text using AI.
-    Handles messy formatting, extracting questions and options.
+    Run the extraction prompt on one chunk, trying the top models in order.
+    Returns [] if the chunk has no questions, None if it could not be processed
+    (no AI budget before `max_wait`, or every model failed).
     """
-    # 1. Get Config
-    config = await get_bot_config()
-    
-    # 2. Check Global Toggle
-    if not config.get('ai_enabled', True):
-        return None
-        
-    # 3. Get API Key
-    api_keys = config.get('api_keys', [])
-    api_key = api_keys[0] if api_keys else GROQ_API_KEY
-    
-    if not api_key:
-        return None
-        
-    # 4. Build Prompt
-    # Truncate text if too long (approx 6000 chars to fit in context)
-    safe_text = text[:6000]
-    
     prompt = f"""Extract multiple choice quiz questions from the following text.
 The text might be messy (from PDF/DOCX). Find all valid questions.
 
 TEXT CONTENT:
 \"\"\"
-{safe_text}
+{chunk}
 \"\"\"
 
 INSTRUCTIONS:
@@ -680,35 +906,90 @@ D) [Distractor 3]
 ---
 """
 
-    # 5. Try AI Models
-    for model in AI_MODELS[:3]:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.groq.com/openai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": model,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0.3, # Lower temperature for extraction
-                        "max_tokens": 2500
-                    },
-                    timeout=aiohttp.ClientTimeout(total=45)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data['choices'][0]['message']['content']
-                        
-                        # Parse the response using the existing parser
-                        # The parser expects Q... lines so we reuse the format
-                        questions = _parse_quiz_response(content)
-                        if questions and len(questions) > 0:
-                            return questions
-        except Exception as e:
-            print(f"AI File Import error {model}: {e}")
-            continue
-            
-    return None
+    answered = False
+    async with ai_scheduler.slot('quiz_import', _import_token_estimate(prompt, chunk), max_wait) as admitted:
+        if not admitted:
+            return None
+        for model in AI_MODELS[:3]:
+            content = await _chat_completion(
+                'quiz_import', model, api_key,
+                [{"role": "user", "content": prompt}],
+                temperature=0.3,  # Lower temperature for extraction
+                max_tokens=IMPORT_MAX_ANSWER_TOKENS, timeout=45, user_id=user_id
+            )
+            if content:
+                answered = True
+                # Parse the response using the existing parser
+                # The parser expects Q... lines so we reuse the format
+                questions = _parse_quiz_response(content, limit=None)
+                if questions:
+                    return questions
+    return [] if answered else None
+
+
+async def generate_quiz_from_file_text(text: str, user_id: int = None, on_progress=None) -> Tuple[Optional[List[Dict]], int, int]:
+    """
+    Generate quiz questions from raw file text using AI.
+    Handles messy formatting, extracting questions and options.
+    
+    The text is chunked on question boundaries and chunks are extracted
+    concurrently (IMPORT_PARALLEL_CHUNKS at a time). Chunks wait in the
+    scheduler's 'bulk' class until IMPORT_DEADLINE instead of being dropped.
+    
+    Args:
+        on_progress: Optional async callback(done_chunks, total_chunks)
+    
+    Returns:
+        (questions or None, failed_chunks, total_chunks) - failed chunks got no
+        AI budget before the deadline or failed on every model
+    """
+    # 1. Get Config
+    config = await get_bot_config()
+    
+    # 2. Check Global Toggle
+    if not config.get('ai_enabled', True):
+        return None, 0, 0
+        
+    # 3. Get API Keys (chunks are spread across all configured keys)
+    api_keys = config.get('api_keys', []) or ([GROQ_API_KEY] if GROQ_API_KEY else [])
+    
+    if not api_keys:
+        return None, 0, 0
+        
+    # 4. Chunk the text
+    if len(text) > IMPORT_MAX_CHARS:
+        print(f"⚠️ Import text truncated from {len(text)} to {IMPORT_MAX_CHARS} chars")
+    chunks = _split_import_chunks(text[:IMPORT_MAX_CHARS])
+    if not chunks:
+        return None, 0, 0
+    
+    # 5. Extract all chunks with bounded parallelism, all sharing one deadline
+    semaphore = asyncio.Semaphore(IMPORT_PARALLEL_CHUNKS)
+    deadline = time.monotonic() + IMPORT_DEADLINE
+    done = 0
+    
+    async def run_chunk(index: int, chunk: str) -> Optional[List[Dict]]:
+        nonlocal done
+        async with semaphore:
+            try:
+                result = await _extract_quiz_chunk(
+                    chunk, api_keys[index % len(api_keys)], user_id, max_wait=deadline - time.monotonic()
+                )
+            except Exception as e:
+                print(f"❌ Import chunk {index + 1}/{len(chunks)} failed: {e}")
+                result = None
+        done += 1
+        if on_progress:
+            try:
+                await on_progress(done, len(chunks))
+            except Exception:
+                pass  # Progress display is best-effort
+        return result
+    
+    results = await asyncio.gather(*(run_chunk(i, c) for i, c in enumerate(chunks)))
+    
+    # 6. Merge in document order and drop duplicates from overlapping windows
+    failed = sum(1 for r in results if r is None)
+    questions = _dedupe_questions([q for chunk_questions in results if chunk_questions for q in chunk_questions])
+    print(f"📄 Import: {len(chunks)} chunks -> {len(questions)} questions ({failed} chunks failed)")
+    return questions or None, failed, len(chunks)
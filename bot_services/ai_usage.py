@@ -0,0 +1,145 @@
+"""
+AI Usage Accounting
+
+Records the real cost of every Groq call from the response `usage` fields:
+- prompt/completion tokens, model, key (fingerprint only), latency, outcome
+- aggregated in memory per day/feature/model/user
+- flushed to `ai_stats` in a single Firestore batch (periodically or when the buffer fills)
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from bot_services.firebase_service import TASHKENT_TZ, flush_ai_usage, get_ai_stats, get_user_ai_token_usage
+
+# Flush when this many calls are buffered, or every FLUSH_INTERVAL seconds
+FLUSH_EVERY_CALLS = 50
+FLUSH_INTERVAL = 60
+
+_pending_calls = 0
+_day_totals = {}   # {date: {...aggregate...}}
+_user_totals = {}  # {(date, user_id): {...aggregate...}}
+_flush_lock = asyncio.Lock()
+
+
+def _empty_bucket() -> Dict:
+    return {
+        'requests': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'latency_ms': 0,
+        'features': defaultdict(lambda: {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0}),
+        'models': defaultdict(lambda: {'requests': 0, 'tokens': 0}),
+        'keys': defaultdict(int),
+        'outcomes': defaultdict(int),
+    }
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Never store raw keys - keep only the last 4 characters."""
+    return f"…{api_key[-4:]}" if api_key else "none"
+
+
+def record_ai_call(feature: str, model: str, api_key: str, outcome: str,
+                   latency: float, usage: Optional[Dict] = None, user_id: int = None):
+    """
+    Record one model call.
+
+    Args:
+        feature: Logical feature ('vocab_lookup', 'card_generation', ...)
+        model: Groq model name
+        api_key: Key used (stored as fingerprint)
+        outcome: 'ok', 'rate_limited', 'error', 'timeout' or 'parse_failed'
+        latency: Seconds spent on the HTTP call
+        usage: The response `usage` object (prompt_tokens / completion_tokens)
+        user_id: Requesting user, if any
+    """
+    global _pending_calls
+    usage = usage or {}
+    prompt_tokens = int(usage.get('prompt_tokens', 0) or 0)
+    completion_tokens = int(usage.get('completion_tokens', 0) or 0)
+    date_str = datetime.now(TASHKENT_TZ).strftime('%Y-%m-%d')
+
+    buckets = [_day_totals.setdefault(date_str, _empty_bucket())]
+    if user_id:
+        buckets.append(_user_totals.setdefault((date_str, str(user_id)), _empty_bucket()))
+
+    for b in buckets:
+        b['requests'] += 1
+        b['prompt_tokens'] += prompt_tokens
+        b['completion_tokens'] += completion_tokens
+        b['latency_ms'] += int(latency * 1000)
+        f = b['features'][feature]
+        f['requests'] += 1
+        f['prompt_tokens'] += prompt_tokens
+        f['completion_tokens'] += completion_tokens
+        m = b['models'][model]
+        m['requests'] += 1
+        m['tokens'] += prompt_tokens + completion_tokens
+        b['keys'][key_fingerprint(api_key)] += 1
+        b['outcomes'][outcome] += 1
+
+    _pending_calls += 1
+    if _pending_calls >= FLUSH_EVERY_CALLS:
+        try:
+            asyncio.get_running_loop().create_task(flush_usage())
+        except RuntimeError:
+            pass  # No loop (scripts) - periodic flush will pick it up
+
+
+async def flush_usage():
+    """Write buffered aggregates to Firestore in one batch."""
+    global _day_totals, _user_totals, _pending_calls
+    async with _flush_lock:
+        if not _pending_calls:
+            return
+        day_totals, user_totals = _day_totals, _user_totals
+        _day_totals, _user_totals, _pending_calls = {}, {}, 0
+        try:
+            await flush_ai_usage(day_totals, user_totals)
+        except Exception as e:
+            print(f"AI usage flush failed, re-queueing: {e}")
+            _merge_back(day_totals, user_totals)
+
+
+def _merge_back(day_totals: Dict, user_totals: Dict):
+    """Put a failed flush back in front of newer data so nothing is lost."""
+    global _pending_calls
+    for target, source in ((_day_totals, day_totals), (_user_totals, user_totals)):
+        for key, bucket in source.items():
+            current = target.setdefault(key, _empty_bucket())
+            for field in ('requests', 'prompt_tokens', 'completion_tokens', 'latency_ms'):
+                current[field] += bucket[field]
+            for name, f in bucket['features'].items():
+                for field, value in f.items():
+                    current['features'][name][field] += value
+            for name, m in bucket['models'].items():
+                for field, value in m.items():
+                    current['models'][name][field] += value
+            for name, value in bucket['keys'].items():
+                current['keys'][name] += value
+            for name, value in bucket['outcomes'].items():
+                current['outcomes'][name] += value
+            _pending_calls += bucket['requests']
+
+
+async def ai_usage_flusher():
+    """Background loop: flush buffered usage every FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        await flush_usage()
+
+
+# ===== QUERIES =====
+async def get_feature_usage(date_str: str = None) -> Dict:
+    """Real token usage per feature for a day: {feature: {requests, prompt_tokens, completion_tokens}}."""
+    stats = await get_ai_stats(date_str)
+    return stats.get('feature_usage', {})
+
+
+async def get_user_usage(user_id: int, days: int = 7) -> Dict:
+    """Real token usage for one user over the last N days, split by feature."""
+    return await get_user_ai_token_usage(user_id, days)
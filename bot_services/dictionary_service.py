@@ -1,13 +1,18 @@
+import os
 import aiohttp
 from typing import Optional, Dict, List
 
+# Overridable so lookups can be pointed at a local mock (see benchmarks/)
+DICTIONARY_API_BASE = os.getenv("DICTIONARY_API_BASE", "https://api.dictionaryapi.dev")
+MYMEMORY_API_BASE = os.getenv("MYMEMORY_API_BASE", "https://api.mymemory.translated.net")
+
 # ===== FREE DICTIONARY API =====
 async def get_word_definition(word: str) -> Optional[Dict]:
     """
     Fetch word definition from Free Dictionary API.
     Returns: dict with 'word', 'phonetic', 'meanings', 'examples'
     """
-    url = f"https://api.dictionaryapi.dev/api/v2/entries/en/{word}"
+    url = f"{DICTIONARY_API_BASE}/api/v2/entries/en/{word}"
     
     try:
         async with aiohttp.ClientSession() as session:
@@ -53,7 +58,7 @@ async def translate_word(text: str, from_lang: str = "en", to_lang: str = "uz")
     """
     # MyMemory uses language codes: en-US, uz-UZ
     lang_pair = f"{from_lang}|{to_lang}"
-    url = f"https://api.mymemory.translated.net/get?q={text}&langpair={lang_pair}"
+    url = f"{MYMEMORY_API_BASE}/get?q={text}&langpair={lang_pair}"
     
     try:
         async with aiohttp.ClientSession() as session:
@@ -0,0 +1,102 @@
+"""
+Distractor Index
+
+Precomputed wrong-answer candidates for MCQ / quiz options, built once per
+set version (see set_cache.py) instead of sampling + pairwise similarity
+checks on every question:
+- token set and length bucket per answer text (tokenised once)
+- per card, a short ranked list of plausible but not-too-similar distractors
+- picking options is then a constant-time lookup
+"""
+
+import random
+from typing import List
+
+# Same meaning as utils.are_too_similar (Jaccard word overlap)
+SIMILARITY_THRESHOLD = 0.6
+
+# Candidates kept per card, and how many cards are compared per card at build time
+CANDIDATES_PER_CARD = 8
+MAX_COMPARISONS = 200
+
+# Poll options / buttons are cut at 100 chars; longer answers make poor distractors
+MAX_OPTION_LENGTH = 100
+
+
+def _length_bucket(text: str) -> int:
+    """Coarse answer length: 1 word, 2, 3-4, 5-8, 9-16, longer."""
+    words = len(text.split())
+    bucket = 0
+    while words > 1 and bucket < 5:
+        words = (words + 1) // 2
+        bucket += 1
+    return bucket
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DistractorIndex:
+    """Distractor candidates for one answer column (definitions, or terms in reverse mode)."""
+
+    def __init__(self, texts: List[str], seed: int = 0):
+        self.texts = texts
+        self.tokens = [frozenset(t.lower().split()) for t in texts]
+        self.buckets = [_length_bucket(t) for t in texts]
+        self.candidates = self._build(random.Random(seed))
+
+    def _build(self, rng: random.Random) -> List[List[int]]:
+        n = len(self.texts)
+        by_bucket = {}
+        for i, b in enumerate(self.buckets):
+            by_bucket.setdefault(b, []).append(i)
+
+        candidates = []
+        for i in range(n):
+            text = self.texts[i]
+            # Same / neighbouring length buckets first - they make plausible options
+            pool = []
+            for distance in (0, 1, 2):
+                for b in {self.buckets[i] - distance, self.buckets[i] + distance}:
+                    pool.extend(by_bucket.get(b, []))
+                if len(pool) >= MAX_COMPARISONS:
+                    break
+            if len(pool) < CANDIDATES_PER_CARD:
+                pool = list(range(n))
+            if len(pool) > MAX_COMPARISONS:
+                pool = rng.sample(pool, MAX_COMPARISONS)
+
+            scored = []
+            for j in pool:
+                other = self.texts[j]
+                if j == i or not other or other == text or len(other) >= MAX_OPTION_LENGTH:
+                    continue
+                sim = _jaccard(self.tokens[i], self.tokens[j])
+                if sim > SIMILARITY_THRESHOLD:
+                    continue
+                # Closer length first, then some overlap (harder), never near-duplicates
+                scored.append((abs(self.buckets[i] - self.buckets[j]), -sim, j))
+            scored.sort()
+            # Keep candidates mutually dissimilar so any 3 of them form a valid option set
+            kept = []
+            for _, _, j in scored:
+                if any(self.texts[j] == self.texts[k] or
+                       _jaccard(self.tokens[j], self.tokens[k]) > SIMILARITY_THRESHOLD for k in kept):
+                    continue
+                kept.append(j)
+                if len(kept) >= CANDIDATES_PER_CARD:
+                    break
+            candidates.append(kept)
+        return candidates
+
+    def pick(self, i: int, count: int = 3) -> List[str]:
+        """
+        Up to `count` distractor texts for card i (candidates are already
+        mutually dissimilar). May return fewer for small or uniform sets.
+        """
+        candidates = self.candidates[i]
+        chosen = random.sample(candidates, min(count, len(candidates)))
+        return [self.texts[j] for j in chosen]
@@ -366,29 +366,84 @@ async def check_ai_limit(user_id):
     return await run_sync(_check_ai_limit_sync, user_id)
 
 # --- GLOBAL AI USAGE TRACKING ---
-def _track_ai_usage_sync(feature: str, tokens_used: int = 0):
-    """Track global AI usage for analytics dashboard."""
-    today_str = datetime.now(TASHKENT_TZ).strftime('%Y-%m-%d')
-    doc_ref = db.collection('ai_stats').document(today_str)
-    
-    doc = doc_ref.get()
-    if doc.exists:
-        doc_ref.update({
-            'total_requests': firestore.Increment(1),
-            'total_tokens': firestore.Increment(tokens_used),
-            f'features.{feature}': firestore.Increment(1)
-        })
-    else:
-        doc_ref.set({
-            'date': today_str,
-            'total_requests': 1,
-            'total_tokens': tokens_used,
-            'features': {feature: 1}
-        })
+def _usage_bucket_fields(bucket):
+    """Convert an in-memory usage aggregate into Firestore increments."""
+    total_tokens = bucket['prompt_tokens'] + bucket['completion_tokens']
+    return {
+        'total_requests': firestore.Increment(bucket['requests']),
+        'total_tokens': firestore.Increment(total_tokens),
+        'prompt_tokens': firestore.Increment(bucket['prompt_tokens']),
+        'completion_tokens': firestore.Increment(bucket['completion_tokens']),
+        'total_latency_ms': firestore.Increment(bucket['latency_ms']),
+        # 'features' keeps the legacy request counter per feature
+        'features': {name: firestore.Increment(f['requests']) for name, f in bucket['features'].items()},
+        'feature_usage': {
+            name: {
+                'requests': firestore.Increment(f['requests']),
+                'prompt_tokens': firestore.Increment(f['prompt_tokens']),
+                'completion_tokens': firestore.Increment(f['completion_tokens'])
+            } for name, f in bucket['features'].items()
+        },
+        # Model names contain dots, which Firestore treats as path separators
+        'models': {
+            name.replace('.', '_'): {
+                'requests': firestore.Increment(m['requests']),
+                'tokens': firestore.Increment(m['tokens'])
+            } for name, m in bucket['models'].items()
+        },
+        'keys': {name: firestore.Increment(v) for name, v in bucket['keys'].items()},
+        'outcomes': {name: firestore.Increment(v) for name, v in bucket['outcomes'].items()}
+    }
+
+def _flush_ai_usage_sync(day_totals, user_totals):
+    """
+    Write aggregated AI usage in one batch.
+    ai_stats/{date} holds the global totals,
+    ai_stats/{date}/users/{uid} holds per-user totals.
+    """
+    batch = db.batch()
+    for date_str, bucket in day_totals.items():
+        ref = db.collection('ai_stats').document(date_str)
+        fields = _usage_bucket_fields(bucket)
+        fields['date'] = date_str
+        batch.set(ref, fields, merge=True)
+    for (date_str, user_id), bucket in user_totals.items():
+        ref = db.collection('ai_stats').document(date_str).collection('users').document(user_id)
+        fields = _usage_bucket_fields(bucket)
+        fields['user_id'] = user_id
+        fields['date'] = date_str
+        batch.set(ref, fields, merge=True)
+    batch.commit()
 
-async def track_ai_usage(feature: str, tokens_used: int = 0):
-    """Track global AI usage (async wrapper)."""
-    await run_sync(_track_ai_usage_sync, feature, tokens_used)
+async def flush_ai_usage(day_totals, user_totals):
+    """Flush aggregated AI usage (async wrapper)."""
+    await run_sync(_flush_ai_usage_sync, day_totals, user_totals)
+
+def _get_user_ai_token_usage_sync(user_id, days=7):
+    """Sum one user's real AI token usage over the past N days."""
+    today = datetime.now(TASHKENT_TZ)
+    refs = [
+        db.collection('ai_stats').document((today - timedelta(days=i)).strftime('%Y-%m-%d'))
+          .collection('users').document(str(user_id))
+        for i in range(days)
+    ]
+    totals = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'features': {}}
+    for doc in db.get_all(refs):
+        if not doc.exists:
+            continue
+        data = doc.to_dict()
+        totals['requests'] += data.get('total_requests', 0)
+        totals['prompt_tokens'] += data.get('prompt_tokens', 0)
+        totals['completion_tokens'] += data.get('completion_tokens', 0)
+        for name, f in data.get('feature_usage', {}).items():
+            current = totals['features'].setdefault(name, {'requests': 0, 'tokens': 0})
+            current['requests'] += f.get('requests', 0)
+            current['tokens'] += f.get('prompt_tokens', 0) + f.get('completion_tokens', 0)
+    return totals
+
+async def get_user_ai_token_usage(user_id, days=7):
+    """Per-user AI token usage over N days (async)."""
+    return await run_sync(_get_user_ai_token_usage_sync, user_id, days)
 
 def _get_ai_stats_sync(date_str: str = None):
     """Get AI usage stats for a specific day."""
@@ -421,11 +476,28 @@ async def get_ai_stats_range(days: int = 7):
     return stats
 
 # --- THE SUPER FUNCTION (SPEED FIX) ---
-def _process_card_action_sync(user_id, is_correct, xp_reward):
-    """Handles Streak, Daily Count, and XP in ONE database call."""
+RECENT_OPS_KEPT = 20  # Applied card-action op ids remembered per user (retry dedupe)
+
+def _process_card_action_sync(user_id, is_correct, xp_reward, op_id=None):
+    """
+    Handles Streak, Daily Count, and XP in ONE database call.
+    With `op_id` the read and write run in a transaction that also records the
+    id in the user doc, so a retried job (write_queue) is applied only once.
+    """
     doc_ref = db.collection('users').document(str(user_id))
-    doc = doc_ref.get()
-    
+    if op_id is None:
+        return _apply_card_action(None, doc_ref, doc_ref.get(), is_correct, xp_reward)
+
+    @firestore.transactional
+    def _once(transaction):
+        doc = doc_ref.get(transaction=transaction)
+        if doc.exists and op_id in (doc.to_dict().get('recent_ops') or []):
+            return False  # Already applied by an earlier attempt
+        return _apply_card_action(transaction, doc_ref, doc, is_correct, xp_reward, op_id)
+
+    return _once(db.transaction())
+
+def _apply_card_action(transaction, doc_ref, doc, is_correct, xp_reward, op_id=None):
     if not doc.exists: return False
     user = doc.to_dict()
     
@@ -481,9 +553,15 @@ def _process_card_action_sync(user_id, is_correct, xp_reward):
     streak_updates = _update_streak_logic_internal(user, user.get('streak', 0))
     updates.update(streak_updates)
 
+    if op_id is not None:
+        updates['recent_ops'] = ((user.get('recent_ops') or []) + [op_id])[-RECENT_OPS_KEPT:]
+
     # Execute all updates in ONE write
     if updates:
-        doc_ref.update(updates)
+        if transaction is not None:
+            transaction.update(doc_ref, updates)
+        else:
+            doc_ref.update(updates)
         
     return goal_just_hit
 
@@ -520,8 +598,8 @@ def _update_streak_logic_internal(user_data, current_streak):
     updates['dates_practiced'] = firestore.ArrayUnion([today_str])
     return updates
 
-async def process_card_action(user_id, is_correct, xp_reward):
-    return await run_sync(_process_card_action_sync, user_id, is_correct, xp_reward)
+async def process_card_action(user_id, is_correct, xp_reward, op_id=None):
+    return await run_sync(_process_card_action_sync, user_id, is_correct, xp_reward, op_id)
 
 # Keep this for manual streak updates if needed, but process_card_action handles it now
 def _update_streak_sync(user_id):
@@ -992,7 +1070,9 @@ def _add_card_to_set_sync(set_id, term, definition):
 
 async def add_card_to_set(set_id, term, definition):
     """Add a single card to an existing set (async)."""
-    return await run_sync(_add_card_to_set_sync, set_id, term, definition)
+    result = await run_sync(_add_card_to_set_sync, set_id, term, definition)
+    _invalidate_set_cache(set_id)
+    return result
 
 def _get_set_sync(set_id):
     """Get a single set's details."""
@@ -1007,6 +1087,11 @@ async def get_set(set_id):
     """Async wrapper for getting a set."""
     return await run_sync(_get_set_sync, set_id)
 
+def _invalidate_set_cache(set_id):
+    # Local import: set_cache depends on this module
+    from bot_services.set_cache import invalidate_set
+    invalidate_set(set_id)
+
 def _get_set_cards_sync(set_id):
     """Get all cards for a specific set."""
     docs = db.collection('sets').document(set_id).collection('cards').stream()
@@ -1045,7 +1130,23 @@ def _add_cards_to_set_sync(set_id, cards_list):
     })
 
 async def add_cards_to_set(set_id, cards_list):
-    return await run_sync(_add_cards_to_set_sync, set_id, cards_list)
+    result = await run_sync(_add_cards_to_set_sync, set_id, cards_list)
+    _invalidate_set_cache(set_id)
+    return result
+
+def _update_set_card_sync(set_id, card_id, update_data):
+    db.collection('sets').document(set_id).collection('cards').document(card_id).update(update_data)
+
+async def update_set_card(set_id, card_id, term=None, definition=None):
+    """Update a card in sets/{set_id}/cards and drop the set's cached snapshot."""
+    update_data = {}
+    if term is not None:
+        update_data['term'] = term
+    if definition is not None:
+        update_data['definition'] = definition
+    if update_data:
+        await run_sync(_update_set_card_sync, set_id, card_id, update_data)
+        _invalidate_set_cache(set_id)
 
 def _get_user_sets_sync(user_id, folder_id=None, recursive=False):
     query = db.collection('sets').where('owner_id', '==', str(user_id))
@@ -1131,7 +1232,8 @@ def _delete_set_sync(set_id):
     set_ref.delete()
 
 async def delete_set(set_id):
-    return await run_sync(_delete_set_sync, set_id)
+    await run_sync(_delete_set_sync, set_id)
+    _invalidate_set_cache(set_id)
 
 def _toggle_set_privacy_sync(set_id):
     """Toggle the is_public status of a set."""
@@ -1159,6 +1261,8 @@ def _update_card_sync(card_id, term=None, definition=None):
 
 async def update_card(card_id, term=None, definition=None):
     await run_sync(_update_card_sync, card_id, term, definition)
+    from bot_services.set_cache import invalidate_card
+    invalidate_card(card_id)
 
 def _delete_card_sync(card_id):
     """Delete a card from a set."""
@@ -1173,6 +1277,8 @@ def _delete_card_sync(card_id):
 
 async def delete_card(card_id):
     await run_sync(_delete_card_sync, card_id)
+    from bot_services.set_cache import invalidate_card
+    invalidate_card(card_id)
 
 # --- EXPLORE ---
 def _search_public_sets_sync(query_text):
@@ -1349,23 +1455,16 @@ async def delete_user_data(user_id):
     await run_sync(_delete_user_data_sync, user_id)
 
 # --- SM-2 & PROGRESS ---
-def _update_card_progress_sync(user_id, set_id, card_id, quality):
-    # We store progress in a subcollection of the USER, not the card
-    # users/{uid}/progress/{card_id}
-    # This allows multiple users to study the same public set
-    
-    ref = db.collection('users').document(str(user_id)).collection('progress').document(card_id)
-    doc = ref.get()
-    
-    if doc.exists:
-        data = doc.to_dict()
-        n = data.get('n', 0)
-        ef = data.get('ef', 2.5)
-        interval = data.get('interval', 0)
-    else:
-        n = 0
-        ef = 2.5
-        interval = 0
+def compute_sm2_progress(progress, quality):
+    """
+    New SM-2 state for a card from its current progress doc (None for a new card).
+    Pure function - lets review sessions rate cards without a DB round trip.
+    Returns {'n', 'ef', 'interval', 'next_review'}.
+    """
+    progress = progress or {}
+    n = progress.get('n', 0)
+    ef = progress.get('ef', 2.5)
+    interval = progress.get('interval', 0)
         
     # Enhanced SM-2 Algorithm with 4 difficulty levels
     # Quality: 1 (Again), 2 (Hard), 3 (Good), 4 (Easy)
@@ -1412,20 +1511,49 @@ def _update_card_progress_sync(user_id, set_id, card_id, quality):
         interval = 1
         
     next_review = datetime.now(TASHKENT_TZ) + timedelta(days=interval)
+    return {"n": n, "ef": ef, "interval": interval, "next_review": next_review}
+
+def _update_card_progress_sync(user_id, set_id, card_id, quality):
+    # We store progress in a subcollection of the USER, not the card
+    # users/{uid}/progress/{card_id}
+    # This allows multiple users to study the same public set
     
-    update_data = {
-        "set_id": set_id, # Link back to set
-        "n": n,
-        "ef": ef,
-        "interval": interval,
-        "next_review": next_review,
-        "last_reviewed": firestore.SERVER_TIMESTAMP
-    }
+    ref = db.collection('users').document(str(user_id)).collection('progress').document(card_id)
+    doc = ref.get()
+    
+    update_data = compute_sm2_progress(doc.to_dict() if doc.exists else None, quality)
+    update_data["set_id"] = set_id  # Link back to set
+    update_data["last_reviewed"] = firestore.SERVER_TIMESTAMP
     ref.set(update_data)
 
 async def update_card_progress(user_id, set_id, card_id, quality):
     await run_sync(_update_card_progress_sync, user_id, set_id, card_id, quality)
 
+def _commit_card_progress_sync(user_id, updates):
+    """
+    Write several cards' SM-2 progress in one batch.
+    updates: {card_id: {'set_id', 'n', 'ef', 'interval', 'next_review'}}
+    next_review may be a datetime or a POSIX timestamp (as kept in FSM state).
+    """
+    progress_ref = db.collection('users').document(str(user_id)).collection('progress')
+    batch = db.batch()
+    count = 0
+    for card_id, update in updates.items():
+        data = dict(update)
+        if isinstance(data.get('next_review'), (int, float)):
+            data['next_review'] = datetime.fromtimestamp(data['next_review'], TASHKENT_TZ)
+        data['last_reviewed'] = firestore.SERVER_TIMESTAMP
+        batch.set(progress_ref.document(card_id), data)
+        count += 1
+        if count % 450 == 0:  # Firestore batch limit is 500
+            batch.commit()
+            batch = db.batch()
+    if count % 450:
+        batch.commit()
+
+async def commit_card_progress(user_id, updates):
+    await run_sync(_commit_card_progress_sync, user_id, updates)
+
 def _get_due_cards_sync(user_id):
     now = datetime.now(TASHKENT_TZ)
     # Get all progress items where next_review <= now (using filter to avoid deprecation warning)
@@ -1442,6 +1570,7 @@ def _get_due_cards_sync(user_id):
     # OPTIMIZATION: Group by set_id to batch queries
     # Instead of 1 query per card (N+1 problem), do 1 query per set
     cards_by_set = {}  # {set_id: [card_ids]}
+    progress_by_card = {}  # Returned with each card so reviews can be computed locally
     
     for d in docs:
         data = d.to_dict()
@@ -1452,6 +1581,11 @@ def _get_due_cards_sync(user_id):
             if set_id not in cards_by_set:
                 cards_by_set[set_id] = []
             cards_by_set[set_id].append(card_id)
+            progress_by_card[card_id] = {
+                'n': data.get('n', 0),
+                'ef': data.get('ef', 2.5),
+                'interval': data.get('interval', 0)
+            }
     
     # Fetch all cards for each set (1 query per set instead of 1 per card!)
     due_cards = []
@@ -1463,6 +1597,7 @@ def _get_due_cards_sync(user_id):
                 c_data = c_doc.to_dict()
                 c_data['card_id'] = c_doc.id
                 c_data['set_id'] = set_id
+                c_data['progress'] = progress_by_card[c_doc.id]
                 due_cards.append(c_data)
     
     return due_cards
@@ -1488,7 +1623,7 @@ async def copy_set_to_user(user_id, source_set_id):
     return await run_sync(_copy_set_to_user_sync, user_id, source_set_id)
 
 # --- CUSTOM QUIZ BUILDER DB ---
-def _add_custom_quiz_sync(user_id, title, questions, timer=30):
+def _add_custom_quiz_sync(user_id, title, questions, timer=30, generating=False):
     """
     questions: list of dicts:
     [
@@ -1509,11 +1644,23 @@ def _add_custom_quiz_sync(user_id, title, questions, timer=30):
         'created_at': firestore.SERVER_TIMESTAMP,
         'plays': 0
     }
+    if generating:
+        quiz_data['generating'] = True  # AI is still streaming questions into it
     doc_ref.set(quiz_data)
     return doc_ref.id
 
-async def add_custom_quiz(user_id, title, questions, timer=30):
-    return await run_sync(_add_custom_quiz_sync, user_id, title, questions, timer)
+async def add_custom_quiz(user_id, title, questions, timer=30, generating=False):
+    return await run_sync(_add_custom_quiz_sync, user_id, title, questions, timer, generating)
+
+def _set_custom_quiz_questions_sync(quiz_id, questions, generating=False):
+    db.collection('custom_quizzes').document(quiz_id).update({
+        'questions': questions,
+        'generating': generating
+    })
+
+async def set_custom_quiz_questions(quiz_id, questions, generating=False):
+    """Replace a quiz's questions (used while an AI quiz is streamed in)."""
+    await run_sync(_set_custom_quiz_questions_sync, quiz_id, questions, generating)
 
 def _get_custom_quiz_sync(quiz_id):
     doc = db.collection('custom_quizzes').document(quiz_id).get()
@@ -1782,3 +1929,220 @@ def _delete_question_from_quiz_sync(quiz_id: str, index: int):
 
 async def delete_question_from_quiz(quiz_id: str, index: int):
     return await run_sync(_delete_question_from_quiz_sync, quiz_id, index)
+
+# --- GROUP QUIZ SESSIONS (resume after restart) ---
+def _save_group_session_snapshots_sync(snapshots):
+    """snapshots: {chat_id: snapshot dict} - batched writes (450 per commit)."""
+    items = list(snapshots.items())
+    for start in range(0, len(items), 450):
+        batch = db.batch()
+        for chat_id, snapshot in items[start:start + 450]:
+            batch.set(db.collection('group_sessions').document(str(chat_id)), snapshot)
+        batch.commit()
+
+async def save_group_session_snapshots(snapshots):
+    await run_sync(_save_group_session_snapshots_sync, snapshots)
+
+def _delete_group_session_snapshots_sync(chat_ids):
+    chat_ids = list(chat_ids)
+    for start in range(0, len(chat_ids), 450):
+        batch = db.batch()
+        for chat_id in chat_ids[start:start + 450]:
+            batch.delete(db.collection('group_sessions').document(str(chat_id)))
+        batch.commit()
+
+async def delete_group_session_snapshots(chat_ids):
+    await run_sync(_delete_group_session_snapshots_sync, chat_ids)
+
+def _load_group_session_snapshots_sync():
+    return [doc.to_dict() for doc in db.collection('group_sessions').stream()]
+
+async def load_group_session_snapshots():
+    return await run_sync(_load_group_session_snapshots_sync)
+
+# --- GROUP QUIZ RESULTS & LEADERBOARDS ---
+def _save_group_quiz_result_sync(result):
+    """
+    One finished group quiz -> one batch (chunked past 450 writes):
+    - group_results/{chat_id}_{started_at}: full outcome (players, per-question stats)
+    - group_leaderboards/{chat_id}/players/{uid}: per-group totals (incremental)
+    - group_ratings/{uid}: cross-group totals per player
+    - custom_quizzes/{quiz_id}.question_stats: difficulty per question
+
+    Safe to retry (the write queue does): the result doc ID is derived from the
+    quiz itself, and every batch records its chunk number in that doc in the
+    same commit, so chunks that already landed are skipped and no Increment
+    is applied twice.
+    """
+    chat_id = str(result['chat_id'])
+    winner_id = result.get('winner_id')
+    board_ref = db.collection('group_leaderboards').document(chat_id)
+    result_ref = db.collection('group_results').document(f"{chat_id}_{int(result['started_at'] * 1000)}")
+
+    snapshot = result_ref.get()
+    done = set(snapshot.to_dict().get('chunks_done', [])) if snapshot.exists else set()
+
+    writes = [
+        (board_ref, {'chat_id': result['chat_id'], 'games': firestore.Increment(1),
+                     'last_played': firestore.SERVER_TIMESTAMP}, True),
+    ]
+    if result.get('questions'):
+        writes.append((db.collection('custom_quizzes').document(result['quiz_id']), {
+            'group_plays': firestore.Increment(1),
+            'question_stats': {
+                q['key']: {
+                    'answers': firestore.Increment(q['answers']),
+                    'correct': firestore.Increment(q['correct']),
+                    'time_ms': firestore.Increment(q['time_ms']),
+                } for q in result['questions']
+            }
+        }, True))
+    for p in result['players']:
+        totals = {
+            'name': p['name'],
+            'score': firestore.Increment(p['score']),
+            'answered': firestore.Increment(p['answered']),
+            'games': firestore.Increment(1),
+            'wins': firestore.Increment(1 if p['user_id'] == winner_id else 0),
+            'last_played': firestore.SERVER_TIMESTAMP,
+        }
+        writes.append((board_ref.collection('players').document(str(p['user_id'])), totals, True))
+        writes.append((db.collection('group_ratings').document(str(p['user_id'])),
+                       dict(totals, groups=firestore.ArrayUnion([chat_id])), True))
+
+    chunks = [writes[start:start + 449] for start in range(0, len(writes), 449)]  # +1 marker write
+    for index, chunk in enumerate(chunks):
+        if index in done:
+            continue
+        batch = db.batch()
+        for ref, data, merge in chunk:
+            batch.set(ref, data, merge=merge)
+        marker = {'chunks': len(chunks), 'chunks_done': firestore.ArrayUnion([index])}
+        if index == 0:
+            marker.update(result, ended_at=firestore.SERVER_TIMESTAMP)
+        batch.set(result_ref, marker, merge=True)
+        batch.commit()
+
+async def save_group_quiz_result(result):
+    await run_sync(_save_group_quiz_result_sync, result)
+
+def _get_group_leaderboard_sync(chat_id, limit=10):
+    docs = (db.collection('group_leaderboards').document(str(chat_id)).collection('players')
+            .order_by('score', direction=firestore.Query.DESCENDING).limit(limit).stream())
+    return [dict(doc.to_dict(), user_id=doc.id) for doc in docs]
+
+async def get_group_leaderboard(chat_id, limit=10):
+    """Top players of one group across all its quizzes."""
+    return await run_sync(_get_group_leaderboard_sync, chat_id, limit)
+
+def _get_group_rating_sync(user_id, limit=10):
+    """(player's cross-group totals or None, top players by total score)"""
+    doc = db.collection('group_ratings').document(str(user_id)).get()
+    top = (db.collection('group_ratings').order_by('score', direction=firestore.Query.DESCENDING)
+           .limit(limit).stream())
+    return (doc.to_dict() if doc.exists else None), [dict(d.to_dict(), user_id=d.id) for d in top]
+
+async def get_group_rating(user_id, limit=10):
+    """Cross-group rating (totals over every group quiz) of one player, plus the overall top."""
+    return await run_sync(_get_group_rating_sync, user_id, limit)
+
+# --- HEXAGAME (web game API in main.py) ---
+def _add_game_score_sync(game_data):
+    db.collection('game_scores').add(game_data)
+
+async def add_game_score(game_data):
+    await run_sync(_add_game_score_sync, game_data)
+
+def _get_game_scores_since_sync(start_time, limit):
+    docs = db.collection('game_scores')\
+        .where('timestamp', '>=', start_time)\
+        .order_by('timestamp', direction=firestore.Query.DESCENDING)\
+        .limit(limit)\
+        .stream()
+    return [doc.to_dict() for doc in docs]
+
+async def get_game_scores_since(start_time, limit):
+    """Most recent game scores since start_time (newest first)."""
+    return await run_sync(_get_game_scores_since_sync, start_time, limit)
+
+def _get_best_game_score_sync(user_id):
+    docs = db.collection('game_scores')\
+        .where('user_id', '==', str(user_id))\
+        .order_by('score', direction=firestore.Query.DESCENDING)\
+        .limit(1)\
+        .stream()
+    for doc in docs:
+        return doc.to_dict()
+    return None
+
+async def get_best_game_score(user_id):
+    return await run_sync(_get_best_game_score_sync, user_id)
+
+def _get_user_names_sync(user_ids):
+    refs = [db.collection('users').document(str(uid)) for uid in user_ids]
+    names = {}
+    for doc in db.get_all(refs):
+        if doc.exists:
+            names[doc.id] = doc.to_dict().get('first_name', 'Player')
+    return names
+
+async def get_user_names(user_ids):
+    """{user_id (str): first_name} in one round trip; missing users are left out."""
+    if not user_ids:
+        return {}
+    return await run_sync(_get_user_names_sync, user_ids)
+
+def _get_daily_challenge_completion_sync(user_id, date_str):
+    docs = db.collection('daily_challenges')\
+        .where('user_id', '==', str(user_id))\
+        .where('date', '==', date_str)\
+        .limit(1)\
+        .stream()
+    for doc in docs:
+        return doc.to_dict()
+    return None
+
+async def get_daily_challenge_completion(user_id, date_str):
+    return await run_sync(_get_daily_challenge_completion_sync, user_id, date_str)
+
+def _add_daily_challenge_completion_sync(data):
+    db.collection('daily_challenges').add(data)
+
+async def add_daily_challenge_completion(data):
+    await run_sync(_add_daily_challenge_completion_sync, data)
+
+def _load_game_leaderboards_sync(periods):
+    refs = [db.collection('game_leaderboards').document(p) for p in periods]
+    return {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+
+async def load_game_leaderboards(periods):
+    """Leaderboard snapshot docs {period: {key, entries}} in one round trip."""
+    return await run_sync(_load_game_leaderboards_sync, periods)
+
+def _save_game_leaderboards_sync(boards, merge):
+    """
+    Read-merge-write in one transaction: main.py and game/game_api.py each keep
+    their own boards, so a blind set would drop the other process's entries.
+    """
+    refs = {period: db.collection('game_leaderboards').document(period) for period in boards}
+
+    @firestore.transactional
+    def _merge(transaction):
+        stored = {doc.id: doc.to_dict() for doc in db.get_all(list(refs.values()), transaction=transaction) if doc.exists}
+        merged = {period: merge(stored.get(period), local) for period, local in boards.items()}
+        for period, snapshot in merged.items():
+            transaction.set(refs[period], snapshot)
+        return merged
+
+    return _merge(db.transaction())
+
+async def save_game_leaderboards(boards, merge):
+    """Merge {period: snapshot} into the stored boards via `merge(stored, local)`; returns what was written."""
+    return await run_sync(_save_game_leaderboards_sync, boards, merge)
+
+# --- SMART NOTIFICATIONS ---
+def _set_last_notif_date_sync(user_id, date_str):
+    db.collection('users').document(str(user_id)).update({'last_notif_date': date_str})
+
+async def set_last_notif_date(user_id, date_str):
+    await run_sync(_set_last_notif_date_sync, user_id, date_str)
@@ -0,0 +1,301 @@
+"""
+SQLite FSM Storage
+
+Persistent aiogram FSM storage so practice sessions, quizzes and builder
+flows survive restarts and crashes:
+- one SQLite row per FSM key (state + msgpack-encoded data), WAL mode
+- hot keys cached in memory as packed bytes (compact, and every get_data
+  returns a fresh copy like MemoryStorage)
+- writes coalesced: a key updated many times between flushes is written once,
+  all dirty keys go to disk in a single transaction off the event loop
+- idle keys expire after FSM_TTL_HOURS
+
+Selected in main.py with FSM_STORAGE=sqlite (default) or FSM_STORAGE=memory.
+"""
+
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+
+import msgpack
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+FSM_DB_PATH = os.getenv("FSM_DB_PATH", "fsm_state.db")
+FSM_TTL_HOURS = float(os.getenv("FSM_TTL_HOURS", 48))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", 1.0))  # Seconds between disk writes
+FSM_CACHE_MAX_KEYS = int(os.getenv("FSM_CACHE_MAX_KEYS", 20000))
+
+PURGE_INTERVAL = 600  # Seconds between expired-row sweeps
+
+# msgpack ext type for values it can't encode natively (datetimes, sets...)
+_EXT_PICKLE = 1
+
+
+def _encode_fallback(obj):
+    return msgpack.ExtType(_EXT_PICKLE, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _decode_ext(code, payload):
+    if code == _EXT_PICKLE:
+        return pickle.loads(payload)
+    return msgpack.ExtType(code, payload)
+
+
+def pack_data(data: Mapping[str, Any]) -> bytes:
+    return msgpack.packb(dict(data), default=_encode_fallback, use_bin_type=True)
+
+
+def unpack_data(packed: Optional[bytes]) -> Dict[str, Any]:
+    if not packed:
+        return {}
+    return msgpack.unpackb(packed, ext_hook=_decode_ext, raw=False, strict_map_key=False)
+
+
+class _Entry:
+    __slots__ = ('state', 'data', 'updated_at', 'dirty')
+
+    def __init__(self, state: Optional[str] = None, data: bytes = b'', updated_at: float = 0.0):
+        self.state = state
+        self.data = data
+        self.updated_at = updated_at
+        self.dirty = False
+
+
+class SQLiteStorage(BaseStorage):
+    """aiogram storage backed by a local SQLite file with a write-behind cache."""
+
+    def __init__(self, path: str = FSM_DB_PATH, ttl_hours: float = FSM_TTL_HOURS,
+                 flush_interval: float = FSM_FLUSH_INTERVAL, cache_max_keys: int = FSM_CACHE_MAX_KEYS,
+                 key_builder: Optional[KeyBuilder] = None):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.flush_interval = flush_interval
+        self.cache_max_keys = cache_max_keys
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._dirty = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._last_purge = time.time()
+        self._closed = False
+
+        # Reads run inline on the loop (local, indexed, microseconds); writes
+        # run in a worker thread on their own connection. WAL lets them overlap.
+        self._read_conn = self._connect()
+        self._write_conn = self._connect()
+        self._write_lock = threading.Lock()
+        self._write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            " key TEXT PRIMARY KEY, state TEXT, data BLOB, updated_at REAL NOT NULL)"
+        )
+        self._write_conn.execute("CREATE INDEX IF NOT EXISTS fsm_updated_at ON fsm(updated_at)")
+        self._write_conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ===== CACHE =====
+    def _entry(self, key: StorageKey) -> _Entry:
+        k = self.key_builder.build(key)
+        entry = self._cache.get(k)
+        if entry is None:
+            row = self._read_conn.execute(
+                "SELECT state, data, updated_at FROM fsm WHERE key = ?", (k,)
+            ).fetchone()
+            entry = _Entry(*row) if row else _Entry()
+            self._cache[k] = entry
+            self._evict()
+        else:
+            self._cache.move_to_end(k)
+
+        if entry.updated_at and time.time() - entry.updated_at > self.ttl:
+            # Idle past TTL: behave as empty; the row is removed by the next purge
+            entry.state, entry.data, entry.updated_at = None, b'', 0.0
+        return entry
+
+    def _touch(self, key: StorageKey, entry: _Entry):
+        entry.updated_at = time.time()
+        entry.dirty = True
+        self._dirty.add(self.key_builder.build(key))
+        self._ensure_flusher()
+
+    def _evict(self):
+        """Drop least recently used clean entries (dirty ones wait for the next flush)."""
+        excess = len(self._cache) - self.cache_max_keys
+        if excess <= 0:
+            return
+        for k in list(self._cache):
+            if excess <= 0:
+                break
+            if not self._cache[k].dirty:
+                del self._cache[k]
+                excess -= 1
+
+    # ===== BaseStorage =====
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._touch(key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return self._entry(key).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Data must be a dict, got {type(data).__name__}")
+        entry = self._entry(key)
+        entry.data = pack_data(data) if data else b''
+        self._touch(key, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return unpack_data(self._entry(key).data)
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        self._read_conn.close()
+        self._write_conn.close()
+
+    # ===== WRITE-BEHIND =====
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            if not self._closed:
+                self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.time() - self._last_purge > PURGE_INTERVAL:
+                    await self.purge_expired()
+            except Exception as e:
+                print(f"FSM storage flush error (will retry): {e}")
+
+    async def flush(self):
+        """Write every dirty key to disk in one transaction."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            upserts, deletes = [], []
+            for k in self._dirty:
+                entry = self._cache.get(k)
+                if entry is None:
+                    continue
+                entry.dirty = False
+                if entry.state is None and not entry.data:
+                    deletes.append((k,))
+                else:
+                    upserts.append((k, entry.state, entry.data, entry.updated_at))
+            dirty, self._dirty = self._dirty, set()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, upserts, deletes)
+            except Exception:
+                # Keep the changes for the next attempt
+                for k in dirty:
+                    if k in self._cache:
+                        self._cache[k].dirty = True
+                self._dirty |= dirty
+                raise
+            self._evict()
+
+    def _write(self, upserts, deletes):
+        with self._write_lock:
+            conn = self._write_conn
+            conn.execute("BEGIN")
+            try:
+                if upserts:
+                    conn.executemany(
+                        "INSERT INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                        "updated_at = excluded.updated_at",
+                        upserts,
+                    )
+                if deletes:
+                    conn.executemany("DELETE FROM fsm WHERE key = ?", deletes)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def purge_expired(self) -> int:
+        """Delete rows idle for longer than the TTL. Returns rows removed."""
+        self._last_purge = time.time()
+        cutoff = self._last_purge - self.ttl
+        for k in [k for k, e in self._cache.items() if not e.dirty and e.updated_at < cutoff]:
+            del self._cache[k]
+
+        def _purge():
+            with self._write_lock:
+                return self._write_conn.execute("DELETE FROM fsm WHERE updated_at < ?", (cutoff,)).rowcount
+
+        removed = await asyncio.get_running_loop().run_in_executor(None, _purge)
+        if removed:
+            print(f"🧹 FSM storage: expired {removed} idle keys")
+        return removed
+
+    def keys_with_destiny(self, destiny: str) -> List[StorageKey]:
+        """
+        Keys of live entries stored under a non-default destiny, e.g. the
+        Smart Review batches left behind by a crash (see practice.py).
+        Only for the default key layout (fsm:bot:chat[:thread]:user:destiny).
+        """
+        builder = self.key_builder
+        if not isinstance(builder, DefaultKeyBuilder) or not builder.with_destiny or not builder.with_bot_id:
+            return []
+        suffix = builder.separator + destiny
+        rows = self._read_conn.execute(
+            "SELECT key FROM fsm WHERE key LIKE ? AND updated_at >= ?", (f"%{suffix}", time.time() - self.ttl)
+        ).fetchall()
+        found = {k for (k,) in rows if k not in self._cache} | {k for k, e in self._cache.items() if k.endswith(suffix) and e.data}
+
+        keys = []
+        for k in found:
+            parts = k.split(builder.separator)
+            if len(parts) not in (5, 6) or parts[0] != builder.prefix:
+                continue
+            try:
+                keys.append(StorageKey(
+                    bot_id=int(parts[1]), chat_id=int(parts[2]), user_id=int(parts[-2]),
+                    thread_id=int(parts[3]) if len(parts) == 6 else None, destiny=destiny,
+                ))
+            except ValueError:
+                continue
+        return keys
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            'cached_keys': len(self._cache),
+            'dirty_keys': len(self._dirty),
+            'cached_bytes': sum(len(e.data) for e in self._cache.values()),
+        }
+
+
+def create_storage() -> BaseStorage:
+    """FSM storage selected by FSM_STORAGE ('sqlite' or 'memory')."""
+    kind = os.getenv("FSM_STORAGE", "sqlite").lower()
+    if kind == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    if kind != "sqlite":
+        print(f"⚠️ Unknown FSM_STORAGE '{kind}', using sqlite")
+    print(f"💾 FSM storage: SQLite at {FSM_DB_PATH} (TTL {FSM_TTL_HOURS:g}h)")
+    return SQLiteStorage()
@@ -0,0 +1,154 @@
+"""
+Game Session Tokens
+
+The web game authenticates once and then carries a signed token instead
+of an X-User-Id header that every route had to trust (and look up):
+- POST /api/game/session validates Telegram WebApp `initData` (HMAC with
+  the bot token, auth_date freshness) and loads the user once
+- it issues a short-lived token: base64url(payload).base64url(HMAC-SHA256)
+  carrying user id, first name and level
+- game routes verify the token locally (no Firestore read); verified
+  tokens are cached until they expire
+- the client renews its token from the same initData shortly before
+  `expires_at` (and once on a 401), so long sessions keep their scores
+- the legacy X-User-Id header is still accepted while
+  GAME_ALLOW_USER_ID_HEADER=1 (default, for clients not yet updated);
+  routes that return a player's own content use signed_game_user and
+  treat such callers as anonymous
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from bot_services.firebase_service import get_user
+
+GAME_TOKEN_TTL = int(os.getenv("GAME_TOKEN_TTL", 3600))          # Seconds a session token is valid
+INIT_DATA_MAX_AGE = int(os.getenv("GAME_INIT_DATA_MAX_AGE", 86400))
+ALLOW_USER_ID_HEADER = os.getenv("GAME_ALLOW_USER_ID_HEADER", "1") == "1"
+TOKEN_CACHE_MAX = 10000
+
+_verified: "OrderedDict[str, Dict]" = OrderedDict()   # token -> claims
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _token_secret() -> bytes:
+    """GAME_TOKEN_SECRET, or a key derived from the bot token."""
+    secret = os.getenv("GAME_TOKEN_SECRET")
+    if secret:
+        return secret.encode('utf-8')
+    return hmac.new(b"GameSessionToken", os.getenv("BOT_TOKEN", "").encode('utf-8'), hashlib.sha256).digest()
+
+
+# ===== TELEGRAM initData =====
+def validate_init_data(init_data: str) -> Optional[Dict]:
+    """
+    Check Telegram WebApp initData (https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app).
+    Returns the `user` object, or None if the signature or age is invalid.
+    """
+    bot_token = os.getenv("BOT_TOKEN", "")
+    if not init_data or not bot_token:
+        return None
+    fields = dict(urllib.parse.parse_qsl(init_data, keep_blank_values=True))
+    received_hash = fields.pop('hash', '')
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", bot_token.encode('utf-8'), hashlib.sha256).digest()
+    expected = hmac.new(secret_key, data_check_string.encode('utf-8'), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received_hash):
+        return None
+    try:
+        if time.time() - int(fields.get('auth_date', 0)) > INIT_DATA_MAX_AGE:
+            return None
+        return json.loads(fields.get('user', ''))
+    except ValueError:
+        return None
+
+
+# ===== TOKENS =====
+def issue_token(user_id: int, name: str, level: int) -> Tuple[str, int]:
+    """Returns (token, expires_at)."""
+    expires_at = int(time.time()) + GAME_TOKEN_TTL
+    payload = _b64encode(json.dumps(
+        {'uid': int(user_id), 'name': name, 'lvl': level, 'exp': expires_at}, separators=(',', ':')
+    ).encode('utf-8'))
+    signature = _b64encode(hmac.new(_token_secret(), payload.encode('ascii'), hashlib.sha256).digest())
+    return f"{payload}.{signature}", expires_at
+
+
+def verify_token(token: str) -> Optional[Dict]:
+    """Claims {uid, name, lvl, exp} of a valid, unexpired token (cached), else None."""
+    claims = _verified.get(token)
+    if claims is None:
+        try:
+            payload, signature = token.split('.', 1)
+            expected = _b64encode(hmac.new(_token_secret(), payload.encode('ascii'), hashlib.sha256).digest())
+            if not hmac.compare_digest(expected, signature):
+                return None
+            claims = json.loads(_b64decode(payload))
+        except (ValueError, UnicodeError):
+            return None
+        _verified[token] = claims
+        if len(_verified) > TOKEN_CACHE_MAX:
+            _verified.popitem(last=False)
+    if claims['exp'] < time.time():
+        _verified.pop(token, None)
+        return None
+    return claims
+
+
+def game_user(headers) -> Optional[Dict]:
+    """
+    Identify the caller of a game route from its headers:
+    `Authorization: Bearer <token>` -> token claims, or (legacy) X-User-Id -> {'uid'} only.
+    """
+    auth = headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        return verify_token(auth[7:].strip())
+    if ALLOW_USER_ID_HEADER:
+        user_id = headers.get('X-User-Id', '')
+        if user_id.isdigit():
+            return {'uid': int(user_id), 'name': None, 'lvl': None}
+    return None
+
+
+def signed_game_user(headers) -> Optional[Dict]:
+    """Like game_user, but only a verified session token counts (for routes that expose user data)."""
+    auth = headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        return verify_token(auth[7:].strip())
+    return None
+
+
+async def create_session(init_data: str) -> Optional[Dict]:
+    """Validate initData, read the user once and issue a token. None if initData is invalid."""
+    tg_user = validate_init_data(init_data)
+    if not tg_user or 'id' not in tg_user:
+        return None
+    user = await get_user(tg_user['id']) or {}
+    name = user.get('first_name') or tg_user.get('first_name') or 'Player'
+    level = user.get('level', 1)
+    token, expires_at = issue_token(tg_user['id'], name, level)
+    return {
+        'token': token,
+        'expires_at': expires_at,
+        'user': {
+            'id': tg_user['id'],
+            'name': name,
+            'level': level,
+            'tx_coins': user.get('xp', 0),  # xp field = TX coins
+            'xp': user.get('total_xp', 0),
+        }
+    }
@@ -0,0 +1,215 @@
+"""
+Game Leaderboards
+
+Best-score leaderboards for the web game, kept up to date on every score
+submit instead of being rebuilt from `game_scores` per request:
+- one board per period (daily / weekly / all-time), each a top-K of best
+  scores per player held as a sorted list plus a dict for O(log K) updates
+- display names stored in the entries (no get_user per row)
+- boards roll over when the UTC day / ISO week changes
+- snapshot docs in `game_leaderboards/{period}`: loaded once (one read),
+  written behind every FLUSH_INTERVAL seconds when something changed
+- main.py and game/game_api.py both record scores: a flush merges with the
+  stored snapshot in a transaction (best score per player wins) instead of
+  overwriting it, and every REFRESH_INTERVAL seconds each process picks up
+  what the other one flushed
+- first run without snapshots is seeded from recent `game_scores`
+"""
+
+import asyncio
+import bisect
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from bot_services.firebase_service import get_game_scores_since, get_user_names, load_game_leaderboards, save_game_leaderboards
+
+PERIODS = ('daily', 'weekly', 'all')
+BOARD_SIZE = 200       # Players kept per board (requests show at most 50)
+FLUSH_INTERVAL = 10    # Seconds between snapshot writes
+REFRESH_INTERVAL = 60  # Seconds between re-reads of boards flushed by the other process
+SEED_SCORES = 2000     # Recent game_scores read to build boards the first time
+
+
+def period_key(period: str, when: Optional[datetime] = None) -> str:
+    when = when or datetime.now(timezone.utc)
+    if period == 'daily':
+        return when.strftime('%Y-%m-%d')
+    if period == 'weekly':
+        year, week, _ = when.isocalendar()
+        return f"{year}-W{week:02d}"
+    return 'all'
+
+
+class _Board:
+    """Top-K best scores. `order` holds (-score, user_id) sorted; `entries` the details."""
+
+    __slots__ = ('key', 'order', 'entries')
+
+    def __init__(self, key: str):
+        self.key = key
+        self.order: List[tuple] = []
+        self.entries: Dict[str, Dict] = {}
+
+    def qualifies(self, user_id: str, score: int) -> bool:
+        current = self.entries.get(user_id)
+        if current:
+            return score > current['score']
+        return len(self.order) < BOARD_SIZE or score > -self.order[-1][0]
+
+    def submit(self, entry: Dict) -> bool:
+        """Insert/raise a player's best score. Returns True if the board changed."""
+        user_id, score = entry['user_id'], entry['score']
+        if not self.qualifies(user_id, score):
+            return False
+        current = self.entries.get(user_id)
+        if current:
+            del self.order[bisect.bisect_left(self.order, (-current['score'], user_id))]
+        bisect.insort(self.order, (-score, user_id))
+        self.entries[user_id] = entry
+        while len(self.order) > BOARD_SIZE:
+            _, dropped = self.order.pop()
+            del self.entries[dropped]
+        return True
+
+    def top(self, limit: int) -> List[Dict]:
+        return [dict(self.entries[uid], rank=i + 1) for i, (_, uid) in enumerate(self.order[:limit])]
+
+    def to_snapshot(self) -> Dict:
+        return {'key': self.key, 'entries': [self.entries[uid] for _, uid in self.order]}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "_Board":
+        board = cls(snapshot.get('key', ''))
+        for entry in snapshot.get('entries', []):
+            board.submit(entry)
+        return board
+
+
+def merge_snapshots(stored: Optional[Dict], local: Dict) -> Dict:
+    """Union of two processes' snapshots of one board; a newer period key replaces an older one."""
+    if not stored or stored.get('key', '') < local['key']:
+        return local
+    if stored['key'] > local['key']:
+        return stored
+    board = _Board.from_snapshot(stored)
+    for entry in local['entries']:
+        board.submit(entry)
+    return board.to_snapshot()
+
+
+class GameLeaderboards:
+    def __init__(self):
+        self._boards: Dict[str, _Board] = {}
+        self._dirty = set()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            snapshots = await load_game_leaderboards(list(PERIODS))
+            for period in PERIODS:
+                self._boards[period] = _Board.from_snapshot(snapshots[period]) if period in snapshots \
+                    else _Board(period_key(period))
+            if not snapshots:
+                await self._seed()
+            self._loaded = True
+
+    async def _seed(self):
+        """Build boards from recent game_scores (first deploy only)."""
+        scores = await get_game_scores_since(datetime(2020, 1, 1, tzinfo=timezone.utc), SEED_SCORES)
+        names = await get_user_names(list({s.get('user_id') for s in scores if s.get('user_id')}))
+        for s in scores:
+            uid = s.get('user_id')
+            if not uid:
+                continue
+            entry = self._entry(uid, names.get(uid, 'Player'), s.get('score', 0), s.get('words', 0), s.get('level', 1))
+            for period in PERIODS:
+                if period_key(period, s.get('timestamp')) == self._boards[period].key:
+                    self._boards[period].submit(dict(entry))
+        self._dirty.update(PERIODS)
+        print(f"🎮 Game leaderboards seeded from {len(scores)} recent scores")
+
+    def _rollover(self):
+        for period in PERIODS:
+            key = period_key(period)
+            if self._boards[period].key != key:
+                self._boards[period] = _Board(key)
+                self._dirty.add(period)
+
+    @staticmethod
+    def _entry(user_id: str, name: str, score: int, words: int, level: int) -> Dict:
+        return {'user_id': user_id, 'name': name, 'score': score, 'words': words, 'level': level}
+
+    async def record(self, user_id, score: int, words: int, level: int, name: Optional[str] = None):
+        """Apply a submitted score to every period board (`name` from the session token, if known)."""
+        await self._ensure_loaded()
+        self._rollover()
+        uid, score = str(user_id), int(score or 0)
+        boards = [(p, b) for p, b in self._boards.items() if b.qualifies(uid, score)]
+        if not boards:
+            return
+
+        # Name from any board that already has the player, else one read
+        name = name or next((b.entries[uid]['name'] for b in self._boards.values() if uid in b.entries), None)
+        if name is None:
+            name = (await get_user_names([uid])).get(uid, 'Player')
+
+        for period, board in boards:
+            if board.submit(self._entry(uid, name, score, words, level)):
+                self._dirty.add(period)
+
+    async def top(self, period: str, limit: int) -> List[Dict]:
+        await self._ensure_loaded()
+        self._rollover()
+        board = self._boards.get(period) or self._boards['all']
+        return board.top(limit)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        try:
+            merged = await save_game_leaderboards({p: self._boards[p].to_snapshot() for p in dirty}, merge_snapshots)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        self._adopt(merged)
+
+    async def refresh(self):
+        """Pick up scores the other process (main.py / game_api.py) has flushed."""
+        if self._loaded:
+            self._adopt(await load_game_leaderboards(list(PERIODS)))
+
+    def _adopt(self, snapshots: Dict[str, Dict]):
+        """Replace boards with stored snapshots, keeping scores recorded here since (they flush next time)."""
+        for period, snapshot in snapshots.items():
+            local = self._boards.get(period)
+            if local is None or snapshot.get('key') != local.key:
+                continue  # Other period; _rollover / the next flush sorts it out
+            board = _Board.from_snapshot(snapshot)
+            if sum(board.submit(entry) for entry in list(local.entries.values())):
+                self._dirty.add(period)
+            self._boards[period] = board
+
+
+# Global instance used by the game API
+game_leaderboards = GameLeaderboards()
+
+
+async def game_leaderboard_flusher():
+    """Background loop started from main.py."""
+    last_refresh = time.monotonic()
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        try:
+            await game_leaderboards.flush()
+            if time.monotonic() - last_refresh >= REFRESH_INTERVAL:
+                last_refresh = time.monotonic()
+                await game_leaderboards.refresh()
+        except Exception as e:
+            print(f"Game leaderboard flush failed (will retry): {e}")
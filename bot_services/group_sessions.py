@@ -0,0 +1,237 @@
+"""
+Group Quiz Sessions
+
+State of group quizzes running in this process:
+- GroupSession: one quiz in one chat, with compact participant/score storage
+- poll_id -> chat_id index, so a poll answer finds its session in O(1)
+  instead of scanning every running group
+- periodic snapshots to Firestore (`group_sessions`) so interrupted quizzes
+  can resume after a deploy or crash (see group_play.resume_group_sessions)
+- per-question accuracy/answer-time and per-player answer counts, written
+  with the scores when the quiz ends (see GroupSession.result)
+"""
+
+import asyncio
+import hashlib
+import heapq
+import time
+from typing import Dict, List, Optional
+
+from bot_services.firebase_service import delete_group_session_snapshots, load_group_session_snapshots, save_group_session_snapshots
+
+SNAPSHOT_INTERVAL = 10      # Seconds between snapshot passes
+RESUME_MAX_AGE = 900        # Snapshots not updated for this long are discarded, not resumed
+
+
+class GroupSession:
+    """One group quiz. Participants are the keys of `scores`; names are kept separately."""
+
+    __slots__ = ('chat_id', 'quiz_id', 'quiz', 'host_id', 'timer', 'phase', 'current_q',
+                 'scores', 'names', 'answers', 'answered', 'empty_rounds', 'stopped', 'lobby_msg_id',
+                 'current_poll_id', 'current_correct', 'question_sent_at', 'question_stats', 'started_at')
+
+    def __init__(self, chat_id: int, quiz_id: str, quiz: Dict, host_id: int, timer: int):
+        self.chat_id = chat_id
+        self.quiz_id = quiz_id
+        self.quiz = quiz
+        self.host_id = host_id
+        self.timer = timer
+        self.phase = 'lobby'           # 'lobby' -> 'questions'
+        self.current_q = 0
+        self.scores: Dict[int, int] = {}
+        self.names: Dict[int, str] = {}
+        self.answers: Dict[int, int] = {}   # Questions answered per player
+        self.answered = set()          # Users who answered the current question
+        self.empty_rounds = 0
+        self.stopped = False
+        self.lobby_msg_id = None
+        self.current_poll_id = None
+        self.current_correct = -1
+        self.question_sent_at = 0.0
+        self.question_stats: Dict[int, List[int]] = {}   # q_idx -> [answers, correct, total answer ms]
+        self.started_at = time.time()
+
+    @property
+    def questions(self) -> List[Dict]:
+        return self.quiz.get('questions', [])
+
+    def join(self, user_id: int, name: str) -> bool:
+        """Add a participant. Returns False if they had already joined."""
+        if user_id in self.scores:
+            return False
+        self.scores[user_id] = 0
+        self.names[user_id] = name
+        return True
+
+    @property
+    def participant_count(self) -> int:
+        return len(self.scores)
+
+    def all_answered(self) -> bool:
+        return len(self.answered) >= len(self.scores)
+
+    def start_question(self, correct_index: int):
+        self.current_correct = correct_index
+        self.answered = set()
+        self.question_sent_at = time.time()
+
+    def record_answer(self, user_id: int, selected: int) -> bool:
+        """Count one answer to the current question. Returns False for repeats."""
+        if user_id in self.answered:
+            return False
+        self.answered.add(user_id)
+        correct = selected == self.current_correct
+        if correct:
+            self.scores[user_id] += 1
+        self.answers[user_id] = self.answers.get(user_id, 0) + 1
+        stats = self.question_stats.setdefault(self.current_q, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += correct
+        stats[2] += int((time.time() - self.question_sent_at) * 1000)
+        return True
+
+    def top_players(self, n: int) -> List[tuple]:
+        """(user_id, score) of the n best players - a heap, not a full sort."""
+        return heapq.nlargest(n, self.scores.items(), key=lambda item: item[1])
+
+    def result(self) -> Dict:
+        """Final outcome for save_group_quiz_result (players, per-question stats)."""
+        top = self.top_players(1)
+        return {
+            'chat_id': self.chat_id,
+            'quiz_id': self.quiz_id,
+            'quiz_title': self.quiz.get('title', ''),
+            'host_id': self.host_id,
+            'started_at': self.started_at,
+            'questions_asked': self.current_q,
+            'winner_id': top[0][0] if top and top[0][1] > 0 else None,
+            'players': [
+                {'user_id': uid, 'name': self.names.get(uid, f"User_{uid}"), 'score': score,
+                 'answered': self.answers.get(uid, 0)}
+                for uid, score in self.scores.items()
+            ],
+            'questions': [
+                {'index': q_idx, 'key': question_key(self.questions[q_idx]),
+                 'answers': answers, 'correct': correct, 'time_ms': time_ms}
+                for q_idx, (answers, correct, time_ms) in sorted(self.question_stats.items())
+                if q_idx < len(self.questions)
+            ],
+        }
+
+    # ===== SNAPSHOTS =====
+    def to_snapshot(self) -> Dict:
+        """Firestore-safe dict (string map keys). The quiz itself is reloaded by ID."""
+        return {
+            'chat_id': self.chat_id,
+            'quiz_id': self.quiz_id,
+            'host_id': self.host_id,
+            'timer': self.timer,
+            'phase': self.phase,
+            'current_q': self.current_q,
+            'scores': {str(uid): score for uid, score in self.scores.items()},
+            'names': {str(uid): name for uid, name in self.names.items()},
+            'answers': {str(uid): count for uid, count in self.answers.items()},
+            'question_stats': {str(q_idx): stats for q_idx, stats in self.question_stats.items()},
+            'empty_rounds': self.empty_rounds,
+            'started_at': self.started_at,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict, quiz: Dict) -> "GroupSession":
+        session = cls(snapshot['chat_id'], snapshot['quiz_id'], quiz, snapshot.get('host_id'), snapshot.get('timer', 30))
+        session.phase = snapshot.get('phase', 'lobby')
+        session.current_q = snapshot.get('current_q', 0)
+        session.scores = {int(uid): score for uid, score in snapshot.get('scores', {}).items()}
+        session.names = {int(uid): name for uid, name in snapshot.get('names', {}).items()}
+        session.answers = {int(uid): count for uid, count in snapshot.get('answers', {}).items()}
+        session.question_stats = {int(q): list(stats) for q, stats in snapshot.get('question_stats', {}).items()}
+        session.empty_rounds = snapshot.get('empty_rounds', 0)
+        session.started_at = snapshot.get('started_at', time.time())
+        return session
+
+
+def question_key(question: Dict) -> str:
+    """Stable key for a quiz question's stats (survives reordering/deleting other questions)."""
+    return hashlib.md5(question.get('text', '').encode('utf-8')).hexdigest()[:12]
+
+
+class GroupSessionRegistry:
+    def __init__(self):
+        self._sessions: Dict[int, GroupSession] = {}
+        self._by_poll: Dict[str, int] = {}
+        self._written: Dict[int, Dict] = {}   # Last snapshot written per chat
+        self._removed = set()                 # Chats whose snapshot must be deleted
+
+    def get(self, chat_id: int) -> Optional[GroupSession]:
+        return self._sessions.get(chat_id)
+
+    def __contains__(self, chat_id: int) -> bool:
+        return chat_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def add(self, session: GroupSession):
+        self._sessions[session.chat_id] = session
+        self._removed.discard(session.chat_id)
+
+    def remove(self, chat_id: int):
+        session = self._sessions.pop(chat_id, None)
+        if session and session.current_poll_id:
+            self._by_poll.pop(session.current_poll_id, None)
+        self._written.pop(chat_id, None)
+        self._removed.add(chat_id)
+
+    def set_poll(self, session: GroupSession, poll_id: Optional[str]):
+        """Point the index at the session's current poll (the old one stops counting)."""
+        if session.current_poll_id:
+            self._by_poll.pop(session.current_poll_id, None)
+        session.current_poll_id = poll_id
+        if poll_id:
+            self._by_poll[poll_id] = session.chat_id
+
+    def by_poll(self, poll_id: str) -> Optional[GroupSession]:
+        chat_id = self._by_poll.get(poll_id)
+        return self._sessions.get(chat_id) if chat_id is not None else None
+
+    async def snapshot(self):
+        """Persist sessions that changed since the last pass, drop finished ones."""
+        changed = {}
+        for chat_id, session in self._sessions.items():
+            snap = session.to_snapshot()
+            if self._written.get(chat_id) != snap:
+                changed[chat_id] = snap
+        removed = list(self._removed)
+        if not changed and not removed:
+            return
+        if changed:
+            now = time.time()
+            await save_group_session_snapshots({cid: dict(snap, saved_at=now) for cid, snap in changed.items()})
+            self._written.update(changed)
+        if removed:
+            await delete_group_session_snapshots(removed)
+            self._removed.difference_update(removed)
+
+    async def load_snapshots(self) -> List[Dict]:
+        """Snapshots recent enough to resume; stale ones are deleted."""
+        snapshots = await load_group_session_snapshots()
+        now = time.time()
+        fresh = [s for s in snapshots if now - s.get('saved_at', 0) < RESUME_MAX_AGE]
+        stale = [s['chat_id'] for s in snapshots if s not in fresh]
+        if stale:
+            await delete_group_session_snapshots(stale)
+        return fresh
+
+
+# Global registry used by group_play
+group_sessions = GroupSessionRegistry()
+
+
+async def group_session_snapshotter():
+    """Background loop started from main.py."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        try:
+            await group_sessions.snapshot()
+        except Exception as e:
+            print(f"Group session snapshot failed (will retry): {e}")
@@ -0,0 +1,125 @@
+"""
+Group Quiz Timers
+
+One scheduler task owns every group quiz deadline (lobby close, first
+question, question timeout, turbo advance) instead of a sleeping task
+per question per group:
+- a min-heap of deadlines served by a single loop that sleeps until the
+  earliest one (woken early when a sooner timer is added)
+- at most one live timer per chat: scheduling replaces the previous one,
+  cancel() drops it (/stop, quiz end); stale heap entries are skipped
+- due callbacks run as short-lived tasks so a slow Telegram call never
+  delays other groups' timers
+- get_stats() reports pending timers by kind, counters and firing lag
+"""
+
+import asyncio
+import heapq
+import itertools
+from collections import Counter, deque
+from typing import Awaitable, Callable, Dict, Optional
+
+from bot_services.utils import percentile
+
+LAG_WINDOW = 500   # Recent firings kept for lag percentiles
+
+
+class _Timer:
+    __slots__ = ('kind', 'deadline', 'seq', 'fn', 'args')
+
+    def __init__(self, kind: str, deadline: float, seq: int, fn: Callable[..., Awaitable], args: tuple):
+        self.kind = kind
+        self.deadline = deadline
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+
+
+class GroupTimers:
+    def __init__(self):
+        self._heap = []                        # (deadline, seq, chat_id)
+        self._timers: Dict[int, _Timer] = {}   # Live timer per chat
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self.counters = {'scheduled': 0, 'fired': 0, 'cancelled': 0, 'failed': 0}
+
+    def _start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def schedule(self, chat_id: int, kind: str, delay: float, fn: Callable[..., Awaitable], *args):
+        """Run `await fn(*args)` after `delay` seconds, replacing the chat's pending timer."""
+        self._start()
+        if self._timers.pop(chat_id, None):
+            self.counters['cancelled'] += 1
+        deadline = asyncio.get_running_loop().time() + delay
+        seq = next(self._seq)
+        self._timers[chat_id] = _Timer(kind, deadline, seq, fn, args)
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, seq, chat_id))
+        self.counters['scheduled'] += 1
+        if earliest is None or deadline < earliest:
+            self._wakeup.set()
+        self._compact()
+
+    def cancel(self, chat_id: int):
+        """Drop the chat's pending timer (its heap entry is skipped when reached)."""
+        if self._timers.pop(chat_id, None):
+            self.counters['cancelled'] += 1
+
+    def pending(self, chat_id: int) -> Optional[str]:
+        timer = self._timers.get(chat_id)
+        return timer.kind if timer else None
+
+    def _compact(self):
+        """Rebuild the heap when cancelled entries dominate it."""
+        if len(self._heap) > 2 * len(self._timers) + 64:
+            self._heap = [(t.deadline, t.seq, cid) for cid, t in self._timers.items()]
+            heapq.heapify(self._heap)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, seq, chat_id = heapq.heappop(self._heap)
+                timer = self._timers.get(chat_id)
+                if timer is None or timer.seq != seq:
+                    continue  # Cancelled or replaced
+                del self._timers[chat_id]
+                self._lags.append(now - deadline)
+                self.counters['fired'] += 1
+                loop.create_task(self._fire(chat_id, timer))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, chat_id: int, timer: _Timer):
+        try:
+            await timer.fn(*timer.args)
+        except Exception as e:
+            self.counters['failed'] += 1
+            print(f"❌ Group timer {timer.kind} failed in chat {chat_id}: {e}")
+
+    def get_stats(self) -> Dict:
+        lags = sorted(self._lags)
+        return {
+            **self.counters,
+            'pending': len(self._timers),
+            'heap_size': len(self._heap),
+            'by_kind': dict(Counter(t.kind for t in self._timers.values())),
+            'p50_lag_ms': round(percentile(lags, 50) * 1000, 1),
+            'p95_lag_ms': round(percentile(lags, 95) * 1000, 1),
+            'max_lag_ms': round(lags[-1] * 1000, 1) if lags else 0.0,
+        }
+
+
+# Global instance used by group_play
+group_timers = GroupTimers()
@@ -0,0 +1,136 @@
+"""
+Ingestion Worker
+
+Entry point of the parser processes started by ingestion.py:
+    python -m bot_services.ingest_worker
+
+- one JSON request per line on stdin: {"op": ..., "args": [...]}
+- one JSON reply per line on stdout: {"ok": true, "result": ...} or
+  {"ok": false, "error": "..."}
+- documents arrive as a temp file path, never as bytes on the pipe
+- the last OPEN_DOCS_MAX parsed PDFs stay open, so the 5-page tasks of
+  one upload parse the file once instead of once per task
+- imports nothing but the parsing libraries (no Firebase, no handlers),
+  so a fresh worker is ready quickly after a stuck one is killed
+- exits when stdin closes (the bot process went away)
+"""
+
+import io
+import json
+import sys
+from collections import OrderedDict
+from typing import Callable, List
+
+
+# Parsed PDFs of recent tasks: the pages of one upload arrive as several
+# tasks, and reopening the file for each would re-parse the whole document
+OPEN_DOCS_MAX = 2
+_open_docs: "OrderedDict[tuple, object]" = OrderedDict()  # (library, path) -> document
+
+
+def _open(library: str, path: str, opener: Callable):
+    key = (library, path)
+    doc = _open_docs.get(key)
+    if doc is None:
+        doc = opener(path)
+        _open_docs[key] = doc
+        while len(_open_docs) > OPEN_DOCS_MAX:
+            _, old = _open_docs.popitem(last=False)
+            if hasattr(old, 'close'):
+                old.close()
+    else:
+        _open_docs.move_to_end(key)
+    return doc
+
+
+def _fitz_open(path: str):
+    import fitz  # PyMuPDF
+    return fitz.open(path)
+
+
+def _pypdf_open(path: str):
+    from pypdf import PdfReader
+    return PdfReader(path)
+
+
+def _pdfplumber_open(path: str):
+    import pdfplumber
+    return pdfplumber.open(path)
+
+
+def pdf_page_count(path: str) -> int:
+    try:
+        return _open('fitz', path, _fitz_open).page_count
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"PyMuPDF error: {e}")
+
+    try:
+        return len(_open('pypdf', path, _pypdf_open).pages)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"pypdf error: {e}")
+
+    try:
+        return len(_open('pdfplumber', path, _pdfplumber_open).pages)
+    except Exception as e:
+        print(f"pdfplumber error: {e}")
+    return 0
+
+
+def pdf_page_range(path: str, start: int, end: int) -> List[str]:
+    """Text of pages [start, end), trying PyMuPDF, then pypdf, then pdfplumber."""
+    try:
+        doc = _open('fitz', path, _fitz_open)
+        return [doc[i].get_text() for i in range(start, min(end, doc.page_count))]
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"PyMuPDF error: {e}")
+
+    try:
+        reader = _open('pypdf', path, _pypdf_open)
+        return [page.extract_text() or "" for page in reader.pages[start:end]]
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"pypdf error: {e}")
+
+    try:
+        pdf = _open('pdfplumber', path, _pdfplumber_open)
+        return [page.extract_text() or "" for page in pdf.pages[start:end]]
+    except Exception as e:
+        print(f"pdfplumber error: {e}")
+    return []
+
+
+def docx_paragraphs(path: str, limit: int) -> List[str]:
+    from docx import Document
+    doc = Document(path)
+    return [p.text for p in doc.paragraphs[:limit]]
+
+
+OPS = {
+    'pdf_page_count': pdf_page_count,
+    'pdf_page_range': pdf_page_range,
+    'docx_paragraphs': docx_paragraphs,
+}
+
+
+def main():
+    replies = sys.stdout
+    sys.stdout = sys.stderr  # Parser warnings/prints must not corrupt the reply stream
+    for line in io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8'):
+        try:
+            request = json.loads(line)
+            reply = {'ok': True, 'result': OPS[request['op']](*request['args'])}
+        except Exception as e:
+            reply = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    main()
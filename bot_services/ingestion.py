@@ -0,0 +1,202 @@
+"""
+Document Ingestion Service
+
+Parses uploaded PDF/DOCX/CSV/TXT files without blocking the event loop:
+- Telegram downloads are streamed into memory
+- CPU-bound PDF/DOCX parsing runs in a few long-lived worker processes
+  (bot_services/ingest_worker.py), a few pages per task; the document is
+  handed over once as a temp file, not re-sent with every task, and its
+  tasks go back to the worker that already has it parsed
+- a task that overruns TASK_TIMEOUT kills only its own worker; other
+  users' tasks keep running and a replacement worker starts on demand
+- CSV/TXT only need decoding, which happens in a thread
+- Pages are yielded incrementally so callers can show progress
+- Size, page and time limits; abandoning the iterator stops further work
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+from typing import AsyncIterator, Dict, List, Optional
+
+# Limits
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024   # Telegram bots can't download more than 20 MB anyway
+MAX_PDF_PAGES = 100
+MAX_DOCX_PARAGRAPHS = 5000
+PAGES_PER_TASK = 5                    # Pages parsed per worker task
+TASK_TIMEOUT = 30                     # Seconds per worker task
+INGEST_TIMEOUT = 120                  # Seconds for a whole document
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+MAX_REPLY_BYTES = 64 * 1024 * 1024    # One worker reply (a batch of page texts)
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class IngestionError(Exception):
+    """Raised when a document is too large, unreadable or takes too long."""
+
+
+# ===== WORKER PROCESSES =====
+class _WorkerPool:
+    """Up to `size` parser processes, each running one task at a time."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: List[asyncio.subprocess.Process] = []
+        self._last_path: Dict[int, str] = {}   # pid -> document it last parsed (kept open there)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'bot_services.ingest_worker',
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            cwd=_REPO_ROOT, limit=MAX_REPLY_BYTES,
+        )
+
+    def _kill(self, proc: asyncio.subprocess.Process):
+        """Terminate a stuck/broken worker and reap it in the background."""
+        self._last_path.pop(proc.pid, None)
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+        asyncio.get_running_loop().create_task(proc.wait())
+
+    def _take_idle(self, path: str) -> Optional[asyncio.subprocess.Process]:
+        """An idle live worker, preferring the one that already has `path` open."""
+        for proc in [p for p in self._idle if p.returncode is not None]:
+            self._idle.remove(proc)
+            self._last_path.pop(proc.pid, None)
+        for i, proc in enumerate(self._idle):
+            if self._last_path.get(proc.pid) == path:
+                return self._idle.pop(i)
+        return self._idle.pop() if self._idle else None
+
+    async def run(self, op: str, path: str, *args, timeout: float = TASK_TIMEOUT):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            proc = self._take_idle(path) or await self._spawn()
+            self._last_path[proc.pid] = path
+            args = (path,) + args
+
+            try:
+                proc.stdin.write((json.dumps({'op': op, 'args': list(args)}) + "\n").encode('utf-8'))
+                await proc.stdin.drain()
+                line = await asyncio.wait_for(proc.stdout.readline(), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._kill(proc)
+                raise IngestionError("Parsing took too long")
+            except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                self._kill(proc)
+                raise IngestionError("Could not read the file")
+            except BaseException:
+                self._kill(proc)  # Cancelled mid-task: its reply would desync the next one
+                raise
+
+            if not line:
+                self._kill(proc)  # Crashed (e.g. a parser segfault)
+                raise IngestionError("Could not read the file")
+            self._idle.append(proc)
+
+        reply = json.loads(line)
+        if not reply['ok']:
+            print(f"Ingestion worker error ({op}): {reply['error']}")
+            raise IngestionError("Could not read the file")
+        return reply['result']
+
+
+_workers = _WorkerPool(INGEST_WORKERS)
+
+
+def _write_temp(data: bytes, suffix: str) -> str:
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        f.write(data)
+        return f.name
+
+
+def _decode_text(data: bytes) -> str:
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('cp1251', errors='replace')  # Common for Uzbek/Russian Excel exports
+
+
+# ===== ASYNC API =====
+async def download_document(bot, document, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Download a Telegram document straight into memory."""
+    if document.file_size and document.file_size > max_bytes:
+        raise IngestionError(f"File is too large (max {max_bytes // (1024 * 1024)} MB)")
+    file = await bot.get_file(document.file_id)
+    buffer = io.BytesIO()
+    await bot.download_file(file.file_path, destination=buffer)
+    data = buffer.getvalue()
+    if len(data) > max_bytes:
+        raise IngestionError(f"File is too large (max {max_bytes // (1024 * 1024)} MB)")
+    return data
+
+
+async def iter_document_pages(data: bytes, file_name: str, max_pages: int = MAX_PDF_PAGES) -> AsyncIterator[str]:
+    """
+    Yield a document's text page by page (DOCX/TXT/CSV are yielded in blocks).
+
+    PDF/DOCX parsing happens in the worker processes; at most one batch is in
+    flight per document, so closing the iterator early stops further work.
+    """
+    name = file_name.lower()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + INGEST_TIMEOUT
+
+    def remaining() -> float:
+        left = deadline - loop.time()
+        if left <= 0:
+            raise IngestionError("Parsing took too long")
+        return min(left, TASK_TIMEOUT)
+
+    if name.endswith(('.csv', '.txt')):
+        yield await loop.run_in_executor(None, _decode_text, data)
+        return
+
+    if not name.endswith(('.pdf', '.docx')):
+        raise IngestionError("Unsupported file type")
+
+    path = await loop.run_in_executor(None, _write_temp, data, os.path.splitext(name)[1])
+    try:
+        if name.endswith('.pdf'):
+            total = min(await _workers.run('pdf_page_count', path, timeout=remaining()), max_pages)
+            for start in range(0, total, PAGES_PER_TASK):
+                pages = await _workers.run(
+                    'pdf_page_range', path, start, min(start + PAGES_PER_TASK, total), timeout=remaining()
+                )
+                for page in pages:
+                    yield page
+        else:
+            paragraphs = await _workers.run('docx_paragraphs', path, MAX_DOCX_PARAGRAPHS, timeout=remaining())
+            for i in range(0, len(paragraphs), 100):
+                yield "\n".join(paragraphs[i:i + 100])
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+async def extract_document_text(data: bytes, file_name: str, max_pages: int = MAX_PDF_PAGES, on_page=None) -> str:
+    """
+    Collect the full text of a document.
+
+    Args:
+        on_page: Optional async callback(pages_done) for progress display
+    """
+    parts = []
+    async for page in iter_document_pages(data, file_name, max_pages):
+        parts.append(page)
+        if on_page:
+            try:
+                await on_page(len(parts))
+            except Exception:
+                pass  # Progress display is best-effort
+    return "\n".join(parts)
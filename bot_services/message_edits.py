@@ -0,0 +1,112 @@
+"""
+Coalesced Message Edits
+
+Lobby counters, import progress and broadcast status messages change far
+faster than Telegram lets a bot edit them. Edits go through one coalescer:
+- per message only the latest desired content is kept; intermediate
+  states that were never shown are simply replaced
+- a message is edited at most once per EDIT_INTERVAL (GROUP_EDIT_INTERVAL
+  in groups, where the flood limits are stricter)
+- RetryAfter pushes the next edit back by the time Telegram asks for and
+  keeps the content for that attempt; "message is not modified" is ignored
+- final() queues the closing content behind any pending edit and waits
+  for it, so a late progress update can never overwrite the result
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Tuple
+
+from aiogram import types
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+EDIT_INTERVAL = float(os.getenv("EDIT_INTERVAL", 1.0))              # Seconds between edits of one message
+GROUP_EDIT_INTERVAL = float(os.getenv("GROUP_EDIT_INTERVAL", 3.0))  # Groups: ~20 messages/minute
+
+_Key = Tuple[int, int]
+
+
+class _Edit:
+    __slots__ = ('bot', 'text', 'kwargs')
+
+    def __init__(self, bot, text: str, kwargs: Dict):
+        self.bot = bot
+        self.text = text
+        self.kwargs = kwargs
+
+
+class EditCoalescer:
+    def __init__(self):
+        self._pending: Dict[_Key, _Edit] = {}
+        self._next_at: Dict[_Key, float] = {}   # Earliest monotonic time of the next edit
+        self._tasks: Dict[_Key, asyncio.Task] = {}
+        self.counters = {'requested': 0, 'applied': 0, 'coalesced': 0, 'retry_after': 0, 'failed': 0}
+
+    @staticmethod
+    def _interval(chat_id: int) -> float:
+        return GROUP_EDIT_INTERVAL if chat_id < 0 else EDIT_INTERVAL
+
+    def update(self, message: types.Message, text: str, **kwargs):
+        """Show `text` on `message` soon; replaces any edit still waiting for its turn."""
+        key = (message.chat.id, message.message_id)
+        self.counters['requested'] += 1
+        if key in self._pending:
+            self.counters['coalesced'] += 1
+        self._pending[key] = _Edit(message.bot, text, kwargs)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.get_running_loop().create_task(self._drain(key))
+        self._prune()
+
+    async def final(self, message: types.Message, text: str, **kwargs):
+        """Closing edit (result/error): applied after pending edits, waits until sent."""
+        self.update(message, text, **kwargs)
+        task = self._tasks.get((message.chat.id, message.message_id))
+        if task:
+            await asyncio.shield(task)
+
+    async def _drain(self, key: _Key):
+        try:
+            while key in self._pending:
+                wait = self._next_at.get(key, 0.0) - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                edit = self._pending.pop(key, None)
+                if edit is None:
+                    break
+                await self._apply(key, edit)
+        finally:
+            self._tasks.pop(key, None)
+
+    async def _apply(self, key: _Key, edit: _Edit):
+        chat_id, message_id = key
+        self._next_at[key] = time.monotonic() + self._interval(chat_id)
+        try:
+            await edit.bot.edit_message_text(text=edit.text, chat_id=chat_id, message_id=message_id, **edit.kwargs)
+            self.counters['applied'] += 1
+        except TelegramRetryAfter as e:
+            self.counters['retry_after'] += 1
+            self._next_at[key] = time.monotonic() + e.retry_after
+            self._pending.setdefault(key, edit)  # Unless newer content arrived meanwhile
+        except TelegramBadRequest as e:
+            if "not modified" not in str(e):
+                self.counters['failed'] += 1
+                print(f"Message edit failed in chat {chat_id}: {e}")
+        except Exception as e:
+            self.counters['failed'] += 1
+            print(f"Message edit failed in chat {chat_id}: {e}")
+
+    def _prune(self):
+        """Forget rate-limit marks that have expired (keeps the dict bounded)."""
+        if len(self._next_at) < 1000:
+            return
+        now = time.monotonic()
+        for key in [k for k, t in self._next_at.items() if t < now and k not in self._pending]:
+            del self._next_at[key]
+
+    def get_stats(self) -> Dict:
+        return {**self.counters, 'pending': len(self._pending)}
+
+
+# Global instance used by handlers
+message_edits = EditCoalescer()
@@ -0,0 +1,146 @@
+"""
+Quiz Generation Cache
+
+Content-addressed cache for AI topic quizzes:
+- Keyed by normalized topic + question count + prompt version
+- Several variants stored per key, served back reshuffled
+- Admin listing and invalidation
+"""
+
+import hashlib
+import random
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from firebase_admin import firestore
+
+from bot_services.firebase_service import db, run_sync, TASHKENT_TZ
+
+# Bump when the topic prompt changes so old generations stop being served
+QUIZ_PROMPT_VERSION = 1
+
+# Variants kept per key. While fewer exist, a request is served from cache with
+# probability variants / MAX_VARIANTS, so popular topics fill up and then stop costing calls.
+MAX_VARIANTS = 3
+
+# Don't cache thin generations (e.g. a stream cut off after 2 questions)
+MIN_CACHEABLE_RATIO = 0.7
+
+COLLECTION = 'quiz_gen_cache'
+
+
+def normalize_topic(topic: str) -> str:
+    """'  Present  Perfect!! ' -> 'present perfect'"""
+    return re.sub(r'[^\w]+', ' ', topic.lower()).strip()
+
+
+def quiz_cache_key(topic: str, num_questions: int) -> str:
+    raw = f"{normalize_topic(topic)}|{num_questions}|v{QUIZ_PROMPT_VERSION}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _get_cached_quiz_sync(topic: str, num_questions: int) -> Optional[List[Dict]]:
+    """
+    Pick a cached variant for the topic, or None if a fresh generation should run.
+
+    Returns:
+        Questions in shuffled order (options are shuffled at poll time)
+    """
+    ref = db.collection(COLLECTION).document(quiz_cache_key(topic, num_questions))
+    doc = ref.get()
+    if not doc.exists:
+        return None
+
+    variants = doc.to_dict().get('variants', [])
+    if not variants or random.random() >= len(variants) / MAX_VARIANTS:
+        return None
+
+    questions = list(random.choice(variants).get('questions', []))
+    random.shuffle(questions)
+    ref.update({'hits': firestore.Increment(1), 'last_hit': datetime.now(TASHKENT_TZ)})
+    return questions
+
+async def get_cached_quiz(topic: str, num_questions: int) -> Optional[List[Dict]]:
+    """Get a cached quiz variant (async)."""
+    return await run_sync(_get_cached_quiz_sync, topic, num_questions)
+
+
+def _save_quiz_variant_sync(topic: str, num_questions: int, questions: List[Dict]) -> None:
+    """Store a fresh generation as a new variant (oldest dropped past MAX_VARIANTS)."""
+    if len(questions) < num_questions * MIN_CACHEABLE_RATIO:
+        return
+
+    ref = db.collection(COLLECTION).document(quiz_cache_key(topic, num_questions))
+
+    @firestore.transactional
+    def _append(transaction):
+        doc = ref.get(transaction=transaction)
+        data = doc.to_dict() if doc.exists else {}
+        variants = data.get('variants', [])
+        variants.append({'questions': questions, 'created_at': datetime.now(TASHKENT_TZ)})
+        transaction.set(ref, {
+            'topic': normalize_topic(topic),
+            'num_questions': num_questions,
+            'prompt_version': QUIZ_PROMPT_VERSION,
+            'variants': variants[-MAX_VARIANTS:],
+            'hits': data.get('hits', 0),
+            'generations': data.get('generations', 0) + 1,
+            'created_at': data.get('created_at', datetime.now(TASHKENT_TZ)),
+        })
+
+    _append(db.transaction())
+
+async def save_quiz_variant(topic: str, num_questions: int, questions: List[Dict]) -> None:
+    """Save a generated quiz to the cache (async)."""
+    await run_sync(_save_quiz_variant_sync, topic, num_questions, questions)
+
+
+# ===== ADMIN =====
+
+def _list_cached_quizzes_sync(limit: int = 20) -> List[Dict]:
+    """Most-served cache entries first."""
+    docs = db.collection(COLLECTION).order_by('hits', direction=firestore.Query.DESCENDING).limit(limit).stream()
+    entries = []
+    for doc in docs:
+        data = doc.to_dict()
+        entries.append({
+            'key': doc.id,
+            'topic': data.get('topic', '?'),
+            'num_questions': data.get('num_questions', 0),
+            'prompt_version': data.get('prompt_version', 0),
+            'variants': len(data.get('variants', [])),
+            'hits': data.get('hits', 0),
+            'generations': data.get('generations', 0),
+        })
+    return entries
+
+async def list_cached_quizzes(limit: int = 20) -> List[Dict]:
+    """List cache entries for the admin panel (async)."""
+    return await run_sync(_list_cached_quizzes_sync, limit)
+
+
+def _invalidate_cached_quiz_sync(key: str) -> None:
+    db.collection(COLLECTION).document(key).delete()
+
+async def invalidate_cached_quiz(key: str) -> None:
+    """Delete one cache entry (async)."""
+    await run_sync(_invalidate_cached_quiz_sync, key)
+
+
+def _clear_quiz_cache_sync() -> int:
+    """Delete every cache entry. Returns number deleted."""
+    deleted = 0
+    batch = db.batch()
+    for doc in db.collection(COLLECTION).stream():
+        batch.delete(doc.reference)
+        deleted += 1
+        if deleted % 400 == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    return deleted
+
+async def clear_quiz_cache() -> int:
+    """Delete the whole quiz cache (async)."""
+    return await run_sync(_clear_quiz_cache_sync)
@@ -0,0 +1,183 @@
+"""
+Set Cache
+
+Shared, read-mostly snapshots of set cards for practice and quiz sessions:
+- one Firestore read per set per TTL, concurrent loads deduplicated
+- a content version per snapshot so sessions can tell when cards changed
+- lazily built distractor indexes (see distractor_index.py)
+- compact session views: sessions keep a version plus packed card positions
+  (see CardView) instead of copying card dicts into FSM state
+"""
+
+import asyncio
+import hashlib
+import random
+import struct
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Dict, Iterable, List, Optional
+
+from bot_services.distractor_index import DistractorIndex
+from bot_services.firebase_service import get_set_cards, run_sync
+
+SET_CACHE_TTL = 300      # Seconds before a snapshot is re-read
+SET_CACHE_MAX_SETS = 500  # LRU bound
+SET_CACHE_MAX_RETIRED = 200  # Superseded versions kept for sessions started before an edit
+
+# Session card orders are packed uint32 positions into SetSnapshot.cards
+_POSITION = struct.Struct('<I')
+
+
+def pack_positions(positions: Iterable[int]) -> bytes:
+    positions = list(positions)
+    return struct.pack(f'<{len(positions)}I', *positions)
+
+
+def append_position(packed: Optional[bytes], position: int) -> bytes:
+    return (packed or b'') + _POSITION.pack(position)
+
+
+class CardView(Sequence):
+    """A snapshot's cards in a session's order, without copying them."""
+
+    __slots__ = ('cards', 'packed')
+
+    def __init__(self, cards: List[Dict], packed: Optional[bytes]):
+        self.cards = cards
+        self.packed = packed or b''
+
+    def __len__(self) -> int:
+        return len(self.packed) // _POSITION.size
+
+    def position(self, i: int) -> int:
+        """Index into SetSnapshot.cards of the i-th card in this order."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return _POSITION.unpack_from(self.packed, i * _POSITION.size)[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.cards[self.position(i)]
+
+
+class SetSnapshot:
+    """Immutable view of a set's cards at one version."""
+
+    def __init__(self, set_id: str, cards: List[Dict]):
+        self.set_id = set_id
+        self.cards = cards
+        self.positions = {c.get('card_id'): i for i, c in enumerate(cards)}
+        self.version = _content_version(cards)
+        self.loaded_at = time.monotonic()
+        self._distractors = {}  # {reverse: DistractorIndex}
+
+    def position(self, card: Dict) -> Optional[int]:
+        return self.positions.get(card.get('card_id'))
+
+    def shuffled_order(self, limit: Optional[int] = None) -> bytes:
+        """Packed positions of all cards in random order, optionally truncated."""
+        order = random.sample(range(len(self.cards)), len(self.cards))
+        return pack_positions(order[:limit] if limit else order)
+
+    def view(self, packed: Optional[bytes]) -> CardView:
+        return CardView(self.cards, packed)
+
+    def answer_text(self, card: Dict, reverse: bool) -> str:
+        return card.get('term', '') if reverse else card.get('definition', '???')
+
+    async def distractors(self, reverse: bool = False) -> DistractorIndex:
+        """Distractor index for this version (built once, off the event loop)."""
+        index = self._distractors.get(reverse)
+        if index is None:
+            texts = [self.answer_text(c, reverse) for c in self.cards]
+            index = await run_sync(DistractorIndex, texts, int(self.version[:8], 16))
+            self._distractors[reverse] = index
+        return index
+
+
+def _content_version(cards: List[Dict]) -> str:
+    h = hashlib.sha1()
+    for c in sorted(cards, key=lambda c: str(c.get('card_id'))):
+        h.update(f"{c.get('card_id')}\x1f{c.get('term', '')}\x1f{c.get('definition', '')}\x1e".encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+_snapshots: "OrderedDict[str, SetSnapshot]" = OrderedDict()
+_retired: "OrderedDict[tuple, SetSnapshot]" = OrderedDict()  # {(set_id, version): snapshot}
+_loading: Dict[str, asyncio.Future] = {}
+
+
+def _retire(snapshot: SetSnapshot):
+    key = (snapshot.set_id, snapshot.version)
+    _retired[key] = snapshot
+    _retired.move_to_end(key)
+    while len(_retired) > SET_CACHE_MAX_RETIRED:
+        _retired.popitem(last=False)
+
+
+async def get_set_snapshot(set_id: str, version: Optional[str] = None) -> Optional[SetSnapshot]:
+    """
+    Cached snapshot of a set's cards, or None if the set has no cards.
+    With `version`, returns that exact version (a session's view of the set)
+    or None if it is no longer available.
+    """
+    if version:
+        retired = _retired.get((set_id, version))
+        if retired:
+            _retired.move_to_end((set_id, version))
+            return retired
+    snapshot = await _current_snapshot(set_id)
+    if version and (not snapshot or snapshot.version != version):
+        return None
+    return snapshot
+
+
+async def _current_snapshot(set_id: str) -> Optional[SetSnapshot]:
+    snapshot = _snapshots.get(set_id)
+    if snapshot and time.monotonic() - snapshot.loaded_at < SET_CACHE_TTL:
+        _snapshots.move_to_end(set_id)
+        return snapshot
+
+    # Deduplicate concurrent loads of the same set
+    if set_id in _loading:
+        return await asyncio.shield(_loading[set_id])
+
+    future = asyncio.get_running_loop().create_future()
+    _loading[set_id] = future
+    try:
+        cards = await get_set_cards(set_id)
+        previous = _snapshots.pop(set_id, None)
+        snapshot = SetSnapshot(set_id, cards) if cards else None
+        if previous and (not snapshot or previous.version != snapshot.version):
+            _retire(previous)
+        if snapshot:
+            _retired.pop((set_id, snapshot.version), None)  # Unchanged after all
+            _snapshots[set_id] = snapshot
+            while len(_snapshots) > SET_CACHE_MAX_SETS:
+                _snapshots.popitem(last=False)
+        future.set_result(snapshot)
+        return snapshot
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _loading.pop(set_id, None)
+        if future.done() and not future.cancelled():
+            future.exception()  # Mark retrieved so waiter-less failures aren't logged
+
+
+def invalidate_set(set_id: str):
+    """Drop a set's snapshot after its cards changed (running sessions keep their version)."""
+    snapshot = _snapshots.pop(set_id, None)
+    if snapshot:
+        _retire(snapshot)
+
+
+def invalidate_card(card_id: str):
+    """Drop any snapshot containing this card (callers that only know the card ID)."""
+    for set_id in [sid for sid, snap in _snapshots.items() if card_id in snap.positions]:
+        invalidate_set(set_id)
@@ -0,0 +1,238 @@
+"""
+Static Assets (hexagame WebApp)
+
+Build step + in-memory serving for the game's HTML/JS/CSS:
+- build: JS/CSS get content-hashed names (game.<sha>.js), index.html is
+  rewritten to reference them, and every file is stored raw, gzip and
+  brotli (`brotli` is in requirements.txt; without it builds are gzip only
+  and startup logs "no brotli")
+- output goes to hexagame/dist/ with a manifest.json; when dist/ is
+  missing or older than the sources, the same build runs in memory at
+  startup
+- serving: bodies come from memory, the best encoding the client accepts
+  is picked (Accept-Encoding q-values honoured, q=0 refuses a coding), ETag + If-None-Match give 304s; hashed files are cached as
+  immutable for a year, index.html and unhashed paths revalidate
+
+Build from the repo root (defaults to game/hexagame):
+    python -m bot_services.static_assets
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+from typing import Dict, Optional
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HEXAGAME_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'game', 'hexagame')
+DIST_DIR = 'dist'
+HASHED_EXTENSIONS = ('.js', '.css')
+COMPRESS_MIN_BYTES = 256
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODING_SUFFIX = {'gzip': '.gz', 'br': '.br'}
+
+
+class Asset:
+    __slots__ = ('content_type', 'etag', 'cache_control', 'bodies')
+
+    def __init__(self, content_type: str, etag: str, cache_control: str, bodies: Dict[str, bytes]):
+        self.content_type = content_type
+        self.etag = etag
+        self.cache_control = cache_control
+        self.bodies = bodies    # encoding ('identity' / 'gzip' / 'br') -> bytes
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _content_type(path: str) -> str:
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+
+def _encode(data: bytes) -> Dict[str, bytes]:
+    bodies = {'identity': data}
+    if len(data) >= COMPRESS_MIN_BYTES:
+        bodies['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            bodies['br'] = brotli.compress(data, quality=11)
+    return bodies
+
+
+def _source_files(src_dir: str):
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = [d for d in dirs if d != DIST_DIR and not d.startswith('.')]
+        for name in files:
+            full = os.path.join(root, name)
+            yield os.path.relpath(full, src_dir).replace(os.sep, '/'), full
+
+
+# ===== BUILD =====
+def build_assets(src_dir: str) -> Dict[str, Asset]:
+    """Fingerprint, rewrite and compress every file under src_dir. Keys are URL paths."""
+    sources = {rel: open(full, 'rb').read() for rel, full in _source_files(src_dir)}
+    assets: Dict[str, Asset] = {}
+    hashed_names = {}
+
+    for rel, data in sources.items():
+        if rel.endswith(HASHED_EXTENSIONS):
+            digest = _digest(data)
+            root, ext = os.path.splitext(rel)
+            hashed_names[rel] = f"{root}.{digest}{ext}"
+            bodies = _encode(data)
+            assets[hashed_names[rel]] = Asset(_content_type(rel), digest, IMMUTABLE, bodies)
+            # Unhashed path keeps working (old cached HTML, direct links) but must revalidate
+            assets[rel] = Asset(_content_type(rel), digest, REVALIDATE, bodies)
+
+    for rel, data in sources.items():
+        if rel in assets:
+            continue
+        if rel.endswith('.html'):
+            html = data.decode('utf-8')
+            for original, hashed in hashed_names.items():
+                html = html.replace(f'"{original}"', f'"{hashed}"')
+            data = html.encode('utf-8')
+        assets[rel] = Asset(_content_type(rel), _digest(data), REVALIDATE, _encode(data))
+    return assets
+
+
+def write_dist(assets: Dict[str, Asset], out_dir: str):
+    """Write every encoding to disk plus manifest.json (for deploys and CDNs)."""
+    manifest = {}
+    for path, asset in assets.items():
+        target = os.path.join(out_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        for encoding, body in asset.bodies.items():
+            with open(target + ENCODING_SUFFIX.get(encoding, ''), 'wb') as f:
+                f.write(body)
+        manifest[path] = {
+            'content_type': asset.content_type,
+            'etag': asset.etag,
+            'cache_control': asset.cache_control,
+            'encodings': sorted(asset.bodies),
+        }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def load_dist(out_dir: str) -> Dict[str, Asset]:
+    with open(os.path.join(out_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    assets = {}
+    for path, meta in manifest.items():
+        target = os.path.join(out_dir, path)
+        bodies = {}
+        for encoding in meta['encodings']:
+            with open(target + ENCODING_SUFFIX.get(encoding, ''), 'rb') as f:
+                bodies[encoding] = f.read()
+        assets[path] = Asset(meta['content_type'], meta['etag'], meta['cache_control'], bodies)
+    return assets
+
+
+def _dist_is_fresh(src_dir: str) -> bool:
+    manifest = os.path.join(src_dir, DIST_DIR, 'manifest.json')
+    if not os.path.isfile(manifest):
+        return False
+    built_at = os.path.getmtime(manifest)
+    return all(os.path.getmtime(full) <= built_at for _, full in _source_files(src_dir))
+
+
+# ===== SERVING =====
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q} (q=0 entries kept: they refuse that coding)."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def pick_encoding(header: str, available) -> str:
+    """Best coding in `available` the client accepts (br wins ties), else 'identity'."""
+    accepted = accepted_encodings(header)
+    best, best_q = 'identity', 0.0
+    for coding in ('br', 'gzip'):
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if coding in available and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class StaticAssets:
+    def __init__(self, src_dir: str):
+        self.src_dir = src_dir
+        self._assets: Optional[Dict[str, Asset]] = None
+
+    @property
+    def assets(self) -> Dict[str, Asset]:
+        if self._assets is None:
+            if _dist_is_fresh(self.src_dir):
+                self._assets = load_dist(os.path.join(self.src_dir, DIST_DIR))
+                source = "dist"
+            else:
+                self._assets = build_assets(self.src_dir)
+                source = "in-memory build"
+            size = sum(len(a.bodies['identity']) for a in self._assets.values())
+            print(f"🗂️ Static assets: {len(self._assets)} files, {size / 1024:.0f} KB ({source}"
+                  f"{'' if brotli else ', no brotli'})")
+        return self._assets
+
+    def response(self, request: web.Request, path: str) -> Optional[web.Response]:
+        """Response for `path` (None if unknown): best encoding, ETag, 304 on a match."""
+        asset = self.assets.get(path)
+        if asset is None:
+            return None
+
+        encoding = pick_encoding(request.headers.get('Accept-Encoding', ''), asset.bodies)
+
+        etag = f'"{asset.etag}"' if encoding == 'identity' else f'"{asset.etag}-{encoding}"'
+        headers = {'ETag': etag, 'Cache-Control': asset.cache_control, 'Vary': 'Accept-Encoding'}
+
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match:
+            tags = {t.strip().removeprefix('W/') for t in if_none_match.split(',')}
+            if etag in tags or '*' in tags:
+                return web.Response(status=304, headers=headers)
+
+        headers['Content-Type'] = asset.content_type
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return web.Response(body=asset.bodies[encoding], headers=headers)
+
+
+# Global instance used by main.py and game/game_api.py
+hexagame_assets = StaticAssets(HEXAGAME_DIR)
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else HEXAGAME_DIR
+    out = os.path.join(src, DIST_DIR)
+    built = build_assets(src)
+    write_dist(built, out)
+    for path, asset in sorted(built.items()):
+        sizes = " / ".join(f"{enc} {len(body)}" for enc, body in sorted(asset.bodies.items()))
+        print(f"• {path:<32} {sizes}")
+    print(f"\n💾 {len(built)} assets written to {out}{'' if brotli else ' (brotli not installed: gzip only)'}")
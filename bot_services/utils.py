@@ -127,6 +127,20 @@ def get_home_kb(texts=None):
     t = texts['btn_home'] if texts else "🏠 Home"
     return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=t, callback_data="cancel")]])
 
+def percentile(sorted_values, pct) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty), for metrics."""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def escape_md(text) -> str:
+    """Escape user/DB text for parse_mode="Markdown" (legacy Markdown entities)."""
+    text = str(text or "")
+    for char in ['*', '_', '`', '[']:
+        text = text.replace(char, f"\\{char}")
+    return text
+
 # --- Text Similarity for MCQ ---
 def text_similarity(text1: str, text2: str) -> float:
     """
@@ -7,7 +7,7 @@ Handles all Firestore operations for vocabulary caching:
 - Upgrading dict entries to AI quality
 """
 
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from bot_services.firebase_service import db, run_sync, TASHKENT_TZ
 from datetime import datetime
 
@@ -35,6 +35,25 @@ async def get_from_cache(word: str) -> Optional[Dict]:
     """Get vocabulary from cache (async)."""
     return await run_sync(_get_from_cache_sync, word)
 
+def _get_many_from_cache_sync(words: List[str]) -> Dict[str, Dict]:
+    """
+    Batch cache lookup with a single get_all round trip.
+    
+    Returns:
+        {word_key: cached data} for the words that are cached
+    """
+    keys = {w.lower().strip() for w in words}
+    keys = [k for k in keys if k and '/' not in k]  # '/' isn't valid in a document ID
+    if not keys:
+        return {}
+    
+    refs = [db.collection('vocabulary_cache').document(k) for k in keys]
+    return {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+
+async def get_many_from_cache(words: List[str]) -> Dict[str, Dict]:
+    """Get several vocabulary entries from cache (async)."""
+    return await run_sync(_get_many_from_cache_sync, words)
+
 def _save_to_cache_sync(word: str, vocab_data: Dict, source_type: str) -> None:
     """
     Save vocabulary data to cache.
@@ -77,7 +77,7 @@ async def lookup_word_smart(word: str, user_id: int) -> Optional[Dict]:
             
             if allowed:
                 # User has quota, try AI upgrade
-                ai_result = await generate_vocabulary_ai(word)
+                ai_result = await generate_vocabulary_ai(word, user_id=user_id)
                 
                 if ai_result:
                     # Upgrade successful!
@@ -111,7 +111,7 @@ async def lookup_word_smart(word: str, user_id: int) -> Optional[Dict]:
     
     # STEP 3: Try AI if quota available
     if allowed:
-        ai_result = await generate_vocabulary_ai(word)
+        ai_result = await generate_vocabulary_ai(word, user_id=user_id)
         
         if ai_result:
             # AI success! Cache and return
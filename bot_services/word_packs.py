@@ -0,0 +1,212 @@
+"""
+Word Packs (Word Scramble)
+
+Server-built word lists for the web game instead of lists hardcoded in game.js:
+- a pack holds easy / moderate / hard words (by length) taken from the
+  player's own sets, topped up from the global lexicon (game/words.json)
+- each pack carries a sorted-letter anagram index, so checking an answer
+  ("tops" for STOP) and listing every findable word is a dict lookup
+- packs are keyed by the lexicon version plus the content version of each
+  set (see set_cache.py): the same sets give the same pack, built once;
+  editing a set changes its version and so the pack
+- the JSON payload is encoded (and gzipped) once per pack and served with
+  an ETag, so unchanged packs are answered with a 304
+- callers without a signed session token (including legacy X-User-Id
+  callers) get the lexicon-only pack, so set contents never leak by user id
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from bot_services.firebase_service import get_user_sets, run_sync
+from bot_services.set_cache import SET_CACHE_TTL, get_set_snapshot
+from bot_services.static_assets import pick_encoding
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'game', 'words.json')
+DIFFICULTIES = ('easy', 'moderate', 'hard')
+MIN_WORD_LENGTH = 3
+MAX_WORD_LENGTH = 12
+PACK_MIN_WORDS = 60      # Per difficulty; lexicon words fill up to this
+PACK_MAX_WORDS = 300     # Per difficulty
+MAX_PACK_SETS = 30       # Sets of one user read into a pack
+WORD_PACK_CACHE_MAX = 1000
+USER_SETS_CACHE_MAX = 5000
+
+
+def difficulty_of(word: str) -> str:
+    if len(word) <= 4:
+        return 'easy'
+    if len(word) <= 6:
+        return 'moderate'
+    return 'hard'
+
+
+def anagram_key(word: str) -> str:
+    return ''.join(sorted(word))
+
+
+def normalize_term(term) -> Optional[str]:
+    """A card term usable as a scramble word (one alphabetic word, 3-12 letters), else None."""
+    word = str(term or '').strip().lower()
+    if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH and word.isalpha():
+        return word
+    return None
+
+
+class WordPack:
+    """Immutable word lists + anagram index at one version, with its encoded payload."""
+
+    __slots__ = ('version', 'words', 'personal', 'anagrams', 'body', 'body_gzip')
+
+    def __init__(self, version: str, personal: List[str], lexicon: Dict[str, List[str]]):
+        self.version = version
+        self.personal = personal
+        rng = random.Random(version)
+
+        self.words: Dict[str, List[str]] = {}
+        for difficulty in DIFFICULTIES:
+            own = [w for w in personal if difficulty_of(w) == difficulty]
+            if len(own) > PACK_MAX_WORDS:
+                own = rng.sample(own, PACK_MAX_WORDS)
+            taken = set(own)
+            fill = [w for w in lexicon.get(difficulty, []) if w not in taken]
+            self.words[difficulty] = own + rng.sample(fill, min(len(fill), max(0, PACK_MIN_WORDS - len(own))))
+
+        # Every known word (pack + lexicon) under its sorted letters
+        index: Dict[str, set] = {}
+        for word in set(personal).union(*lexicon.values()):
+            index.setdefault(anagram_key(word), set()).add(word)
+        self.anagrams = {key: sorted(group) for key, group in index.items()}
+
+        # Client only needs the groups where a pack word has other solutions
+        alternates = {}
+        for words in self.words.values():
+            for word in words:
+                group = self.anagrams[anagram_key(word)]
+                if len(group) > 1:
+                    alternates[anagram_key(word)] = group
+        self.body = json.dumps({
+            'success': True,
+            'version': version,
+            'personal': len(personal),
+            'words': self.words,
+            'anagrams': alternates,
+        }, separators=(',', ':')).encode('utf-8')
+        self.body_gzip = gzip.compress(self.body, mtime=0)
+
+    def findable(self, word: str) -> List[str]:
+        """Every known word that uses exactly the letters of `word`."""
+        return self.anagrams.get(anagram_key(word), [word])
+
+    def is_valid(self, answer: str, word: str) -> bool:
+        """True if `answer` is a real word made of the scrambled letters of `word`."""
+        answer = answer.strip().lower()
+        return answer == word or answer in self.findable(word)
+
+    def response(self, request: web.Request) -> web.Response:
+        etag = f'"{self.version}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding, Authorization'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return web.Response(status=304, headers=headers)
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+        if pick_encoding(request.headers.get('Accept-Encoding', ''), ('gzip',)) == 'gzip':
+            headers['Content-Encoding'] = 'gzip'
+            return web.Response(body=self.body_gzip, headers=headers)
+        return web.Response(body=self.body, headers=headers)
+
+
+class WordPackCache:
+    def __init__(self):
+        self._lexicon: Optional[Dict[str, List[str]]] = None
+        self._lexicon_version = ''
+        self._packs: "OrderedDict[str, WordPack]" = OrderedDict()
+        self._user_sets: "OrderedDict[str, tuple]" = OrderedDict()   # user_id -> (loaded_at, [set_id])
+        self._building: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.builds = 0
+
+    @property
+    def lexicon(self) -> Dict[str, List[str]]:
+        if self._lexicon is None:
+            with open(LEXICON_PATH, 'rb') as f:
+                raw = f.read()
+            self._lexicon = {d: [w.lower() for w in words] for d, words in json.loads(raw).items()}
+            self._lexicon_version = hashlib.sha1(raw).hexdigest()[:8]
+        return self._lexicon
+
+    async def _set_ids(self, user_id: str) -> List[str]:
+        cached = self._user_sets.get(user_id)
+        if cached and time.monotonic() - cached[0] < SET_CACHE_TTL:
+            return cached[1]
+        sets = await get_user_sets(user_id, recursive=True)
+        set_ids = [s['set_id'] for s in sets][:MAX_PACK_SETS]
+        self._user_sets[user_id] = (time.monotonic(), set_ids)
+        self._user_sets.move_to_end(user_id)
+        while len(self._user_sets) > USER_SETS_CACHE_MAX:
+            self._user_sets.popitem(last=False)
+        return set_ids
+
+    async def get(self, user_id=None) -> WordPack:
+        """The pack for a player's current sets (lexicon only without a user)."""
+        lexicon = self.lexicon
+        snapshots = []
+        if user_id:
+            set_ids = await self._set_ids(str(user_id))
+            snapshots = [s for s in await asyncio.gather(*(get_set_snapshot(sid) for sid in set_ids)) if s]
+
+        version = hashlib.sha1(
+            ",".join([self._lexicon_version] + sorted(f"{s.set_id}:{s.version}" for s in snapshots)).encode('utf-8')
+        ).hexdigest()[:16]
+
+        pack = self._packs.get(version)
+        if pack:
+            self._packs.move_to_end(version)
+            self.hits += 1
+            return pack
+
+        # Deduplicate concurrent builds of the same version
+        building = self._building.get(version)
+        if building:
+            try:
+                return await asyncio.shield(building)
+            except asyncio.CancelledError:
+                if not building.cancelled():
+                    raise  # This caller was cancelled, not the build
+                return await self.get(user_id)  # The building request went away: build here
+        future = asyncio.get_running_loop().create_future()
+        self._building[version] = future
+        try:
+            personal = sorted({w for s in snapshots for w in map(normalize_term, (c.get('term') for c in s.cards)) if w})
+            pack = await run_sync(WordPack, version, personal, lexicon)
+            self._packs[version] = pack
+            while len(self._packs) > WORD_PACK_CACHE_MAX:
+                self._packs.popitem(last=False)
+            self.builds += 1
+            future.set_result(pack)
+            return pack
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # Never leave waiters hanging (e.g. the builder was cancelled: CancelledError is a BaseException)
+            if not future.done():
+                future.cancel()
+            self._building.pop(version, None)
+            if not future.cancelled():
+                future.exception()  # Mark retrieved so waiter-less failures aren't logged
+
+    def get_stats(self) -> Dict:
+        return {'packs': len(self._packs), 'hits': self.hits, 'builds': self.builds}
+
+
+# Global instance used by the game API
+word_packs = WordPackCache()
@@ -0,0 +1,142 @@
+"""
+Background Write Queue
+
+Side-effect writes from practice answers (user stats, card progress,
+notification backoff) go through one bounded per-process queue instead of
+an unbounded asyncio.create_task per click:
+- a fixed number of workers; a user's jobs always land on the same worker,
+  so they run in submission order (no read-modify-write races on the user doc)
+- bounded capacity: submit() waits while the worker is full (backpressure) and
+  drops the job only if it stays full for SUBMIT_TIMEOUT
+- failed jobs are retried with exponential backoff and jitter
+- drain() on shutdown finishes everything still queued
+- get_stats() reports depth, queue lag and failure counters
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict
+
+from bot_services.utils import percentile
+
+WRITE_QUEUE_WORKERS = int(os.getenv("WRITE_QUEUE_WORKERS", 8))
+WRITE_QUEUE_CAPACITY = int(os.getenv("WRITE_QUEUE_CAPACITY", 4000))  # Jobs across all workers
+
+SUBMIT_TIMEOUT = 2.0   # Max seconds a handler waits for room before the job is dropped
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5
+LAG_WINDOW = 500       # Recent jobs kept for lag percentiles
+
+
+class _Job:
+    __slots__ = ('user_id', 'label', 'fn', 'args', 'enqueued_at')
+
+    def __init__(self, user_id, label: str, fn: Callable[..., Awaitable], args: tuple):
+        self.user_id = user_id
+        self.label = label
+        self.fn = fn
+        self.args = args
+        self.enqueued_at = time.monotonic()
+
+
+class WriteQueue:
+    def __init__(self, workers: int = WRITE_QUEUE_WORKERS, capacity: int = WRITE_QUEUE_CAPACITY):
+        self.workers = max(1, workers)
+        self.capacity = capacity
+        self._queues = []
+        self._tasks = []
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self.counters = {'submitted': 0, 'completed': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+        self.max_depth = 0
+
+    def _start(self):
+        if self._tasks:
+            return
+        per_worker = max(1, self.capacity // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = [asyncio.get_running_loop().create_task(self._worker(q)) for q in self._queues]
+
+    async def submit(self, user_id, label: str, fn: Callable[..., Awaitable], *args) -> bool:
+        """
+        Queue `await fn(*args)` behind the user's earlier jobs.
+        Returns False if the job was dropped because the queue stayed full.
+        """
+        self._start()
+        queue = self._queues[hash(user_id) % self.workers]
+        job = _Job(user_id, label, fn, args)
+        try:
+            if queue.full():
+                await asyncio.wait_for(queue.put(job), timeout=SUBMIT_TIMEOUT)
+            else:
+                queue.put_nowait(job)
+        except asyncio.TimeoutError:
+            self.counters['dropped'] += 1
+            print(f"⚠️ Write queue full, dropped {label} for user {user_id}")
+            return False
+        self.counters['submitted'] += 1
+        self.max_depth = max(self.max_depth, self.depth())
+        return True
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            try:
+                self._lags.append(time.monotonic() - job.enqueued_at)
+                await self._run(job)
+            finally:
+                queue.task_done()
+
+    async def _run(self, job: _Job):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                await job.fn(*job.args)
+                self.counters['completed'] += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    self.counters['failed'] += 1
+                    print(f"❌ Background write {job.label} failed for user {job.user_id} after {attempt} attempts: {e}")
+                    return
+                self.counters['retried'] += 1
+                # Exponential backoff with jitter so retries don't synchronise
+                await asyncio.sleep(RETRY_BASE_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    async def drain(self, timeout: float = 30.0):
+        """Finish queued jobs (shutdown), then stop the workers."""
+        if not self._tasks:
+            return
+        pending = self.depth()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Write queue drain timed out with {self.depth()} jobs left")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._queues = [], []
+        print(f"💾 Write queue drained ({pending} pending at shutdown)")
+
+    def get_stats(self) -> Dict:
+        lags = sorted(self._lags)
+        return {
+            **self.counters,
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'depth': self.depth(),
+            'max_depth': self.max_depth,
+            'p50_lag': round(percentile(lags, 50), 3),
+            'p95_lag': round(percentile(lags, 95), 3),
+            'max_lag': round(lags[-1], 3) if lags else 0.0,
+        }
+
+
+# Global instance used by handlers
+write_queue = WriteQueue()
@@ -1,20 +1,29 @@
 """
 QuizzWords Game API - Backend for Hexagame Integration
 Handles: user sessions, scores, TX/XP rewards, leaderboards
+
+Standalone aiohttp server on one persistent event loop, using the same
+async service layer as main.py (firebase_service + game_leaderboard).
+create_app() can also be mounted into another aiohttp app as a sub-app.
 """
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
+from aiohttp import web
+import asyncio
 import os
 import sys
 import json
-from datetime import datetime, timezone, timedelta
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-# Add parent directory to path for firebase_service
+# Add parent directory to path for bot_services
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-app = Flask(__name__, static_folder='hexagame')
-CORS(app)
+from bot_services.firebase_service import add_game_score, add_total_xp, add_tx_coins, get_best_game_score, get_user
+from bot_services.game_auth import create_session, game_user, signed_game_user
+from bot_services.game_leaderboard import game_leaderboard_flusher, game_leaderboards
+from bot_services.static_assets import hexagame_assets
+from bot_services.word_packs import word_packs
+
+FIRESTORE_THREADS = int(os.getenv("FIRESTORE_THREADS", 64))
 
 # TX Coin rewards configuration
 TX_REWARDS = {
@@ -32,115 +41,114 @@ XP_REWARDS = {
     'game_complete': 50,      # Finish a game (reduced from 100)
 }
 
-def get_telegram_user_id():
-    """Extract user ID from Telegram init data."""
-    init_data = request.headers.get('X-Telegram-Init-Data', '')
-    user_id = request.headers.get('X-User-Id', '')
-    
-    if user_id:
-        return int(user_id)
-    
-    # Parse init data if present (simplified - in production use proper validation)
-    if init_data:
-        try:
-            import urllib.parse
-            data = dict(urllib.parse.parse_qsl(init_data))
-            if 'user' in data:
-                user_data = json.loads(data['user'])
-                return user_data.get('id')
-        except:
-            pass
-    
-    return None
-
-def require_auth(f):
-    """Decorator to require Telegram authentication."""
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        user_id = get_telegram_user_id()
-        if not user_id:
-            return jsonify({'error': 'unauthorized'}), 401
-        request.user_id = user_id
-        return f(*args, **kwargs)
+def require_auth(handler):
+    """Decorator to require a session token (or the legacy X-User-Id header)."""
+    async def decorated(request: web.Request):
+        caller = game_user(request.headers)
+        if not caller:
+            return web.json_response({'error': 'unauthorized'}, status=401)
+        request['user_id'] = caller['uid']
+        request['caller'] = caller
+        return await handler(request)
     return decorated
 
+@web.middleware
+async def cors_middleware(request: web.Request, handler):
+    """Allow the game to be embedded from any origin (was flask-cors)."""
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-User-Id, X-Telegram-Init-Data'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
 # ============================================
 # STATIC FILES - Serve the game
 # ============================================
 
-@app.route('/')
-def serve_game():
+async def serve_game(request: web.Request):
     """Serve the main game HTML."""
-    return send_from_directory('hexagame', 'index.html')
+    return hexagame_assets.response(request, 'index.html')
 
-@app.route('/<path:path>')
-def serve_static(path):
-    """Serve static files from hexagame folder."""
-    return send_from_directory('hexagame', path)
+async def serve_static(request: web.Request):
+    """Serve static files from hexagame folder (in memory, pre-compressed, ETag/304)."""
+    response = hexagame_assets.response(request, request.match_info['path'])
+    if response is None:
+        raise web.HTTPNotFound()
+    return response
 
 # ============================================
 # GAME API ENDPOINTS
 # ============================================
 
-@app.route('/api/game/start', methods=['POST'])
+async def create_game_session(request: web.Request):
+    """Validate Telegram initData once and issue a signed session token."""
+    try:
+        body = await request.json() if request.can_read_body else {}
+    except ValueError:
+        body = {}
+    init_data = body.get('init_data') or request.headers.get('X-Telegram-Init-Data', '')
+
+    try:
+        session = await create_session(init_data)
+    except Exception as e:
+        print(f"Error creating game session: {e}")
+        return web.json_response({'success': False, 'error': str(e)}, status=500)
+    if not session:
+        return web.json_response({'error': 'invalid_init_data'}, status=401)
+    return web.json_response({'success': True, **session})
+
 @require_auth
-def start_game():
+async def start_game(request: web.Request):
     """Initialize a new game session."""
-    user_id = request.user_id
-    
+    user_id = request['user_id']
+    caller = request['caller']
+
     try:
-        from bot_services.firebase_service import get_user
-        import asyncio
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        user = loop.run_until_complete(get_user(user_id))
-        loop.close()
-        
+        # Balances change during play, so they are read even with a signed token
+        user = await get_user(user_id)
+
         if not user:
-            return jsonify({'error': 'user_not_found'}), 404
-        
-        return jsonify({
+            return web.json_response({'error': 'user_not_found'}, status=404)
+
+        return web.json_response({
             'success': True,
             'user': {
                 'id': user_id,
-                'name': user.get('first_name', 'Player'),
+                'name': caller.get('name') or user.get('first_name', 'Player'),
+                'level': caller.get('lvl') or user.get('level', 1),
                 'tx_coins': user.get('tx_coins', 0),
                 'xp': user.get('xp', 0)
             }
         })
     except Exception as e:
         print(f"Error starting game: {e}")
-        return jsonify({'success': True, 'user': {'id': user_id}})
+        return web.json_response({'success': True, 'user': {'id': user_id}})
 
-@app.route('/api/game/submit_score', methods=['POST'])
 @require_auth
-def submit_score():
+async def submit_score(request: web.Request):
     """Submit game score and award TX/XP."""
-    user_id = request.user_id
-    data = request.get_json()
-    
+    user_id = request['user_id']
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return web.json_response({'success': False, 'error': 'invalid_body'}, status=400)
+
     score = data.get('score', 0)
     words_found = data.get('words', 0)
     level = data.get('level', 1)
     letters = data.get('letters', 0)
-    
-    # Calculate rewards
-    tx_earned = (words_found * TX_REWARDS['word_found']) + (level * TX_REWARDS['level_complete'])
-    xp_earned = (words_found * XP_REWARDS['word_found']) + (level * XP_REWARDS['level_complete'])
-    
+
     try:
-        from bot_services.firebase_service import add_tx_coins, add_total_xp, db
-        import asyncio
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Award TX and XP
-        loop.run_until_complete(add_tx_coins(user_id, tx_earned))
-        loop.run_until_complete(add_total_xp(user_id, xp_earned))
-        
-        # Save game score to Firestore
+        # Calculate rewards
+        tx_earned = (words_found * TX_REWARDS['word_found']) + (level * TX_REWARDS['level_complete'])
+        xp_earned = (words_found * XP_REWARDS['word_found']) + (level * XP_REWARDS['level_complete'])
+
+        # Award TX/XP, save the score and update leaderboards concurrently
         game_data = {
             'user_id': str(user_id),
             'score': score,
@@ -151,102 +159,57 @@ def submit_score():
             'xp_earned': xp_earned,
             'timestamp': datetime.now(timezone.utc)
         }
-        db.collection('game_scores').add(game_data)
-        
-        loop.close()
-        
-        return jsonify({
+        await asyncio.gather(
+            add_tx_coins(user_id, tx_earned),
+            add_total_xp(user_id, xp_earned),
+            add_game_score(game_data),
+            game_leaderboards.record(user_id, score, words_found, level, name=request['caller'].get('name')),
+        )
+
+        return web.json_response({
             'success': True,
             'tx_earned': tx_earned,
             'xp_earned': xp_earned
         })
     except Exception as e:
         print(f"Error submitting score: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
-
-@app.route('/api/game/leaderboard', methods=['GET'])
-def get_leaderboard():
-    """Get game leaderboard."""
-    period = request.args.get('period', 'daily')  # daily, weekly, all
-    limit = min(int(request.args.get('limit', 10)), 50)
-    
+        return web.json_response({'success': False, 'error': str(e)}, status=500)
+
+async def get_leaderboard(request: web.Request):
+    """Get game leaderboard (shared precomputed boards, see bot_services/game_leaderboard.py)."""
+    period = request.query.get('period', 'daily')  # daily, weekly, all
+    limit = min(int(request.query.get('limit', 10)), 50)
+
     try:
-        from bot_services.firebase_service import db
-        from google.cloud.firestore_v1 import Query
-        
-        # Calculate time filter
-        now = datetime.now(timezone.utc)
-        if period == 'daily':
-            start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == 'weekly':
-            start_time = now - timedelta(days=7)
-        else:
-            start_time = datetime(2020, 1, 1, tzinfo=timezone.utc)
-        
-        # Query top scores
-        query = db.collection('game_scores')\
-            .where('timestamp', '>=', start_time)\
-            .order_by('timestamp', direction=Query.DESCENDING)\
-            .limit(limit * 5)  # Get more to aggregate by user
-        
-        docs = query.stream()
-        
-        # Aggregate best scores per user
-        user_scores = {}
-        for doc in docs:
-            data = doc.to_dict()
-            uid = data.get('user_id')
-            score = data.get('score', 0)
-            
-            if uid not in user_scores or score > user_scores[uid]['score']:
-                user_scores[uid] = {
-                    'user_id': uid,
-                    'score': score,
-                    'words': data.get('words', 0),
-                    'level': data.get('level', 1)
-                }
-        
-        # Sort by score and limit
-        leaderboard = sorted(user_scores.values(), key=lambda x: x['score'], reverse=True)[:limit]
-        
-        # Add rank
-        for i, entry in enumerate(leaderboard):
-            entry['rank'] = i + 1
-        
-        return jsonify({
+        leaderboard = await game_leaderboards.top(period, limit)
+        return web.json_response({
             'success': True,
             'period': period,
             'leaderboard': leaderboard
         })
     except Exception as e:
         print(f"Error getting leaderboard: {e}")
-        return jsonify({'success': True, 'leaderboard': []})
+        return web.json_response({'success': True, 'leaderboard': []})
+
+async def get_word_pack(request: web.Request):
+    """Word Scramble words from the player's own sets + the lexicon (lexicon only without a signed session token)."""
+    caller = signed_game_user(request.headers)  # Personal packs need a signed session token
+    try:
+        pack = await word_packs.get(caller['uid'] if caller else None)
+        return pack.response(request)
+    except Exception as e:
+        print(f"Error getting word pack: {e}")
+        return web.json_response({'success': False, 'error': str(e)}, status=500)
 
-@app.route('/api/game/user_stats', methods=['GET'])
 @require_auth
-def get_user_stats():
+async def get_user_stats(request: web.Request):
     """Get current user's game stats."""
-    user_id = request.user_id
-    
+    user_id = request['user_id']
+
     try:
-        from bot_services.firebase_service import db, get_user
-        import asyncio
-        
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        user = loop.run_until_complete(get_user(user_id))
-        loop.close()
-        
-        # Get user's best score
-        query = db.collection('game_scores')\
-            .where('user_id', '==', str(user_id))\
-            .order_by('score', direction='DESCENDING')\
-            .limit(1)
-        
-        docs = list(query.stream())
-        best_score = docs[0].to_dict() if docs else None
-        
-        return jsonify({
+        user, best_score = await asyncio.gather(get_user(user_id), get_best_game_score(user_id))
+
+        return web.json_response({
             'success': True,
             'user': {
                 'id': user_id,
@@ -255,21 +218,51 @@ def get_user_stats():
                 'xp': user.get('xp', 0) if user else 0
             },
             'best_score': best_score
-        })
+        }, dumps=lambda obj: json.dumps(obj, default=str))
     except Exception as e:
         print(f"Error getting user stats: {e}")
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return web.json_response({'success': False, 'error': str(e)}, status=500)
 
 # ============================================
 # HEALTH CHECK
 # ============================================
 
-@app.route('/api/health')
-def health_check():
+async def health_check(request: web.Request):
     """Health check endpoint."""
-    return jsonify({'status': 'ok', 'game': 'quizzwords'})
+    return web.json_response({'status': 'ok', 'game': 'quizzwords'})
+
+# ============================================
+# APP
+# ============================================
+
+async def _on_startup(app: web.Application):
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=FIRESTORE_THREADS))
+    app['leaderboard_flusher'] = asyncio.create_task(game_leaderboard_flusher())
+    hexagame_assets.assets  # Build/load once before the first request
+
+async def _on_cleanup(app: web.Application):
+    app['leaderboard_flusher'].cancel()
+    await game_leaderboards.flush()
+
+def create_app() -> web.Application:
+    app = web.Application(middlewares=[cors_middleware])
+
+    app.router.add_post('/api/game/session', create_game_session)
+    app.router.add_post('/api/game/start', start_game)
+    app.router.add_post('/api/game/submit_score', submit_score)
+    app.router.add_get('/api/game/leaderboard', get_leaderboard)
+    app.router.add_get('/api/game/word_pack', get_word_pack)
+    app.router.add_get('/api/game/user_stats', get_user_stats)
+    app.router.add_get('/api/health', health_check)
+
+    app.router.add_get('/', serve_game)
+    app.router.add_get('/{path:.+}', serve_static)
+
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
 
 if __name__ == '__main__':
     port = int(os.environ.get('GAME_PORT', 8081))
     print(f"🎮 QuizzWords Game Server starting on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=True)
+    web.run_app(create_app(), host='0.0.0.0', port=port)
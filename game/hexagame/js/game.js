@@ -3,74 +3,27 @@
 (function () {
     'use strict';
 
-    // ===== WORD LISTS BY DIFFICULTY =====
-    const WORDS = {
-        easy: [
-            // 3-4 letter simple words (100+ words)
-            'cat', 'dog', 'sun', 'hat', 'cup', 'bed', 'box', 'map', 'pen', 'red',
-            'run', 'sit', 'top', 'wet', 'win', 'yes', 'zip', 'ace', 'age', 'air',
-            'ant', 'arm', 'art', 'bag', 'bat', 'bee', 'big', 'bit', 'bow', 'boy',
-            'bus', 'buy', 'cab', 'can', 'car', 'cow', 'cry', 'cut', 'dad', 'day',
-            'dig', 'dot', 'dry', 'ear', 'eat', 'egg', 'end', 'eye', 'fan', 'far',
-            'fat', 'fig', 'fit', 'fix', 'fog', 'fox', 'fun', 'gap', 'gas', 'get',
-            'god', 'got', 'gum', 'gun', 'gut', 'gym', 'ham', 'hen', 'hid', 'hit',
-            'hop', 'hot', 'hug', 'ice', 'ill', 'ink', 'inn', 'ion', 'jam', 'jar',
-            'jaw', 'jet', 'job', 'jog', 'joy', 'jug', 'key', 'kid', 'kit', 'lab',
-            'lap', 'law', 'lay', 'led', 'leg', 'let', 'lid', 'lip', 'log', 'lot',
-            'low', 'mad', 'man', 'mat', 'max', 'men', 'met', 'mix', 'mob', 'mom',
-            'mop', 'mud', 'mug', 'nap', 'net', 'new', 'nod', 'nor', 'not', 'now',
-            'nut', 'oak', 'odd', 'off', 'oil', 'old', 'one', 'orb', 'ore', 'our',
-            'out', 'owe', 'owl', 'own', 'pad', 'pan', 'pat', 'paw', 'pay', 'pea',
-            'pet', 'pie', 'pig', 'pin', 'pit', 'pod', 'pop', 'pot', 'pub', 'pun'
-        ],
-        moderate: [
-            // 5-6 letter common words (100+ words)
-            'apple', 'beach', 'brain', 'bread', 'chair', 'chest', 'clock', 'cloud',
-            'dance', 'drink', 'earth', 'fight', 'flame', 'flash', 'floor', 'fruit',
-            'ghost', 'glass', 'grape', 'grass', 'green', 'happy', 'heart', 'house',
-            'juice', 'knife', 'lemon', 'light', 'money', 'month', 'mouse', 'music',
-            'night', 'ocean', 'paint', 'party', 'peace', 'phone', 'piano', 'pizza',
-            'plant', 'queen', 'quick', 'river', 'robot', 'salad', 'sheep', 'shine',
-            'shirt', 'shoes', 'sleep', 'smile', 'smoke', 'snake', 'space', 'speed',
-            'spoon', 'sport', 'stamp', 'stand', 'steam', 'steel', 'stone', 'store',
-            'storm', 'story', 'sugar', 'sweet', 'table', 'teeth', 'tiger', 'toast',
-            'train', 'truck', 'truth', 'video', 'watch', 'water', 'wheel', 'world',
-            'album', 'alert', 'angle', 'ankle', 'arrow', 'badge', 'basic', 'beard',
-            'beast', 'bench', 'birth', 'blade', 'blame', 'blank', 'blast', 'blaze',
-            'bleed', 'blend', 'blind', 'block', 'blood', 'bloom', 'board', 'boast',
-            'bonus', 'boost', 'bound', 'bowel', 'brain', 'brake', 'brand', 'brave',
-            'bride', 'brief', 'bring', 'broad', 'broke', 'brook', 'brown', 'brush',
-            'build', 'bunch', 'burst', 'cabin', 'cable', 'candy', 'cargo', 'carry',
-            'carve', 'catch', 'cause', 'chain', 'chalk', 'charm', 'chart', 'chase',
-            'cheap', 'check', 'cheek', 'cheer', 'chess', 'child', 'chill', 'china',
-            'chunk', 'civic', 'claim', 'class', 'clean', 'clear', 'clerk', 'click',
-            'cliff', 'climb', 'close', 'cloth', 'coach', 'coast', 'coral', 'couch'
-        ],
-        hard: [
-            // 7+ letter challenging words (100+ words)
-            'absolute', 'abstract', 'academic', 'accident', 'accurate', 'achieve',
-            'acquired', 'activate', 'addition', 'adequate', 'adjacent', 'advanced',
-            'adventure', 'advocate', 'affected', 'aircraft', 'alliance', 'allocate',
-            'although', 'aluminum', 'american', 'analysis', 'announce', 'anything',
-            'anywhere', 'apparent', 'appetite', 'approach', 'approval', 'argument',
-            'artistic', 'assembly', 'assuming', 'athletic', 'attached', 'attorney',
-            'audience', 'bachelor', 'backward', 'bacteria', 'balanced', 'baseball',
-            'bathroom', 'becoming', 'behavior', 'bellying', 'benefits', 'birthday',
-            'boarding', 'boundary', 'breaking', 'breeding', 'briefing', 'brilliant',
-            'bringing', 'brochure', 'brothers', 'browsers', 'brunette', 'building',
-            'bulletin', 'business', 'calendar', 'campaign', 'capacity', 'category',
-            'centered', 'ceremony', 'chairman', 'champion', 'changing', 'chapters',
-            'charging', 'charming', 'checking', 'chemical', 'children', 'choosing',
-            'circular', 'cipline', 'citizens', 'claiming', 'cleaning', 'climbing',
-            'clothing', 'coaching', 'collapse', 'colonial', 'colorful', 'combined',
-            'comeback', 'commerce', 'commonly', 'compared', 'compiler', 'complete',
-            'composed', 'compound', 'computer', 'conclude', 'concrete', 'conflict',
-            'confused', 'congress', 'consider', 'constant', 'consumer', 'contains',
-            'continue', 'contract', 'contrast', 'controls', 'convince', 'corridor',
-            'counting', 'covering', 'creative', 'creature', 'criminal', 'critical'
-        ]
+    // ===== WORD PACK =====
+    // Replaced by /api/game/word_pack (the player's own words + the lexicon,
+    // with an anagram index). These short lists only cover the time until it
+    // arrives or a server that can't be reached.
+    const wordPack = {
+        words: {
+            easy: ['cat', 'dog', 'sun', 'hat', 'cup', 'map', 'pen', 'box', 'bed', 'owl'],
+            moderate: ['apple', 'beach', 'brain', 'bread', 'chair', 'clock', 'cloud', 'dance', 'earth', 'house'],
+            hard: ['absolute', 'abstract', 'accident', 'aircraft', 'although', 'approach', 'birthday', 'building', 'creative', 'critical']
+        },
+        anagrams: {}  // sorted letters -> every real word made of them (only groups with 2+ words)
     };
 
+    function anagramKey(word) {
+        return word.split('').sort().join('');
+    }
+
+    function findableWords(word) {
+        return wordPack.anagrams[anagramKey(word)] || [word];
+    }
+
     // ===== GAME STATE =====
     let state = {
         currentWord: '',
@@ -133,6 +86,10 @@
         app: window.Telegram?.WebApp,
         userId: null,
         userName: 'Player',
+        token: null,
+        tokenExpiresAt: 0,
+        renewing: null,
+        session: null,
         isInTelegram: false,
         sessionScore: 0,
         scoreSubmitted: false,
@@ -161,19 +118,84 @@
                     }
                 });
 
-                // Fetch user stats
-                this.fetchUserStats();
+                // Validate initData once, then fetch user stats with the session token
+                this.session = this.startSession();
+                this.session.then(() => this.fetchUserStats());
             }
 
+            // Personal word pack once the session token is known (lexicon-only without one)
+            Promise.resolve(this.session).then(() => this.loadWordPack());
+
             console.log('🎮 Word Scramble initialized', this.isInTelegram ? 'in Telegram' : 'in browser');
         },
 
-        async fetchUserStats() {
+        async startSession() {
+            if (!this.app?.initData) return;
             try {
-                const response = await fetch(`/api/game/user-stats?user_id=${this.userId}`, {
-                    headers: { 'X-User-Id': String(this.userId || '') }
+                const response = await fetch('/api/game/session', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ init_data: this.app.initData })
                 });
                 const data = await response.json();
+                if (data.success) {
+                    this.token = data.token;
+                    this.tokenExpiresAt = data.expires_at || 0;
+                    this.userName = data.user?.name || this.userName;
+                }
+            } catch (e) {
+                console.error('Failed to start game session:', e);
+            }
+        },
+
+        refreshSession() {
+            // One renewal at a time, however many requests notice the expiry
+            if (!this.renewing) {
+                this.renewing = this.startSession().finally(() => { this.renewing = null; });
+            }
+            return this.renewing;
+        },
+
+        async authFetch(url, options = {}) {
+            // Tokens expire (GAME_TOKEN_TTL): renew shortly before, and once more on a 401
+            await this.session;
+            if (this.token && this.tokenExpiresAt && Date.now() / 1000 > this.tokenExpiresAt - 300) {
+                await this.refreshSession();
+            }
+            const send = () => fetch(url, { ...options, headers: { ...(options.headers || {}), ...this.authHeaders() } });
+            let response = await send();
+            if (response.status === 401 && this.app?.initData) {
+                await this.refreshSession();
+                response = await send();
+            }
+            return response;
+        },
+
+        authHeaders() {
+            // Signed session token; X-User-Id only as a fallback for older servers
+            return this.token
+                ? { 'Authorization': `Bearer ${this.token}` }
+                : { 'X-User-Id': String(this.userId || '') };
+        },
+
+        async loadWordPack() {
+            try {
+                const response = await this.authFetch('/api/game/word_pack');
+                const data = await response.json();
+                if (data.success) {
+                    wordPack.words = data.words;
+                    wordPack.anagrams = data.anagrams || {};
+                    console.log(`🔤 Word pack ${data.version} (${data.personal} of your words)`);
+                }
+            } catch (e) {
+                console.error('Failed to load word pack:', e);
+            }
+        },
+
+        async fetchUserStats() {
+            try {
+                const response = await this.authFetch(`/api/game/user-stats?user_id=${this.userId}`);
+                const data = await response.json();
                 elements.txAmount.textContent = data.tx || 0;
             } catch (e) {
                 console.error('Failed to fetch user stats:', e);
@@ -190,12 +212,9 @@
             const txEarned = Math.floor(this.sessionScore / 20);  // Reduced rewards
 
             try {
-                await fetch('/api/game/submit-score', {
+                const response = await this.authFetch('/api/game/submit-score', {
                     method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                        'X-User-Id': String(this.userId || '')
-                    },
+                    headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
                         user_id: this.userId || 'debug_user',
                         user_name: this.userName,
@@ -204,8 +223,10 @@
                         tx_earned: txEarned
                     })
                 });
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
                 console.log('✅ Score submitted:', this.sessionScore);
             } catch (e) {
+                this.scoreSubmitted = false;  // Let the next close/back try again
                 console.error('Failed to submit score:', e);
             }
 
@@ -230,9 +251,9 @@
         let arr = word.split('');
         let scrambled = word;
 
-        // Keep scrambling until it's different from original
+        // Keep scrambling until it's not the word (or another word with its letters)
         let attempts = 0;
-        while (scrambled === word && attempts < 20) {
+        while (findableWords(word).includes(scrambled) && attempts < 20) {
             for (let i = arr.length - 1; i > 0; i--) {
                 const j = Math.floor(Math.random() * (i + 1));
                 [arr[i], arr[j]] = [arr[j], arr[i]];
@@ -246,7 +267,7 @@
 
     function getRandomWord() {
         // Get word list for current difficulty
-        const wordList = WORDS[state.difficulty];
+        const wordList = wordPack.words[state.difficulty];
 
         // Get words not yet used
         const available = wordList.filter(w => !state.usedWords.includes(w));
@@ -332,8 +353,8 @@
     function checkAnswer() {
         const answer = elements.answerInput.value.toLowerCase().trim();
 
-        if (answer === state.currentWord) {
-            // Correct!
+        if (findableWords(state.currentWord).includes(answer)) {
+            // Correct! (any real word using exactly the scrambled letters counts)
             state.streak++;
             const points = 1 + Math.floor(state.streak * 0.5); // Reduced scoring (was 10 + streak*2)
             state.score += points;
@@ -493,7 +514,7 @@
         // Auto-check on input
         elements.answerInput.addEventListener('input', () => {
             const answer = elements.answerInput.value.toLowerCase().trim();
-            if (answer === state.currentWord) {
+            if (findableWords(state.currentWord).includes(answer)) {
                 checkAnswer();
             }
         });
@@ -2,8 +2,8 @@ import asyncio
 import logging
 import os
 import aiohttp 
+from concurrent.futures import ThreadPoolExecutor
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 from aiohttp import web 
 from datetime import datetime, timezone
@@ -12,6 +12,10 @@ from datetime import datetime, timezone
 from bot_handlers import start, add_cards, manage, practice, explore, stats, settings, admin, vocabulary, help
 from bot_services.firebase_service import get_all_users
 from bot_services.notifications import check_and_send_due_card_notifications
+from bot_services.ai_usage import ai_usage_flusher, flush_usage
+from bot_services.fsm_storage import create_storage
+from bot_services.write_queue import write_queue
+from bot_services.group_sessions import group_session_snapshotter
 from bot_services.middleware import BanCheckMiddleware
 
 # Load Env
@@ -19,6 +23,9 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 PORT = int(os.getenv("PORT", 8080)) 
 RENDER_EXTERNAL_URL = os.getenv("RENDER_EXTERNAL_URL")
+# Threads for blocking Firestore calls (run_sync). Game API bursts share them with
+# bot handlers, so size for both: ~200 game req/s x ~3 calls x ~50ms each.
+FIRESTORE_THREADS = int(os.getenv("FIRESTORE_THREADS", 64))
 
 if not BOT_TOKEN:
     exit("Error: BOT_TOKEN not found in env")
@@ -70,10 +77,7 @@ async def send_smart_notifications(bot: Bot):
             await bot.send_message(uid, msg)
             
             # Mark as notified today to prevent spam
-            from bot_services.firebase_service import db
-            db.collection('users').document(str(uid)).update({
-                'last_notif_date': today_str
-            })
+            await set_last_notif_date(uid, today_str)
             
             count += 1
             await asyncio.sleep(0.05)  # Anti-spam safety
@@ -95,49 +99,76 @@ async def health_check(request):
     return web.Response(text="Bot is running!")
 
 # ===== GAME API ROUTES =====
+# All Firestore access goes through firebase_service (run_sync -> thread pool),
+# so game traffic never blocks Telegram update processing on the event loop.
 import json
 from datetime import datetime, timedelta
-from bot_services.firebase_service import add_tx_coins, add_total_xp, db, get_user
-
-GAME_DIR = os.path.join(os.path.dirname(__file__), 'game', 'hexagame')
+from bot_services.firebase_service import (
+    add_daily_challenge_completion, add_game_score, add_tx_coins, add_total_xp,
+    get_daily_challenge_completion, get_user, set_last_notif_date
+)
+from bot_services.game_leaderboard import game_leaderboard_flusher, game_leaderboards
+from bot_services.game_auth import create_session, game_user, signed_game_user
+from bot_services.static_assets import hexagame_assets
+from bot_services.word_packs import word_packs
 
 async def serve_game(request):
-    """Serve the main game HTML."""
-    return web.FileResponse(os.path.join(GAME_DIR, 'index.html'))
+    """Serve the main game HTML (in memory, see bot_services/static_assets.py)."""
+    return hexagame_assets.response(request, 'index.html')
 
 async def serve_game_static(request):
-    """Serve static game files."""
+    """Serve static game files (fingerprinted, pre-compressed, ETag/304)."""
     path = request.match_info.get('path', '')
     
     # Allow serving from both root and hexagame subfolder
     if path.startswith('hexagame/'):
         path = path.replace('hexagame/', '', 1)
         
-    file_path = os.path.join(GAME_DIR, path)
-    if os.path.isfile(file_path):
-        return web.FileResponse(file_path)
+    response = hexagame_assets.response(request, path)
+    if response is not None:
+        return response
     
     # Fallback to index if path is 'hexagame' or 'hexagame/'
-    if path == '' or path == 'index.html':
-        return web.FileResponse(os.path.join(GAME_DIR, 'index.html'))
+    if path == '' or path == 'hexagame':
+        return hexagame_assets.response(request, 'index.html')
         
     return web.Response(status=404, text=f"Not found: {path}")
 
+async def game_session(request):
+    """Validate Telegram initData once and issue a signed session token."""
+    try:
+        body = await request.json() if request.can_read_body else {}
+    except ValueError:
+        body = {}
+    init_data = body.get('init_data') or request.headers.get('X-Telegram-Init-Data', '')
+    
+    try:
+        session = await create_session(init_data)
+    except Exception as e:
+        logging.error(f"Game session error: {e}")
+        return web.json_response({'success': False, 'error': str(e)}, status=500)
+    if not session:
+        return web.json_response({'error': 'invalid_init_data'}, status=401)
+    return web.json_response({'success': True, **session})
+
 async def game_start(request):
     """Initialize a new game session."""
-    user_id = request.headers.get('X-User-Id', '')
-    if not user_id:
+    caller = game_user(request.headers)
+    if not caller:
         return web.json_response({'error': 'unauthorized'}, status=401)
+    user_id = caller['uid']
     
     try:
-        user = await get_user(int(user_id))
+        # Balances change during play, so they are read even with a signed token
+        user = await get_user(int(user_id)) or {}
         return web.json_response({
             'success': True,
             'user': {
                 'id': user_id,
-                'name': user.get('first_name', 'Player') if user else 'Player',
-                'tx_coins': user.get('xp', 0) if user else 0,  # xp field = TX coins
-                'xp': user.get('total_xp', 0) if user else 0
+                'name': caller.get('name') or user.get('first_name', 'Player'),
+                'level': caller.get('lvl') or user.get('level', 1),
+                'tx_coins': user.get('xp', 0),  # xp field = TX coins
+                'xp': user.get('total_xp', 0)
             }
         })
     except Exception as e:
@@ -146,12 +177,18 @@ async def game_start(request):
 
 async def game_submit_score(request):
     """Submit game score and award TX/XP."""
-    user_id = request.headers.get('X-User-Id', '')
-    if not user_id:
+    caller = game_user(request.headers)
+    if not caller:
         return web.json_response({'error': 'unauthorized'}, status=401)
-    
+    user_id = caller['uid']
     try:
         data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return web.json_response({'success': False, 'error': 'invalid_body'}, status=400)
+    
+    try:
         score = data.get('score', 0)
         words_found = data.get('words', 0)
         level = data.get('level', 1)
@@ -160,11 +197,7 @@ async def game_submit_score(request):
         tx_earned = (words_found * 0.5) + (level * 10)
         xp_earned = (words_found * 2) + (level * 20)  # Lowered from 5/50
         
-        # Award TX and XP
-        await add_tx_coins(int(user_id), tx_earned)
-        await add_total_xp(int(user_id), xp_earned)
-        
-        # Save game score to Firestore
+        # Award TX/XP and save the score concurrently
         game_data = {
             'user_id': str(user_id),
             'score': score,
@@ -174,7 +207,12 @@ async def game_submit_score(request):
             'xp_earned': xp_earned,
             'timestamp': datetime.now(timezone.utc)
         }
-        db.collection('game_scores').add(game_data)
+        await asyncio.gather(
+            add_tx_coins(int(user_id), tx_earned),
+            add_total_xp(int(user_id), xp_earned),
+            add_game_score(game_data),
+            game_leaderboards.record(user_id, score, words_found, level, name=caller.get('name')),
+        )
         
         logging.info(f"🎮 Game score: user={user_id}, score={score}, +{tx_earned}TX, +{xp_earned}XP")
         
@@ -189,9 +227,10 @@ async def game_submit_score(request):
 
 async def game_user_stats(request):
     """Get current user's game stats."""
-    user_id = request.headers.get('X-User-Id', '')
-    if not user_id:
+    caller = game_user(request.headers)
+    if not caller:
         return web.json_response({'error': 'unauthorized'}, status=401)
+    user_id = caller['uid']
     
     try:
         user = await get_user(int(user_id))
@@ -209,58 +248,12 @@ async def game_user_stats(request):
         return web.json_response({'success': False, 'error': str(e)}, status=500)
 
 async def game_leaderboard(request):
-    """Get game leaderboard."""
+    """Get game leaderboard (precomputed best scores, no per-request queries)."""
     period = request.query.get('period', 'daily')  # daily, weekly, all
     limit = min(int(request.query.get('limit', 10)), 50)
     
     try:
-        from google.cloud.firestore_v1 import Query
-        
-        # Calculate time filter
-        now = datetime.now(timezone.utc)
-        if period == 'daily':
-            start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        elif period == 'weekly':
-            start_time = now - timedelta(days=7)
-        else:
-            start_time = datetime(2020, 1, 1, tzinfo=timezone.utc)
-        
-        # Query top scores
-        query = db.collection('game_scores')\
-            .where('timestamp', '>=', start_time)\
-            .order_by('timestamp', direction=Query.DESCENDING)\
-            .limit(limit * 5)
-        
-        docs = query.stream()
-        
-        # Aggregate best scores per user
-        user_scores = {}
-        for doc in docs:
-            data = doc.to_dict()
-            uid = data.get('user_id')
-            score = data.get('score', 0)
-            
-            if uid not in user_scores or score > user_scores[uid]['score']:
-                user_scores[uid] = {
-                    'user_id': uid,
-                    'score': score,
-                    'words': data.get('words', 0),
-                    'level': data.get('level', 1)
-                }
-        
-        # Sort by score and limit
-        leaderboard = sorted(user_scores.values(), key=lambda x: x['score'], reverse=True)[:limit]
-        
-        # Add rank and names
-        for i, entry in enumerate(leaderboard):
-            entry['rank'] = i + 1
-            # Get user name from Firestore
-            try:
-                user = await get_user(int(entry['user_id']))
-                entry['name'] = user.get('first_name', 'Player') if user else 'Player'
-            except:
-                entry['name'] = 'Player'
-        
+        leaderboard = await game_leaderboards.top(period, limit)
         return web.json_response({
             'success': True,
             'period': period,
@@ -270,9 +263,20 @@ async def game_leaderboard(request):
         logging.error(f"Leaderboard error: {e}")
         return web.json_response({'success': True, 'leaderboard': []})
 
+async def game_word_pack(request):
+    """Word Scramble words from the player's own sets + the lexicon (see bot_services/word_packs.py)."""
+    caller = signed_game_user(request.headers)  # Personal packs need a signed session token
+    try:
+        pack = await word_packs.get(caller['uid'] if caller else None)
+        return pack.response(request)
+    except Exception as e:
+        logging.error(f"Game word pack error: {e}")
+        return web.json_response({'success': False, 'error': str(e)}, status=500)
+
 async def game_daily_challenge(request):
     """Get today's daily challenge info."""
-    user_id = request.headers.get('X-User-Id', '')
+    caller = game_user(request.headers)
+    user_id = caller['uid'] if caller else None
     
     try:
         today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
@@ -283,14 +287,10 @@ async def game_daily_challenge(request):
         
         if user_id:
             # Check for existing daily completion
-            query = db.collection('daily_challenges')\
-                .where('user_id', '==', str(user_id))\
-                .where('date', '==', today)\
-                .limit(1)
-            docs = list(query.stream())
-            if docs:
+            done = await get_daily_challenge_completion(user_id, today)
+            if done:
                 completed = True
-                bonus_earned = docs[0].to_dict().get('bonus_earned', 0)
+                bonus_earned = done.get('bonus_earned', 0)
         
         # Daily challenge config (could be from DB in future)
         challenge = {
@@ -310,25 +310,25 @@ async def game_daily_challenge(request):
 
 async def game_complete_daily(request):
     """Complete daily challenge and earn bonus."""
-    user_id = request.headers.get('X-User-Id', '')
-    if not user_id:
+    caller = game_user(request.headers)
+    if not caller:
         return web.json_response({'error': 'unauthorized'}, status=401)
-    
+    user_id = caller['uid']
     try:
         data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return web.json_response({'success': False, 'error': 'invalid_body'}, status=400)
+    
+    try:
         score = data.get('score', 0)
         words = data.get('words', 0)
         
         today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
         
         # Check if already completed today
-        query = db.collection('daily_challenges')\
-            .where('user_id', '==', str(user_id))\
-            .where('date', '==', today)\
-            .limit(1)
-        docs = list(query.stream())
-        
-        if docs:
+        if await get_daily_challenge_completion(user_id, today):
             return web.json_response({'success': False, 'error': 'already_completed'})
         
         # Check if targets met
@@ -339,19 +339,19 @@ async def game_complete_daily(request):
             bonus_tx = 25
             bonus_xp = 75  # Lowered from 150
             
-            # Award bonus
-            await add_tx_coins(int(user_id), bonus_tx)
-            await add_total_xp(int(user_id), bonus_xp)
-            
-            # Record completion
-            db.collection('daily_challenges').add({
-                'user_id': str(user_id),
-                'date': today,
-                'score': score,
-                'words': words,
-                'bonus_earned': bonus_tx,
-                'completed_at': datetime.now(timezone.utc)
-            })
+            # Award bonus and record completion
+            await asyncio.gather(
+                add_tx_coins(int(user_id), bonus_tx),
+                add_total_xp(int(user_id), bonus_xp),
+                add_daily_challenge_completion({
+                    'user_id': str(user_id),
+                    'date': today,
+                    'score': score,
+                    'words': words,
+                    'bonus_earned': bonus_tx,
+                    'completed_at': datetime.now(timezone.utc)
+                }),
+            )
             
             logging.info(f"🏆 Daily challenge completed: user={user_id}, +{bonus_tx}TX, +{bonus_xp}XP")
             
@@ -378,10 +378,12 @@ async def start_dummy_server():
     app.router.add_get('/game/{path:.*}', serve_game_static)
     
     # Game API (with underscores - original)
+    app.router.add_post('/api/game/session', game_session)
     app.router.add_post('/api/game/start', game_start)
     app.router.add_post('/api/game/submit_score', game_submit_score)
     app.router.add_get('/api/game/user_stats', game_user_stats)
     app.router.add_get('/api/game/leaderboard', game_leaderboard)
+    app.router.add_get('/api/game/word_pack', game_word_pack)
     app.router.add_get('/api/game/daily_challenge', game_daily_challenge)
     app.router.add_post('/api/game/complete_daily', game_complete_daily)
     
@@ -407,15 +409,21 @@ async def keep_alive():
             except: pass
 
 async def main():
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=FIRESTORE_THREADS))
+    hexagame_assets.assets  # Build/load the game's static assets before serving
     await start_dummy_server()
     asyncio.create_task(keep_alive())
 
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    storage = create_storage()  # FSM_STORAGE=sqlite (persistent) or memory
+    dp = Dispatcher(storage=storage)
 
     # Start the Notification Scheduler
     asyncio.create_task(notification_scheduler(bot))
     asyncio.create_task(check_and_send_due_card_notifications(bot))  # SM-2 Due Card Notifications
+    asyncio.create_task(ai_usage_flusher())  # Batched AI token accounting
+    asyncio.create_task(game_leaderboard_flusher())  # Game leaderboard snapshots
+    asyncio.create_task(practice.sm2_progress_flusher(storage))  # Abandoned Smart Review batches
 
     # Register middleware (must be before routers)
     dp.update.middleware(BanCheckMiddleware())
@@ -423,6 +431,8 @@ async def main():
     # Group Play (MUST be before start.router to handle group quiz starts)
     from bot_handlers import group_play
     dp.include_router(group_play.router)
+    asyncio.create_task(group_session_snapshotter())  # Persist running group quizzes
+    asyncio.create_task(group_play.resume_group_sessions(bot))  # Pick up quizzes interrupted by a restart
 
     dp.include_router(start.router)
     dp.include_router(add_cards.router)
@@ -452,7 +462,14 @@ async def main():
 
     await bot.delete_webhook(drop_pending_updates=True)
     print("🚀 QuizTeebBot V3.0 Started...")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await practice.flush_all_sm2_progress()  # Unsaved Smart Review ratings
+        await write_queue.drain()  # Finish queued practice writes
+        await storage.close()  # Flush pending FSM writes
+        await game_leaderboards.flush()
+        await flush_usage()  # Buffered AI token accounting
 
 if __name__ == "__main__":
     try: